@@ -0,0 +1,135 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from langchain_core.embeddings import Embeddings
+from src.models.llm import LLMService
+from typing import AsyncIterator, Dict, List
+import asyncio
+import hashlib
+import json
+import numpy as np
+import re
+import threading
+import time
+
+def hashed_vector(text: str, dim: int) -> List[float]:
+    """Deterministic bag-of-words vector, so similar texts get similar embeddings"""
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in re.findall(r"\w+", text.lower()):
+        vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % dim] += 1.0
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+class FakeEmbeddings(Embeddings):
+    """Embedding backend with no network calls"""
+
+    def __init__(self, dim: int = 384, latency: float = 0.0):
+        self.dim = dim
+        # Simulated round trip per call
+        self.latency = latency
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        return [hashed_vector(text, self.dim) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [hashed_vector(text, self.dim) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+class FakeEmbeddingModel:
+    """Stand-in for EmbeddingModel around FakeEmbeddings"""
+
+    def __init__(self, dim: int = 384, latency: float = 0.0):
+        self.model_type = "fake"
+        self.namespace = f"fake:{dim}"
+        self.model = FakeEmbeddings(dim=dim, latency=latency)
+
+    def embed_text(self, text: str) -> List[float]:
+        return self.model.embed_query(text)
+
+    def embed_documents(self, documents: List[str]) -> List[List[float]]:
+        return self.model.embed_documents(documents)
+
+    async def aembed_text(self, text: str) -> List[float]:
+        return await self.model.aembed_query(text)
+
+    async def aembed_documents(self, documents: List[str]) -> List[List[float]]:
+        return await self.model.aembed_documents(documents)
+
+class FakeLLM:
+    """LLM client that echoes the prompt after a fixed delay"""
+
+    def __init__(self, latency: float = 0.05, tokens: int = 20):
+        # Simulated generation time per response
+        self.latency = latency
+        self.tokens = tokens
+
+    def _answer(self, messages: List[Dict[str, str]]) -> List[str]:
+        words = re.findall(r"\w+", messages[-1]["content"])[:self.tokens]
+        return [f"{word} " for word in words]
+
+    def _generate_response(self, messages: List[Dict[str, str]]) -> str:
+        time.sleep(self.latency)
+        return "".join(self._answer(messages))
+
+    async def _agenerate_response(self, messages: List[Dict[str, str]]) -> str:
+        await asyncio.sleep(self.latency)
+        return "".join(self._answer(messages))
+
+    async def _astream_response(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        tokens = self._answer(messages)
+        for token in tokens:
+            await asyncio.sleep(self.latency / max(len(tokens), 1))
+            yield token
+
+class FakeLLMService(LLMService):
+    """LLMService around FakeLLM, so prompt building and stage timing stay in the measured path"""
+
+    def __init__(self, latency: float = 0.05, tokens: int = 20):
+        self.model_name = "fake"
+        self.temperature = 0.0
+        self.llm = FakeLLM(latency=latency, tokens=tokens)
+
+class _EmbeddingHandler(BaseHTTPRequestHandler):
+    """Local stand-in for the DeepSeek embeddings endpoint"""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        data = [
+            {"index": i, "embedding": hashed_vector(text, self.server.dim)}
+            for i, text in enumerate(body["input"])
+        ]
+        payload = json.dumps({"data": data}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+class StubEmbeddingServer:
+    """Embeddings HTTP server on a local port, used to benchmark the real client's batching"""
+
+    def __init__(self, dim: int = 384):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _EmbeddingHandler)
+        self.server.dim = dim
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/embeddings"
+        self._thread = threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True)
+
+    def __enter__(self) -> "StubEmbeddingServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,344 @@
+"""Benchmarks for the ingest and query hot paths, run against deterministic fake backends
+
+    python -m benchmarks.run --suites parse,chunk,embed,vector_store,query --output results.json
+"""
+from benchmarks.fakes import FakeEmbeddingModel, FakeLLMService, StubEmbeddingServer
+from benchmarks.synthetic import policy_texts, write_corpus
+from langchain_core.documents import Document
+from src.data.processor import DocumentProcessor
+from src.models.embeddings import DeepSeekEmbeddings
+from src.models.http_client import close_async_client
+from src.utils.metrics import metrics
+from src.utils.pdf_parser import PDFParser
+from src.utils.vector_store import VectorStore
+from typing import Any, Callable, Dict, List, Sequence
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import numpy as np
+
+SUITES = ["parse", "chunk", "embed", "vector_store", "quantization", "query"]
+
+logger = logging.getLogger(__name__)
+
+def summarize(latencies: Sequence[float]) -> Dict[str, float]:
+    """Latency distribution in milliseconds"""
+    values = np.asarray(latencies, dtype=np.float64) * 1000
+    if not len(values):
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99]).tolist()
+    return {
+        "count": int(len(values)),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(p50, 3),
+        "p95_ms": round(p95, 3),
+        "p99_ms": round(p99, 3),
+    }
+
+def timed(fn: Callable, *args, **kwargs):
+    """Call a function, returning its result and the seconds it took"""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def directory_size(path: str) -> int:
+    """Total size of the files under a directory"""
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+def read_pages(pdf_path: str, workers: int) -> List[str]:
+    """Extract every page of a PDF"""
+    parser = PDFParser()
+    parser.open(pdf_path)
+    try:
+        return list(parser.iter_pages(workers=workers, parallel_threshold=0))
+    finally:
+        parser.close()
+
+def bench_parse(pdf_paths: List[str], workers: int) -> Dict[str, Any]:
+    """Page extraction throughput, in one process and across worker processes"""
+    results = {}
+    for mode, mode_workers in (("sequential", 1), ("parallel", workers)):
+        pages, seconds = 0, 0.0
+        for path in pdf_paths:
+            extracted, elapsed = timed(read_pages, path, mode_workers)
+            pages += len(extracted)
+            seconds += elapsed
+        results[mode] = {"workers": mode_workers, "pages": pages, "seconds": round(seconds, 4), "pages_per_second": round(pages / seconds, 1)}
+    return results
+
+def bench_chunk(pdf_paths: List[str]) -> Dict[str, Any]:
+    """Chunking throughput for each strategy"""
+    documents = [read_pages(path, 1) for path in pdf_paths]
+    pages = sum(len(doc) for doc in documents)
+    processor = DocumentProcessor()
+
+    results = {}
+    for strategy in ("insurance", "default"):
+        chunks, seconds = 0, 0.0
+        for doc_pages in documents:
+            doc_chunks, elapsed = timed(processor.process_pages, doc_pages, {"source": "bench.pdf"}, chunk_strategy=strategy)
+            chunks += len(doc_chunks)
+            seconds += elapsed
+        results[strategy] = {"pages": pages, "chunks": chunks, "seconds": round(seconds, 4), "pages_per_second": round(pages / seconds, 1)}
+    return results
+
+def bench_embed(count: int, batch_sizes: List[int], dim: int) -> Dict[str, Any]:
+    """Embedding client batching against a local stub endpoint"""
+    texts = policy_texts(count)
+    results = {}
+    with StubEmbeddingServer(dim=dim) as server:
+        for batch_size in batch_sizes:
+            embeddings = DeepSeekEmbeddings(api_key="benchmark", api_url=server.url, batch_size=batch_size)
+            _, sync_seconds = timed(embeddings.embed_documents, texts)
+
+            async def embed_async():
+                try:
+                    return await embeddings.aembed_documents(texts)
+                finally:
+                    # The shared client is bound to this event loop
+                    await close_async_client()
+            _, async_seconds = timed(asyncio.run, embed_async())
+
+            results[f"batch_{batch_size}"] = {
+                "texts": count,
+                "sync_texts_per_second": round(count / sync_seconds, 1),
+                "async_texts_per_second": round(count / async_seconds, 1),
+            }
+    return results
+
+def bench_vector_store(sizes: List[int], dim: int, index_type: str, queries: int, k: int, seed: int = 0) -> Dict[str, Any]:
+    """Build, persist, load and search times for stores of increasing size"""
+    rng = np.random.default_rng(seed)
+    embedding_model = FakeEmbeddingModel(dim=dim)
+    results = {}
+
+    for size in sizes:
+        vectors = rng.standard_normal((size, dim), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        documents = [Document(page_content=f"chunk {i}", metadata={"source": "bench.pdf"}) for i in range(size)]
+
+        # The BM25 index is left out so the figures reflect the vector index alone
+        store = VectorStore(embedding_model=embedding_model, index_type=index_type, lexical=False)
+        _, build_seconds = timed(store.add_documents, documents, embeddings=vectors)
+        del documents
+
+        # Queries near stored vectors, as real questions are near their answers
+        query_vectors = (vectors[rng.integers(size, size=queries)] + rng.standard_normal((queries, dim), dtype=np.float32) * 0.1).tolist()
+        latencies = [timed(store.similarity_search_by_vector, query, k)[1] for query in query_vectors]
+        _, batch_seconds = timed(store.similarity_search_by_vectors, query_vectors, k)
+
+        with tempfile.TemporaryDirectory() as persist_dir:
+            _, save_seconds = timed(store.compact, persist_dir)
+            disk_bytes = directory_size(persist_dir)
+            del store
+            loaded = VectorStore(embedding_model=embedding_model, index_type=index_type, lexical=False)
+            _, load_seconds = timed(loaded.load, persist_dir)
+            # Searches against the loaded store read chunks from disk rather than memory
+            loaded_latencies = [timed(loaded.similarity_search_by_vector, query, k)[1] for query in query_vectors]
+            del loaded
+
+        results[str(size)] = {
+            "index_type": index_type,
+            "dim": dim,
+            "build_seconds": round(build_seconds, 4),
+            "save_seconds": round(save_seconds, 4),
+            "load_seconds": round(load_seconds, 4),
+            "disk_bytes": disk_bytes,
+            "search": summarize(latencies),
+            "loaded_search": summarize(loaded_latencies),
+            "batch_queries_per_second": round(queries / batch_seconds, 1),
+        }
+        logger.info(f"vector_store {size}: {results[str(size)]}")
+    return results
+
+def clustered_vectors(rng: np.random.Generator, count: int, dim: int, clusters: int = 256) -> np.ndarray:
+    """Unit vectors grouped around random centres, closer to real embeddings than uniform noise"""
+    centres = rng.standard_normal((clusters, dim), dtype=np.float32)
+    vectors = centres[rng.integers(clusters, size=count)] + 0.5 * rng.standard_normal((count, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+def bench_quantization(size: int, dim: int, variants: List[str], queries: int, k: int, seed: int = 0) -> Dict[str, Any]:
+    """Recall against exact search and index memory for each storage precision"""
+    import faiss
+
+    rng = np.random.default_rng(seed)
+    vectors = clustered_vectors(rng, size, dim)
+    query_vectors = vectors[rng.integers(size, size=queries)] + 0.05 * rng.standard_normal((queries, dim), dtype=np.float32)
+
+    # Ground truth from an exact float32 search
+    exact = faiss.IndexFlatL2(dim)
+    exact.add(vectors)
+    _, truth = exact.search(query_vectors, k)
+    del exact
+    query_lists = query_vectors.tolist()
+
+    embedding_model = FakeEmbeddingModel(dim=dim)
+    documents = [Document(page_content=f"chunk {i}", metadata={}) for i in range(size)]
+    results = {}
+    for variant in variants:
+        index_type, _, option = variant.partition("+")
+        store = VectorStore(embedding_model=embedding_model, index_type=index_type, index_params={"rescore": option == "rescore"}, lexical=False)
+        ids = store.add_documents(documents, embeddings=vectors)
+        positions = {doc_id: position for position, doc_id in enumerate(ids)}
+
+        found, seconds = timed(store.similarity_search_by_vectors, query_lists, k)
+        recall = np.mean([
+            len({positions[doc.id] for doc in row} & set(expected)) / k
+            for row, expected in zip(found, truth.tolist())
+        ])
+
+        results[variant] = {
+            f"recall_at_{k}": round(float(recall), 4),
+            "index_bytes": int(faiss.serialize_index(store.store.index).nbytes),
+            # Exact vectors kept for rescoring are read from the mapped file only for the candidates
+            "resident_bytes": store.resident_index_bytes(),
+            "queries_per_second": round(queries / seconds, 1),
+        }
+        logger.info(f"quantization {variant}: {results[variant]}")
+        del store
+    return results
+
+def bench_query(chunks: int, requests: int, concurrency: int, llm_latency: float, dim: int) -> Dict[str, Any]:
+    """End-to-end /api/query latency and throughput under concurrent load"""
+    import httpx
+    from src.app import app
+    from src.rag.components import RAGComponents
+
+    with tempfile.TemporaryDirectory() as workdir:
+        components = RAGComponents(
+            persist_directory=os.path.join(workdir, "store"),
+            embedding_cache_path=None,
+            embedding_model=FakeEmbeddingModel(dim=dim),
+            llm_service=FakeLLMService(latency=llm_latency),
+        )
+        texts = policy_texts(chunks)
+        components.vector_store.add_documents([Document(page_content=text, metadata={"source": "bench.pdf"}) for text in texts])
+        # Every request goes through retrieval and the LLM; the synthetic questions are similar enough to share cached answers
+        components.answer_generator.answer_cache = None
+        app.state.components = components
+        metrics.reset()
+
+        rng = np.random.default_rng(1)
+        questions = [f"{text.split('.')[0]} question {i}?" for i, text in enumerate(rng.choice(texts, size=requests))]
+
+        async def run_load():
+            semaphore = asyncio.Semaphore(concurrency)
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                async def send(question: str) -> float:
+                    async with semaphore:
+                        start = time.perf_counter()
+                        response = await client.post("/api/query", json={"query": question, "top_k": 3})
+                        response.raise_for_status()
+                        return time.perf_counter() - start
+                return await asyncio.gather(*(send(question) for question in questions))
+
+        latencies, seconds = timed(asyncio.run, run_load())
+
+    stages = {}
+    for stage in ("embed_query", "vector_search", "lexical_search", "retrieve", "context", "llm"):
+        quantiles = metrics.quantiles("stage_seconds", stage=stage)
+        if quantiles:
+            stages[stage] = {f"p{int(q * 100)}_ms": round(value * 1000, 3) for q, value in quantiles.items()}
+
+    return {
+        "chunks": chunks,
+        "concurrency": concurrency,
+        "llm_latency_ms": llm_latency * 1000,
+        "latency": summarize(latencies),
+        "requests_per_second": round(requests / seconds, 1),
+        "stages": stages,
+    }
+
+def git_commit() -> str:
+    """Commit the benchmarks ran against, if known"""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the selected suites and collect their results"""
+    results: Dict[str, Any] = {}
+    suites = args.suites.split(",")
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        raise SystemExit(f"Unknown suites: {', '.join(sorted(unknown))}. Choose from {', '.join(SUITES)}.")
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        if "parse" in suites or "chunk" in suites:
+            pdf_paths = write_corpus(corpus_dir, args.documents, args.pages)
+            if "parse" in suites:
+                results["parse"] = bench_parse(pdf_paths, args.workers)
+            if "chunk" in suites:
+                results["chunk"] = bench_chunk(pdf_paths)
+
+    if "embed" in suites:
+        results["embed"] = bench_embed(args.embed_texts, [int(size) for size in args.batch_sizes.split(",")], args.dim)
+    if "vector_store" in suites:
+        sizes = [int(size) for size in args.sizes.split(",")]
+        results["vector_store"] = bench_vector_store(sizes, args.dim, args.index_type, args.queries, args.k)
+    if "quantization" in suites:
+        variants = args.quantization_variants.split(",")
+        results["quantization"] = bench_quantization(args.quantization_size, args.dim, variants, args.queries, args.k)
+    if "query" in suites:
+        results["query"] = bench_query(args.query_chunks, args.requests, args.concurrency, args.llm_latency, args.dim)
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="AskMyDocs ingest and query benchmarks")
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"Comma-separated suites from: {', '.join(SUITES)}")
+    parser.add_argument("--output", help="JSON results path (default: benchmarks/results/<timestamp>-<commit>.json)")
+    parser.add_argument("--documents", type=int, default=3, help="Synthetic PDFs for the parse and chunk suites")
+    parser.add_argument("--pages", type=int, default=100, help="Pages per synthetic PDF")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes for parallel extraction")
+    parser.add_argument("--embed-texts", type=int, default=4096, help="Texts embedded by the embed suite")
+    parser.add_argument("--batch-sizes", default="16,64,256", help="Embedding batch sizes to compare")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Vector store sizes")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension")
+    parser.add_argument("--index-type", default="flat", help="Vector index type")
+    parser.add_argument("--queries", type=int, default=200, help="Search queries per store size")
+    parser.add_argument("-k", type=int, default=10, help="Results per search")
+    parser.add_argument("--quantization-size", type=int, default=100000, help="Vectors indexed by the quantization suite")
+    parser.add_argument("--quantization-variants", default="flat,sq_fp16,sq8,sq8+rescore", help="Index types to compare; add +rescore for float32 re-ranking")
+    parser.add_argument("--query-chunks", type=int, default=5000, help="Chunks indexed for the query suite")
+    parser.add_argument("--requests", type=int, default=500, help="Queries sent by the query suite")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent queries in flight")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Simulated LLM latency in seconds")
+    return parser
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    args = build_parser().parse_args()
+    report = run(args)
+
+    output = args.output
+    if not output:
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join("benchmarks", "results", f"{stamp}-{report['meta']['commit'][:8]}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Wrote benchmark results to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+from typing import List
+import fitz
+import numpy as np
+import os
+
+SECTIONS = [
+    "MEDICAL EXPENSES", "BAGGAGE", "CANCELLATION", "CURTAILMENT", "PERSONAL LIABILITY",
+    "TRAVEL DELAY", "PERSONAL ACCIDENT", "LEGAL EXPENSES", "EXCLUSIONS", "CLAIMS",
+]
+
+SUBJECTS = ["The insurer", "We", "The policyholder", "You", "Any insured person", "The claimant"]
+VERBS = ["will pay", "will not pay", "must report", "may claim", "is covered for", "must provide"]
+OBJECTS = [
+    "emergency medical treatment abroad", "lost or stolen baggage", "the policy excess",
+    "pre-existing medical conditions", "cancellation charges", "reasonable additional expenses",
+    "original receipts for each item", "a police report within 24 hours", "repatriation costs",
+    "delayed departure of more than 12 hours", "hazardous activities", "personal money and documents",
+]
+
+def policy_lines(rng: np.random.Generator, count: int) -> List[str]:
+    """Random clause lines with section headings, in the style of a travel policy wording"""
+    lines = []
+    for i in range(count):
+        if i % 25 == 0:
+            lines.append(SECTIONS[int(rng.integers(len(SECTIONS)))])
+        lines.append(
+            f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} "
+            f"up to GBP {int(rng.integers(1, 100)) * 50} per trip."
+        )
+    return lines
+
+def policy_texts(count: int, seed: int = 0) -> List[str]:
+    """Chunk-sized synthetic policy texts for index benchmarks"""
+    rng = np.random.default_rng(seed)
+    return [" ".join(policy_lines(rng, 4)) + f" Clause {i}." for i in range(count)]
+
+def write_policy_pdf(path: str, pages: int, seed: int = 0, lines_per_page: int = 50) -> str:
+    """Write a synthetic multi-page policy PDF"""
+    rng = np.random.default_rng(seed)
+    doc = fitz.open()
+    for page_number in range(pages):
+        page = doc.new_page()
+        text = "\n".join(policy_lines(rng, lines_per_page)) + f"\n{page_number + 1}"
+        page.insert_text((40, 40), text, fontsize=8)
+    doc.save(path)
+    doc.close()
+    return path
+
+def write_corpus(directory: str, documents: int, pages: int, seed: int = 0) -> List[str]:
+    """Write a directory of synthetic policy PDFs"""
+    os.makedirs(directory, exist_ok=True)
+    return [
+        write_policy_pdf(os.path.join(directory, f"policy_{i:04d}.pdf"), pages, seed=seed + i)
+        for i in range(documents)
+    ]
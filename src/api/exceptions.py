@@ -12,4 +12,20 @@ class DocumentNotFoundError(Exception):
 
 class LLMError(Exception):
     """Raised when there is an error with the LLM service."""
-    pass
\ No newline at end of file
+    pass
+
+class IngestionQueueFullError(Exception):
+    """Raised when the document ingestion queue has no free capacity."""
+    pass
+
+class FileTooLargeError(Exception):
+    """Raised when an uploaded file exceeds the size limit."""
+    pass
+
+class UnsupportedFileTypeError(Exception):
+    """Raised when an uploaded file is not of a supported type."""
+    pass
+
+class InvalidUploadError(Exception):
+    """Raised when an upload request body is malformed or has no file."""
+    pass
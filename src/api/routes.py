@@ -1,61 +1,55 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, BackgroundTasks, status
-from src.api.schemas import QueryRequest, QueryResponse, DocumentUploadResponse, ErrorResponse
-from src.api.exceptions import DocumentProcessingError, VectorStoreError, LLMError, DocumentNotFoundError
-from src.rag.generator import AnswerGenerator
-from src.rag.indexing import DocumentIndexer
-from src.utils.vector_store import VectorStore
-from src.models.embeddings import EmbeddingModel
-from src.rag.retriever import Retriever
-from src.models.llm import LLMService
+from fastapi import APIRouter, HTTPException, Depends, Request, status
+from fastapi.responses import StreamingResponse
+from src.api.schemas import QueryRequest, QueryResponse, BatchQueryRequest, BatchQueryResponse, BatchQueryResult, DocumentUploadResponse, DocumentInfo, DocumentListResponse, DocumentDeleteResponse, ErrorResponse, JobStatusResponse
+from src.api.exceptions import DocumentProcessingError, VectorStoreError, LLMError, DocumentNotFoundError, IngestionQueueFullError, FileTooLargeError, UnsupportedFileTypeError, InvalidUploadError
+from src.rag.components import RAGComponents
+from src.utils.uploads import check_content_length, save_upload, publish_upload, discard_upload
+from typing import Optional
+import asyncio
 import os
-import uuid
+import json
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-# Dependency to get RAG components
-def get_rag_components():
-    try:
-        # Initialise embedding model
-        embedding_model = EmbeddingModel(model_type="deepseek")
-
-        # Initialise vector store
-        vector_store = VectorStore(embedding_model=embedding_model, db_type="faiss")
-
-        # Load vector store if it exists
-        persist_dir = "data/vector_store"
-        if os.path.exists(persist_dir):
-            vector_store.load(persist_dir)
-
-        # Initialise retriever
-        retriever = Retriever(vector_store=vector_store)
-
-        # Initialise LLM service
-        llm_service = LLMService(model_name="deepseek-chat", temperature=0.0)
+UPLOAD_DIRECTORY = "data/pdfs"
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 100 * 1024 * 1024))
+# LLM completions in flight per batch query request
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", 8))
+NO_DOCUMENTS_ANSWER = "No documents have been indexed yet. Please upload a document first."
+# Upload endpoints read the body themselves, so the form is described to OpenAPI by hand
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "properties": {"file": {"type": "string", "format": "binary"}},
+            "required": ["file"]
+        }}}
+    }
+}
 
-        # Initialise answer generator
-        answer_generator = AnswerGenerator(retriever=retriever, llm_service=llm_service)
-
-        return {
-            "indexer": DocumentIndexer(embedding_model_type="deepseek"),
-            "answer_generator": answer_generator,
-        }
-    except Exception as e:
-        logger.error(f"Failed to initialize RAG components: {e}")
+# Dependency to get the application-scoped RAG components
+def get_rag_components(request: Request) -> RAGComponents:
+    components = getattr(request.app.state, "components", None)
+    if components is None:
+        logger.error("RAG components are not initialized")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to initialize application components"
         )
+    return components
 
 @router.post("/query", response_model=QueryResponse, responses={
     400: {"model": ErrorResponse},
     500: {"model": ErrorResponse},
     503: {"model": ErrorResponse}
 })
-async def query_documents(request: QueryRequest, components = Depends(get_rag_components)):
+async def query_documents(request: QueryRequest, components: RAGComponents = Depends(get_rag_components)):
     """Query the document knowledge base"""
-    answer_generator = components["answer_generator"]
+    # Take a snapshot so an index swap mid-request does not affect this query
+    answer_generator = components.answer_generator
 
     if not request.query or len(request.query.strip()) < 3:
         raise HTTPException(
@@ -67,16 +61,18 @@ async def query_documents(request: QueryRequest, components = Depends(get_rag_co
         #Check if vector store is empty
         if not answer_generator.retriever.vector_store.store:
             return QueryResponse(
-                answer="No documents have been indexed yet. Please upload a document first.",
+                answer=NO_DOCUMENTS_ANSWER,
                 sources=[]
             )
-        result = answer_generator.generate_answer(
+        result = await answer_generator.agenerate_answer(
             query=request.query,
-            top_k=request.top_k
+            top_k=request.top_k,
+            filters=request.filters
         )
         return QueryResponse(
             answer=result["answer"],
-            sources=result["sources"]
+            sources=result["sources"],
+            context_tokens=result.get("context_tokens")
         )
     except LLMError as e:
         logger.error(f"LLM error during query: {e}")
@@ -91,74 +87,252 @@ async def query_documents(request: QueryRequest, components = Depends(get_rag_co
             detail=f"Error generating answer: {str(e)}"
         )
 
+def format_sse(event: str, data) -> str:
+    """Format a single server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/query/stream", responses={
+    400: {"model": ErrorResponse},
+    500: {"model": ErrorResponse}
+})
+async def stream_query(request: QueryRequest, components: RAGComponents = Depends(get_rag_components)):
+    """Query the document knowledge base, streaming the answer as server-sent events"""
+    answer_generator = components.answer_generator
+
+    if not request.query or len(request.query.strip()) < 3:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Query cannot be empty"
+        )
+
+    async def event_stream():
+        #Check if vector store is empty
+        if not answer_generator.retriever.vector_store.store:
+            yield format_sse("sources", [])
+            yield format_sse("token", NO_DOCUMENTS_ANSWER)
+            yield format_sse("done", None)
+            return
+
+        try:
+            async for event in answer_generator.astream_answer(query=request.query, top_k=request.top_k, filters=request.filters):
+                yield format_sse(event["event"], event["data"])
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            logger.error(f"Error during streamed query: {e}")
+            yield format_sse("error", str(e))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def batch_result(index: int, result: dict) -> BatchQueryResult:
+    """Convert a generated answer into one entry of a batch response"""
+    return BatchQueryResult(
+        index=index,
+        answer=result["answer"],
+        sources=result["sources"],
+        context_tokens=result.get("context_tokens"),
+        error=result.get("error")
+    )
+
+@router.post("/query/batch", response_model=BatchQueryResponse, responses={
+    400: {"model": ErrorResponse},
+    500: {"model": ErrorResponse}
+})
+async def batch_query_documents(request: BatchQueryRequest, components: RAGComponents = Depends(get_rag_components)):
+    """Answer many questions at once, sharing one embedding call and one index search"""
+    answer_generator = components.answer_generator
+
+    for index, query in enumerate(request.queries):
+        if not query or len(query.strip()) < 3:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Query {index} cannot be empty"
+            )
+
+    #Check if vector store is empty
+    if not answer_generator.retriever.vector_store.store:
+        empty = {"answer": NO_DOCUMENTS_ANSWER, "sources": []}
+        results = [batch_result(index, empty) for index in range(len(request.queries))]
+        if not request.stream:
+            return BatchQueryResponse(results=results)
+
+        async def empty_stream():
+            for result in results:
+                yield format_sse("result", result.model_dump())
+            yield format_sse("done", None)
+        return StreamingResponse(empty_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    if request.stream:
+        async def event_stream():
+            try:
+                async for index, result in answer_generator.astream_answers(request.queries, top_k=request.top_k, max_concurrency=BATCH_LLM_CONCURRENCY, filters=request.filters):
+                    yield format_sse("result", batch_result(index, result).model_dump())
+            except Exception as e:
+                # Headers are already sent, so report the failure in-band
+                logger.error(f"Error during streamed batch query: {e}")
+                yield format_sse("error", str(e))
+                return
+            yield format_sse("done", None)
+
+        return StreamingResponse(
+            event_stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    try:
+        results = await answer_generator.agenerate_answers(request.queries, top_k=request.top_k, max_concurrency=BATCH_LLM_CONCURRENCY, filters=request.filters)
+        return BatchQueryResponse(results=[batch_result(index, result) for index, result in enumerate(results)])
+    except VectorStoreError as e:
+        logger.error(f"Vector store error during batch query: {e}")
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error during batch query: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error generating answers: {str(e)}"
+        )
+
+@router.get("/cache/stats")
+async def cache_stats(components: RAGComponents = Depends(get_rag_components)):
+    """Report answer cache hit and miss counters"""
+    return components.answer_cache.stats()
+
 @router.post("/upload", response_model=DocumentUploadResponse, responses={
     400: {"model": ErrorResponse},
+    413: {"model": ErrorResponse},
     415: {"model": ErrorResponse},
+    429: {"model": ErrorResponse},
     500: {"model": ErrorResponse}
-})
+}, openapi_extra=UPLOAD_REQUEST_BODY)
 async def upload_document (
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
-    components = Depends(get_rag_components)
+    request: Request,
+    components: RAGComponents = Depends(get_rag_components)
 ):
     """Upload and index a document."""
-    indexer = components["indexer"]
+    return await queue_upload(request, components)
+
+@router.get("/documents", response_model=DocumentListResponse)
+async def list_documents(components: RAGComponents = Depends(get_rag_components)):
+    """List the indexed documents"""
+    return DocumentListResponse(documents=[
+        DocumentInfo(doc_id=doc_id, source=entry.get("source", ""), chunks=entry.get("chunks", 0), indexed_at=entry.get("indexed_at"))
+        for doc_id, entry in components.indexed_documents().items()
+    ])
 
-    # Validate file type
-    if not file.filename.endswith(".pdf"):
+@router.delete("/documents/{doc_id}", response_model=DocumentDeleteResponse, responses={
+    404: {"model": ErrorResponse},
+    500: {"model": ErrorResponse}
+})
+async def delete_document(doc_id: str, components: RAGComponents = Depends(get_rag_components)):
+    """Remove a document from the index without rebuilding it"""
+    try:
+        # Writes the tombstones and manifest, so keep it off the event loop
+        result = await asyncio.to_thread(components.delete_document, doc_id)
+    except DocumentNotFoundError:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting document {doc_id}: {str(e)}")
         raise HTTPException(
-            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
-            detail="Only PDF files are supported"
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error deleting document: {str(e)}"
         )
+    return DocumentDeleteResponse(doc_id=doc_id, chunks=result["chunks"], status=result["status"])
+
+@router.put("/documents/{doc_id}", response_model=DocumentUploadResponse, responses={
+    400: {"model": ErrorResponse},
+    404: {"model": ErrorResponse},
+    413: {"model": ErrorResponse},
+    415: {"model": ErrorResponse},
+    429: {"model": ErrorResponse},
+    500: {"model": ErrorResponse}
+}, openapi_extra=UPLOAD_REQUEST_BODY)
+async def replace_document(
+    doc_id: str,
+    request: Request,
+    components: RAGComponents = Depends(get_rag_components)
+):
+    """Upload a new version of a document; the old version is removed once the new one is indexed"""
+    if not components.indexed_document(doc_id):
+        raise DocumentNotFoundError(f"No indexed document with id {doc_id}")
+    return await queue_upload(request, components, replaces=doc_id)
+
+async def queue_upload(request: Request, components: RAGComponents, replaces: Optional[str] = None) -> DocumentUploadResponse:
+    """Receive an uploaded PDF and queue it for indexing, optionally in place of an indexed document"""
+    # A body declared too large is refused before any of it is received
+    check_content_length(request.headers.get("content-length"), MAX_UPLOAD_BYTES)
 
     try:
-        # Create directory if it doesn't exist
-        os.makedirs("data/pdfs", exist_ok=True)
-
-        # Save uploaded file
-        file_path = f"data/pdfs/{uuid.uuid4()}_{file.filename}"
-
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            if len(content) == 0:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Uploaded file is empty"
-                )
-            f.write(content)
-
-        # Index the document in the background
-        def index_document():
-            try:
-                result = indexer.index_pdf(
-                    pdf_path=file_path,
-                    persist_directory="data/vector_store"
-                )
-                logger.info(f"Successfully indexed document: {file.filename}")
-                return result
-            except Exception as e:
-                logger.error(f"Error indexing document {file.filename}: {str(e)}")
-                # Delete the file if indexing failed
-                try:
-                    os.remove(file_path)
-                except:
-                    pass
-                raise DocumentProcessingError(f"Failed to process document: {str(e)}")
+        # Parse the multipart body as it arrives, hashing, size-checking and writing the file once
+        tmp_path, filename, doc_id, size = await save_upload(request.stream(), request.headers.get("content-type", ""), UPLOAD_DIRECTORY, MAX_UPLOAD_BYTES)
+        if size == 0:
+            discard_upload(tmp_path)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Uploaded file is empty"
+            )
 
-        # Add indexing task to background
-        background_tasks.add_task(index_document)
+        # Identical content is already indexed, so there is nothing to queue, unless it must replace another document
+        existing = components.indexed_document(doc_id)
+        if existing and replaces in (None, doc_id):
+            discard_upload(tmp_path)
+            return DocumentUploadResponse(
+                filename=filename,
+                chunks=existing.get("chunks", 0),
+                status="already_indexed",
+                doc_id=doc_id
+            )
+
+        file_path = publish_upload(tmp_path, UPLOAD_DIRECTORY, filename)
+
+        # Queue the document for indexing by the background workers
+        try:
+            job = components.ingestion_queue.submit(file_path=file_path, filename=filename, doc_id=doc_id, replaces=replaces)
+        except IngestionQueueFullError:
+            os.remove(file_path)
+            raise
 
         return DocumentUploadResponse(
-            filename=file.filename,
-            chunks=0, # Place holder
-            status="processing"
+            filename=filename,
+            chunks=0, # Reported by the job status endpoint once indexed
+            status=job.status,
+            job_id=job.id,
+            doc_id=doc_id
         )
     
-    except HTTPException:
+    except (HTTPException, IngestionQueueFullError, FileTooLargeError, UnsupportedFileTypeError, InvalidUploadError):
         raise
     except Exception as e:
         logger.error(f"Error processing upload: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error processing document: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse, responses={
+    404: {"model": ErrorResponse}
+})
+async def get_job_status(job_id: str, components: RAGComponents = Depends(get_rag_components)):
+    """Get the status of a document indexing job"""
+    job = components.ingestion_queue.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job not found: {job_id}"
+        )
+
+    return JobStatusResponse(
+        job_id=job.id,
+        filename=job.filename,
+        doc_id=job.doc_id,
+        status=job.status,
+        chunks=job.chunks,
+        error=job.error,
+        timings=job.timings,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at
+    )
\ No newline at end of file
@@ -1,9 +1,22 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict, Union
+
+# A metadata value to match, or a list of values any of which may match
+FilterValue = Union[str, int, float, bool, List[Union[str, int, float, bool]]]
 
 class QueryRequest(BaseModel):
     query: str = Field(..., description="The user's question about travel insurance")
     top_k: int = Field(default=3, description="Number of documents to retrieve")
+    filters: Optional[Dict[str, FilterValue]] = Field(default=None, description="Only retrieve chunks whose metadata matches every field, e.g. {\"source\": \"policy.pdf\"}")
+
+# Largest number of questions accepted in one batch request
+MAX_BATCH_QUERIES = 256
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_QUERIES, description="Questions to answer")
+    top_k: int = Field(default=3, description="Number of documents to retrieve per question")
+    stream: bool = Field(default=False, description="Stream each result as a server-sent event as soon as it is ready")
+    filters: Optional[Dict[str, FilterValue]] = Field(default=None, description="Metadata filters applied to every question")
 
 class DocumentSource(BaseModel):
     source: str
@@ -12,11 +25,50 @@ class DocumentSource(BaseModel):
 class QueryResponse(BaseModel):
     answer: str
     sources: List[DocumentSource]
+    context_tokens: Optional[int] = None
+
+class BatchQueryResult(BaseModel):
+    index: int
+    answer: Optional[str] = None
+    sources: List[DocumentSource] = Field(default_factory=list)
+    context_tokens: Optional[int] = None
+    error: Optional[str] = None
+
+class BatchQueryResponse(BaseModel):
+    results: List[BatchQueryResult]
 
 class DocumentUploadResponse(BaseModel):
     filename: str
     chunks: int
     status: str
+    job_id: Optional[str] = None
+    doc_id: Optional[str] = None
+
+class DocumentInfo(BaseModel):
+    doc_id: str
+    source: str
+    chunks: int
+    indexed_at: Optional[float] = None
+
+class DocumentListResponse(BaseModel):
+    documents: List[DocumentInfo]
+
+class DocumentDeleteResponse(BaseModel):
+    doc_id: str
+    chunks: int
+    status: str
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    filename: str
+    doc_id: Optional[str] = None
+    status: str
+    chunks: int
+    error: Optional[str] = None
+    timings: Dict[str, float] = Field(default_factory=dict, description="Seconds spent in each indexing stage")
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
 
 class ErrorResponse(BaseModel):
     error: str
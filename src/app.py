@@ -1,9 +1,15 @@
 from fastapi import FastAPI, Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from src.api.routes import router
-from src.api.exceptions import DocumentProcessingError, VectorStoreError, LLMError, DocumentNotFoundError
+from src.api.routes import router, UPLOAD_DIRECTORY
+from src.rag.components import RAGComponents
+from src.models.http_client import close_async_client
+from src.utils.metrics import metrics, start_trace, format_server_timing
+from contextlib import asynccontextmanager
+from src.api.exceptions import DocumentProcessingError, VectorStoreError, LLMError, DocumentNotFoundError, IngestionQueueFullError, FileTooLargeError, UnsupportedFileTypeError, InvalidUploadError
+import asyncio
 import os
+import time
 from dotenv import load_dotenv
 import logging
 
@@ -13,11 +19,33 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(level
 # Load environment variables
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the RAG components once per process and share them across requests
+    try:
+        app.state.components = RAGComponents(
+            query_embedding_cache_path=os.getenv("QUERY_EMBEDDING_CACHE_PATH"),
+            upload_directory=UPLOAD_DIRECTORY,
+            reranker=os.getenv("RERANKER"),
+            rerank_candidates=int(os.getenv("RERANK_CANDIDATES", "20"))
+        )
+        app.state.components.start()
+    except Exception as e:
+        logging.error(f"Failed to initialize RAG components: {e}")
+        app.state.components = None
+    yield
+    if app.state.components is not None:
+        # Joining the workers blocks, so it runs off the event loop
+        await asyncio.to_thread(app.state.components.stop)
+    # Release pooled connections held by the shared async HTTP client
+    await close_async_client()
+
 # Create FastAPI app
 app = FastAPI(
     title="AskMyDocs API",
     description="A RAG-based AI Assistant for Travel Insurance PDFs",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Add exception handlers
@@ -52,6 +80,37 @@ async def document_not_found_exception_handler(request: Request, exc: DocumentNo
         content={"error": "Document not found", "details": str(exc)}
     )
 
+@app.exception_handler(IngestionQueueFullError)
+async def ingestion_queue_full_exception_handler(request: Request, exc: IngestionQueueFullError):
+    logging.warning(f"Ingestion queue full: {exc}")
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"error": "Too many documents are being indexed", "details": str(exc)},
+        headers={"Retry-After": "5"}
+    )
+
+@app.exception_handler(FileTooLargeError)
+async def file_too_large_exception_handler(request: Request, exc: FileTooLargeError):
+    logging.warning(f"Upload rejected: {exc}")
+    return JSONResponse(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        content={"error": "File too large", "details": str(exc)}
+    )
+
+@app.exception_handler(UnsupportedFileTypeError)
+async def unsupported_file_type_exception_handler(request: Request, exc: UnsupportedFileTypeError):
+    return JSONResponse(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        content={"error": "Unsupported file type", "details": str(exc)}
+    )
+
+@app.exception_handler(InvalidUploadError)
+async def invalid_upload_exception_handler(request: Request, exc: InvalidUploadError):
+    return JSONResponse(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        content={"error": "Invalid upload", "details": str(exc)}
+    )
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -64,6 +123,32 @@ app.add_middleware(
 # Include API router
 app.include_router(router, prefix="/api")
 
+# Add a Server-Timing header with per-stage durations when enabled
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() in ("1", "true", "yes")
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    timings = start_trace()
+    response = await call_next(request)
+
+    # Label by route template rather than raw path to keep the number of series bounded
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched"
+    metrics.observe("request_seconds", time.perf_counter() - start, method=request.method, path=path)
+    metrics.increment("requests_total", method=request.method, path=path, status=response.status_code)
+
+    if SERVER_TIMING and timings:
+        response.headers["Server-Timing"] = format_server_timing(timings)
+    return response
+
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint(request: Request):
+    components = getattr(request.app.state, "components", None)
+    samples = components.metrics_samples() if components is not None else []
+    return PlainTextResponse(metrics.render(samples), media_type="text/plain; version=0.0.4")
+
 # Root endpoint
 @app.get("/", tags=["Root"])
 async def root():
@@ -0,0 +1,142 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from langchain_core.documents import Document
+from src.utils.tokens import CHARS_PER_TOKEN, count_tokens, truncate_to_tokens
+import itertools
+import re
+import uuid
+
+# A whole line in capitals, optionally numbered and ending in a colon, e.g. "SECTION 3 - EXCLUSIONS" or "4.2 BAGGAGE COVER:"
+HEADING_PATTERN = re.compile(r"^(?:(?:SECTION|PART)\s+\w+\s*[-:.]?\s*|\d+(?:\.\d+)*\.?\s+)?[A-Z][A-Z0-9&/,'()\- ]*[A-Z)]\s*:?$")
+
+# A heading followed by text on the same line, e.g. "EXCLUSIONS: We will not pay for..."
+INLINE_HEADING_PATTERN = re.compile(r"^([A-Z][A-Z ]{2,60}):\s+(\S.*)$")
+
+@dataclass
+class _Line:
+    """A line of body text and where it came from"""
+    text: str
+    tokens: int
+    page: int
+    start: int
+
+class SectionChunker:
+    """Split page text into section chunks of bounded token length in a single pass"""
+
+    def __init__(self, max_tokens: int = 400, overlap_tokens: int = 50, max_heading_chars: int = 80, default_section: str = "GENERAL"):
+        self.max_tokens = max_tokens
+        # Tokens of trailing lines repeated at the start of the next chunk when a section is split
+        self.overlap_tokens = overlap_tokens
+        self.max_heading_chars = max_heading_chars
+        self.default_section = default_section
+
+    def match_heading(self, line: str) -> Optional[Tuple[str, str]]:
+        """Return the heading and any text following it on the line, or None if the line is not a heading"""
+        # Require a few letters so lines such as "A)" or "N/A" are not mistaken for headings
+        if len(line) <= self.max_heading_chars and HEADING_PATTERN.match(line) and sum(c.isalpha() for c in line) >= 4:
+            return line.rstrip(": "), ""
+
+        match = INLINE_HEADING_PATTERN.match(line)
+        if match:
+            return match.group(1).strip(), match.group(2)
+        return None
+
+    def chunk_pages(self, pages: Iterable[str], metadata: Optional[Dict[str, Any]] = None) -> Iterator[Document]:
+        """Yield chunks from page texts whose line breaks are still intact
+
+        Character offsets refer to the pages joined with newlines.
+        """
+        metadata = metadata or {}
+        chunk_indices = itertools.count()
+        section = self.default_section
+        buffer: List[_Line] = []
+        # Leading lines of the buffer repeated from the previous chunk
+        overlap = 0
+        offset = 0
+
+        for page_number, page_text in enumerate(pages, start=1):
+            for raw_line in page_text.split("\n"):
+                line_start = offset
+                offset += len(raw_line) + 1
+                text = raw_line.strip()
+                if not text:
+                    continue
+                start = line_start + raw_line.index(text)
+
+                heading = self.match_heading(text)
+                if heading is not None:
+                    if len(buffer) > overlap:
+                        yield self._make_chunk(section, buffer, metadata, next(chunk_indices))
+                    buffer, overlap = [], 0
+                    section, text = heading
+                    if not text:
+                        continue
+                    start = line_start + raw_line.rindex(text)
+
+                # Leave room for the heading repeated at the top of every chunk
+                budget = self.max_tokens - self._heading_tokens(section)
+                for piece, piece_start in self._split_line(text, start, budget):
+                    line = _Line(piece, count_tokens(piece) + 1, page_number, piece_start)
+                    if buffer and sum(l.tokens for l in buffer) + line.tokens > budget:
+                        if len(buffer) > overlap:
+                            yield self._make_chunk(section, buffer, metadata, next(chunk_indices))
+                        buffer = self._overlap_lines(buffer, budget - line.tokens)
+                        overlap = len(buffer)
+                    buffer.append(line)
+
+        if len(buffer) > overlap:
+            yield self._make_chunk(section, buffer, metadata, next(chunk_indices))
+
+    def _heading_tokens(self, section: str) -> int:
+        """Tokens taken by the heading line at the top of a chunk"""
+        return 0 if section == self.default_section else count_tokens(section) + 1
+
+    def _overlap_lines(self, lines: List[_Line], limit: int) -> List[_Line]:
+        """Trailing lines of a chunk to repeat at the start of the next one"""
+        limit = min(limit, self.overlap_tokens)
+        kept, total = [], 0
+        for line in reversed(lines):
+            if total + line.tokens > limit:
+                break
+            kept.append(line)
+            total += line.tokens
+        return kept[::-1]
+
+    @staticmethod
+    def _split_line(text: str, start: int, limit: int) -> Iterator[Tuple[str, int]]:
+        """Split a line longer than the limit at word boundaries"""
+        limit = max(limit - 1, 1)
+        position = 0
+        while position < len(text):
+            rest = text[position:]
+            if count_tokens(rest) <= limit:
+                yield rest, start + position
+                return
+
+            piece = truncate_to_tokens(rest, limit)
+            cut = piece.rfind(" ")
+            if cut > 0:
+                piece = piece[:cut]
+            piece = piece or rest[:CHARS_PER_TOKEN]
+            yield piece, start + position
+
+            position += len(piece)
+            while position < len(text) and text[position] == " ":
+                position += 1
+
+    def _make_chunk(self, section: str, lines: List[_Line], metadata: Dict[str, Any], chunk_index: int) -> Document:
+        """Build a chunk from buffered lines, with the section heading at the top"""
+        body = "\n".join(line.text for line in lines)
+        content = body if section == self.default_section else f"{section}\n{body}"
+
+        chunk_metadata = dict(metadata)
+        chunk_metadata.update({
+            "section": section,
+            "chunk_id": str(uuid.uuid4()),
+            "chunk_index": chunk_index,
+            "page_start": lines[0].page,
+            "page_end": lines[-1].page,
+            "char_start": lines[0].start,
+            "char_end": lines[-1].start + len(lines[-1].text),
+        })
+        return Document(page_content=content, metadata=chunk_metadata)
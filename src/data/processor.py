@@ -1,12 +1,12 @@
-from typing import List, Dict, Any
+from typing import Iterable, List, Dict, Any
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from src.data.chunker import SectionChunker
 import re
-import uuid
 
 class DocumentProcessor:
-    def __init__(self):
-        pass
+    def __init__(self, max_chunk_tokens: int = 400, chunk_overlap_tokens: int = 50):
+        self.section_chunker = SectionChunker(max_tokens=max_chunk_tokens, overlap_tokens=chunk_overlap_tokens)
 
     def chunk_text(self, text: str, chunk_size: int = 1000, chunk_overlap: int = 200, metadata: Dict[str, Any] = None) -> List[Document]:
         """Chunk text into smaller pieces for processing"""
@@ -19,33 +19,12 @@ class DocumentProcessor:
         return chunks
     
     def chunk_insurance_doc(self, text: str, metadata: Dict[str, Any] = None) -> List[Document]:
-        """Specialised chunking for insurance documents"""
-        section_pattern = r'(?:^|\n)([A-Z][A-Z\s]+:)'
+        """Specialised chunking for insurance documents, split by section headings"""
+        return list(self.section_chunker.chunk_pages([text], metadata=metadata))
 
-        # Find all sections
-        sections = re.split(section_pattern, text)
-
-        documents = []
-        current_section = "GENERAL"
-
-        # Process sections
-        for i, section in enumerate(sections):
-            # Content
-            if i % 2 == 0 and i > 0:
-                # Combine header and content
-                section_text = sections[i-1] + section
-                section_metadata = metadata.copy() if metadata else {}
-                section_metadata["section"] = current_section
-                section_metadata["chunk_id"] = str(uuid.uuid4())
-
-                # Create document
-                doc = Document(page_content=section_text, metadata=section_metadata)
-                documents.append(doc)
-            # Header
-            elif i % 2 == 1:
-                current_section = section.strip()
-            
-        return documents
+    def chunk_pages(self, pages: Iterable[str], metadata: Dict[str, Any] = None) -> List[Document]:
+        """Chunk insurance documents page by page, recording page and character offsets"""
+        return list(self.section_chunker.chunk_pages(pages, metadata=metadata))
     
     def enhance_metadata(self, documents: List[Document], additional_metadata: Dict[str, Any]) -> List[Document]:
         """Add additional metadata to all documents in the list"""
@@ -61,6 +40,17 @@ class DocumentProcessor:
             return self.chunk_insurance_doc(text, metadata=metadata)
         else:
             raise ValueError(f"Unknown chunking strategy: {chunk_strategy}")
+
+    def process_pages(self, pages: Iterable[str], metadata: Dict[str, Any], chunk_strategy: str = "default") -> List[Document]:
+        """Process a document given as page texts with the specified chunking strategy"""
+        if chunk_strategy == "default":
+            # The character splitter works on the whole text with whitespace collapsed
+            text = re.sub(r"\s+", " ", "\n".join(pages)).strip()
+            return self.chunk_text(text, metadata=metadata)
+        elif chunk_strategy == "insurance":
+            return self.chunk_pages(pages, metadata=metadata)
+        else:
+            raise ValueError(f"Unknown chunking strategy: {chunk_strategy}")
         
     def clean_chunks(self, chunks: List[Document]) -> List[Document]:
         """Clean up chunks - remove empty ones, trim whitespace"""
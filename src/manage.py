@@ -0,0 +1,105 @@
+from src.models.embeddings import EmbeddingModel
+from src.utils.vector_store import VectorStore, INDEX_TYPES
+from src.rag.bulk import BulkIngester
+from dotenv import load_dotenv
+import argparse
+import logging
+import os
+import time
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+def rebuild(args) -> None:
+    """Rebuild the persisted vector store, optionally as a different index type"""
+    if not os.path.exists(args.persist_dir):
+        raise SystemExit(f"Persist directory does not exist: {args.persist_dir}")
+
+    embedding_model = EmbeddingModel(model_type=args.embedding_model, cache_path=args.embedding_cache)
+    vector_store = VectorStore(embedding_model=embedding_model, db_type="faiss")
+    vector_store.load(args.persist_dir)
+
+    index_params = {
+        key: value
+        for key, value in {
+            "nlist": args.nlist,
+            "nprobe": args.nprobe,
+            "hnsw_m": args.hnsw_m,
+            "ef_construction": args.ef_construction,
+            "ef_search": args.ef_search,
+            "pq_m": args.pq_m,
+            "rescore_factor": args.rescore_factor,
+        }.items()
+        if value is not None
+    }
+    # Keep float32 rescoring as it is unless asked to change it
+    index_params["rescore"] = vector_store.is_rescored() if args.rescore is None else args.rescore
+
+    # Keep the current index type unless a new one is requested
+    index_type = args.index_type or vector_store.index_type
+
+    start = time.perf_counter()
+    store = vector_store.rebuild(index_type=index_type, index_params=index_params, persist_directory=args.persist_dir)
+    logger.info(f"Rebuilt {store.index.ntotal} vectors as {type(store.index).__name__} in {time.perf_counter() - start:.2f}s")
+
+def ingest(args) -> None:
+    """Bulk index every PDF under a directory, resuming any interrupted run"""
+    if not os.path.isdir(args.directory):
+        raise SystemExit(f"Directory does not exist: {args.directory}")
+
+    embedding_model = EmbeddingModel(model_type=args.embedding_model, cache_path=args.embedding_cache)
+    vector_store = VectorStore(embedding_model=embedding_model, db_type="faiss", index_type=args.index_type or "flat")
+    if os.path.exists(args.persist_dir):
+        vector_store.load(args.persist_dir)
+        # Keep the index type the store was configured for unless a new one is requested
+        if args.index_type:
+            vector_store.index_type = args.index_type
+
+    ingester = BulkIngester(
+        embedding_model=embedding_model,
+        vector_store=vector_store,
+        persist_directory=args.persist_dir,
+        chunk_strategy=args.chunk_strategy,
+        workers=args.workers,
+        embed_batch_size=args.batch_size
+    )
+    stats = ingester.ingest(args.directory)
+    logger.info(
+        f"Ingested {stats['indexed']} of {stats['files']} files ({stats['chunks']} chunks) in {stats['seconds']}s; "
+        f"{stats['skipped']} already indexed, {stats['failed']} failed"
+    )
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="AskMyDocs index management")
+    parser.add_argument("--persist-dir", default="data/vector_store", help="Vector store directory")
+    parser.add_argument("--embedding-model", default="deepseek", choices=["deepseek", "huggingface"])
+    parser.add_argument("--embedding-cache", default="data/embedding_cache.sqlite", help="Embedding cache path")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rebuild_parser = subparsers.add_parser("rebuild", help="Retrain and rebuild the ANN index")
+    rebuild_parser.add_argument("--index-type", choices=list(INDEX_TYPES), help="Index type to rebuild as")
+    rebuild_parser.add_argument("--nlist", type=int, help="IVF cells")
+    rebuild_parser.add_argument("--nprobe", type=int, help="IVF cells visited per query")
+    rebuild_parser.add_argument("--hnsw-m", type=int, help="HNSW graph degree")
+    rebuild_parser.add_argument("--ef-construction", type=int, help="HNSW build-time candidate list size")
+    rebuild_parser.add_argument("--ef-search", type=int, help="HNSW query-time candidate list size")
+    rebuild_parser.add_argument("--pq-m", type=int, help="PQ sub-quantizers")
+    rebuild_parser.add_argument("--rescore", action=argparse.BooleanOptionalAction, help="Re-rank compressed index results with exact float32 vectors")
+    rebuild_parser.add_argument("--rescore-factor", type=int, help="Candidates re-ranked per result when rescoring")
+    rebuild_parser.set_defaults(func=rebuild)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Bulk index a directory of PDFs")
+    ingest_parser.add_argument("directory", help="Directory to search for PDFs")
+    ingest_parser.add_argument("--workers", type=int, help="Parsing processes (default: CPU count)")
+    ingest_parser.add_argument("--batch-size", type=int, default=512, help="Chunks embedded and stored per batch")
+    ingest_parser.add_argument("--chunk-strategy", default="insurance", choices=["default", "insurance"])
+    ingest_parser.add_argument("--index-type", choices=list(INDEX_TYPES), help="Index type to build")
+    ingest_parser.set_defaults(func=ingest)
+
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    args.func(args)
@@ -0,0 +1,104 @@
+from langchain_core.embeddings import Embeddings
+from typing import Dict, List, Sequence
+import asyncio
+import hashlib
+import numpy as np
+import os
+import sqlite3
+import threading
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that stores document vectors on disk keyed by hash(model, text)"""
+
+    # SQLite limits the number of bound parameters per statement
+    _LOOKUP_BATCH = 500
+
+    def __init__(self, embeddings: Embeddings, cache_path: str, namespace: str):
+        self.embeddings = embeddings
+        self.cache_path = cache_path
+        # Identifies the embedding model so vectors from different models never mix
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+
+    def _key(self, text: str) -> str:
+        """Content address of a text for this model"""
+        return hashlib.sha256(f"{self.namespace}\0{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """Fetch cached vectors for the given keys"""
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), self._LOOKUP_BATCH):
+                batch = keys[i:i + self._LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def _store(self, items: Dict[str, List[float]]) -> None:
+        """Persist newly computed vectors"""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()]
+            )
+            self._conn.commit()
+
+    def _split(self, texts: List[str]):
+        """Resolve cached vectors and list the unique texts that still need embedding"""
+        keys = [self._key(text) for text in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing[key] = text
+        with self._lock:
+            self.hits += len(texts) - sum(1 for key in keys if key in missing)
+            self.misses += len(missing)
+        return keys, found, missing
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Get embeddings for documents, only calling the model for unseen texts"""
+        keys, found, missing = self._split(texts)
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self._store(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Get embeddings for documents asynchronously, only calling the model for unseen texts"""
+        # The SQLite lookup and commit run in a worker thread so they never block the event loop
+        keys, found, missing = await asyncio.to_thread(self._split, texts)
+        if missing:
+            vectors = await self.embeddings.aembed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            await asyncio.to_thread(self._store, computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Get embedding for a single query"""
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Get embedding for a single query asynchronously"""
+        return await self.embeddings.aembed_query(text)
+
+    def close(self) -> None:
+        """Close the cache database"""
+        with self._lock:
+            self._conn.close()
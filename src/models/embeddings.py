@@ -1,6 +1,14 @@
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_core.embeddings import Embeddings
-from typing import List
+from src.models.http_client import get_async_client
+from src.models.embedding_cache import CachedEmbeddings
+from src.utils.metrics import metrics
+from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import asyncio
+import httpx
 import os
 import requests
 from dotenv import load_dotenv
@@ -10,46 +18,142 @@ load_dotenv()
 class DeepSeekEmbeddings(Embeddings):
     """Custom embeddings class for DeepSeek API"""
 
-    def __init__(self, api_key=None):
+    def __init__(
+        self,
+        api_key=None,
+        api_url: Optional[str] = None,
+        model: str = "deepseek-embed",
+        batch_size: int = 64,
+        max_concurrency: int = 4,
+        timeout: float = 30.0,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+    ):
         self.api_key = api_key or os.getenv("DEEPSEEK_API_KEY")
         if not self.api_key:
             raise ValueError("DeepSeek API key is required")
-        self.api_url = "https://api.deepseek.com/v1/embeddings"
+        self.api_url = api_url or os.getenv("DEEPSEEK_EMBEDDINGS_URL", "https://api.deepseek.com/v1/embeddings")
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
 
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """Get embeddings for a list of documents"""
-        results = []
-        for text in texts:
-            results.append(self.embed_query(text))
-        return results
-    
-    def embed_query(self, text: str) -> List[float]:
-        """Get embedding for a single query"""
-        headers = {
+        # Pooled keep-alive session, retrying transient failures with exponential backoff
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["POST"]),
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        self.session.headers.update(self.headers)
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Get embeddings for one batch of texts in a single request"""
         payload = {
-            "text": text,
-            "model": "deepseek-embed"
+            "input": texts,
+            "model": self.model
         }
 
-        response = requests.post(self.api_url, headers=headers, json=payload)
+        response = self.session.post(self.api_url, json=payload, timeout=self.timeout)
+        metrics.increment("api_calls_total", service="embeddings", status=response.status_code)
         if response.status_code != 200:
             raise ValueError(f"Error from DeepSeek API: {response.text}")
-        data = response.json()
-        return data["data"][0]["embedding"]
+        return self._parse_embeddings(response.json())
+
+    @staticmethod
+    def _parse_embeddings(data: dict) -> List[List[float]]:
+        """Extract embeddings from an API response in input order"""
+        # The API may return items out of order, so sort by their input index
+        items = sorted(data["data"], key=lambda item: item.get("index", 0))
+        return [item["embedding"] for item in items]
+
+    async def _aembed_batch(self, texts: List[str], client: Optional[httpx.AsyncClient] = None) -> List[List[float]]:
+        """Get embeddings for one batch of texts without blocking the event loop"""
+        client = client or get_async_client()
+        payload = {
+            "input": texts,
+            "model": self.model
+        }
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await client.post(self.api_url, headers=self.headers, json=payload, timeout=self.timeout)
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+            else:
+                metrics.increment("api_calls_total", service="embeddings", status=response.status_code)
+                if response.status_code == 200:
+                    return self._parse_embeddings(response.json())
+                if response.status_code not in (429, 500, 502, 503, 504) or attempt == self.max_retries:
+                    raise ValueError(f"Error from DeepSeek API: {response.text}")
+
+            # Back off exponentially before retrying a transient failure
+            await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Get embeddings for a list of documents"""
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1 or self.max_concurrency == 1:
+            batch_results = [self._embed_batch(batch) for batch in batches]
+        else:
+            # Send a bounded number of batches concurrently, keeping results in order
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+                batch_results = list(executor.map(self._embed_batch, batches))
+
+        return [embedding for batch in batch_results for embedding in batch]
+    
+    def embed_query(self, text: str) -> List[float]:
+        """Get embedding for a single query"""
+        return self._embed_batch([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Get embeddings for a list of documents asynchronously"""
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await self._aembed_batch(batch)
+
+        batch_results = await asyncio.gather(*(embed_batch(batch) for batch in batches))
+        return [embedding for batch in batch_results for embedding in batch]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Get embedding for a single query asynchronously"""
+        return (await self._aembed_batch([text]))[0]
 
 class EmbeddingModel:
-    def __init__(self, model_type="deepseek"):
+    def __init__(self, model_type="deepseek", cache_path: Optional[str] = None, **kwargs):
         self.model_type = model_type
         
         if model_type == "deepseek":
-            self.model = DeepSeekEmbeddings()
+            # Extra keyword arguments tune batching, concurrency and retries
+            self.model = DeepSeekEmbeddings(**kwargs)
+            namespace = f"deepseek:{self.model.model}"
         elif model_type == "huggingface":
             self.model = HuggingFaceEmbeddings(model_name = "sentence-transformers/all-mpnet-base-v2")
+            namespace = f"huggingface:{self.model.model_name}"
         else:
             raise ValueError("Unsupported model type. Choose 'deepseek' or 'huggingface'.")
+
+        # Identifies the model in cache keys
+        self.namespace = namespace
+
+        # Wrap the backend with a persistent cache so unchanged chunks are never re-embedded
+        if cache_path:
+            self.model = CachedEmbeddings(self.model, cache_path=cache_path, namespace=namespace)
         
     def embed_text(self, text: str) -> List[float]:
         """Convert a single text into an embedding vector"""
@@ -58,3 +162,12 @@ class EmbeddingModel:
     def embed_documents(self, documents: List[str]) -> List[List[float]]:
         """Convert a list of documents into embedding vectors"""
         return self.model.embed_documents(documents)
+
+    async def aembed_text(self, text: str) -> List[float]:
+        """Convert a single text into an embedding vector asynchronously"""
+        return await self.model.aembed_query(text)
+
+    async def aembed_documents(self, documents: List[str]) -> List[List[float]]:
+        """Convert a list of documents into embedding vectors asynchronously"""
+        return await self.model.aembed_documents(documents)
+
@@ -0,0 +1,26 @@
+from typing import Optional
+import httpx
+import os
+
+_async_client: Optional[httpx.AsyncClient] = None
+
+def get_async_client() -> httpx.AsyncClient:
+    """Get the process-wide async HTTP client, creating it on first use"""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        max_connections = int(os.getenv("HTTP_MAX_CONNECTIONS", "200"))
+        _async_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            timeout=httpx.Timeout(float(os.getenv("HTTP_TIMEOUT", "60")), connect=10.0),
+        )
+    return _async_client
+
+async def close_async_client() -> None:
+    """Close the shared async HTTP client and its pooled connections"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
@@ -1,10 +1,13 @@
 from langchain_core.language_models.llms import BaseLLM
 import os 
+import json
 import requests
 from dotenv import load_dotenv
-from typing import List, Dict, Any, Optional, ClassVar
+from typing import List, Dict, Any, Optional, ClassVar, Tuple, AsyncIterator
 from langchain_core.outputs import LLMResult, Generation
-from langchain_core.callbacks.manager import CallbackManagerForLLMRun
+from langchain_core.callbacks.manager import CallbackManagerForLLMRun, AsyncCallbackManagerForLLMRun
+from src.models.http_client import get_async_client
+from src.utils.metrics import metrics, timed_stage
 from pydantic import Field, PrivateAttr
 
 load_dotenv()
@@ -18,7 +21,7 @@ class DeepSeekLLM(BaseLLM):
     _api_key: str = PrivateAttr()
     _api_url: str = PrivateAttr(default="https://api.deepseek.com/v1/chat/completions")
 
-    def __init__(self, model_name="deepseek-chat", temperature=0.0, api_key=None, **kwargs):
+    def __init__(self, model_name="deepseek-chat", temperature=0.0, api_key=None, api_url=None, **kwargs):
         # Initialize with Pydantic fields
         super().__init__(model_name=model_name, temperature=temperature, **kwargs)
         
@@ -26,7 +29,7 @@ class DeepSeekLLM(BaseLLM):
         self._api_key = api_key or os.getenv("DEEPSEEK_API_KEY")
         if not self._api_key:
             raise ValueError("DeepSeek API key is required")
-        self._api_url = "https://api.deepseek.com/v1/chat/completions"
+        self._api_url = api_url or os.getenv("DEEPSEEK_CHAT_URL", "https://api.deepseek.com/v1/chat/completions")
 
     def _call(self, prompt: str, stop: Optional[List[str]] = None, 
               run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs) -> str:
@@ -34,8 +37,8 @@ class DeepSeekLLM(BaseLLM):
         messages = [{"role": "user", "content": prompt}]
         return self._generate_response(messages)
     
-    def _generate_response(self, messages: List[Dict[str, str]]) -> str:
-        """Generate a response from the DeepSeek API"""
+    def _build_request(self, messages: List[Dict[str, str]]) -> Tuple[Dict[str, str], Dict[str, Any]]:
+        """Build the headers and payload for a chat completion request"""
         headers = {
             "Authorization": f"Bearer {self._api_key}",
             "Content-Type": "application/json"
@@ -45,13 +48,68 @@ class DeepSeekLLM(BaseLLM):
             "messages": messages,
             "temperature": self.temperature
         }
+        return headers, payload
+
+    def _generate_response(self, messages: List[Dict[str, str]]) -> str:
+        """Generate a response from the DeepSeek API"""
+        headers, payload = self._build_request(messages)
 
         response = requests.post(self._api_url, headers=headers, json=payload)
+        metrics.increment("api_calls_total", service="llm", status=response.status_code)
+        if response.status_code != 200:
+            raise ValueError(f"Error from DeepSeek API: {response.text}")
+        data = response.json()
+        self._record_usage(data)
+        return data["choices"][0]["message"]["content"]
+
+    async def _agenerate_response(self, messages: List[Dict[str, str]]) -> str:
+        """Generate a response from the DeepSeek API without blocking the event loop"""
+        headers, payload = self._build_request(messages)
+
+        response = await get_async_client().post(self._api_url, headers=headers, json=payload)
+        metrics.increment("api_calls_total", service="llm", status=response.status_code)
         if response.status_code != 200:
             raise ValueError(f"Error from DeepSeek API: {response.text}")
         data = response.json()
+        self._record_usage(data)
         return data["choices"][0]["message"]["content"]
+
+    async def _astream_response(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Stream response tokens from the DeepSeek API as they are generated"""
+        headers, payload = self._build_request(messages)
+        payload["stream"] = True
+        # Ask for token usage in the final chunk
+        payload["stream_options"] = {"include_usage": True}
+
+        async with get_async_client().stream("POST", self._api_url, headers=headers, json=payload) as response:
+            metrics.increment("api_calls_total", service="llm", status=response.status_code)
+            if response.status_code != 200:
+                body = await response.aread()
+                raise ValueError(f"Error from DeepSeek API: {body.decode(errors='replace')}")
+
+            # Server-sent events: one "data: {...}" line per chunk, ending with "data: [DONE]"
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                self._record_usage(chunk)
+                if not chunk.get("choices"):
+                    continue
+                content = chunk["choices"][0].get("delta", {}).get("content")
+                if content:
+                    yield content
     
+    @staticmethod
+    def _record_usage(data: Dict[str, Any]) -> None:
+        """Count the prompt and completion tokens reported by the API"""
+        usage = data.get("usage") or {}
+        for kind in ("prompt", "completion"):
+            if usage.get(f"{kind}_tokens"):
+                metrics.increment("llm_tokens_total", usage[f"{kind}_tokens"], kind=kind)
+
     def _generate(
         self,
         prompts: List[str],
@@ -66,6 +124,20 @@ class DeepSeekLLM(BaseLLM):
             generations.append([Generation(text=text)])
         return LLMResult(generations=generations)
     
+    async def _agenerate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs
+    ) -> LLMResult:
+        """Generate text from a list of prompts asynchronously."""
+        generations = []
+        for prompt in prompts:
+            text = await self._agenerate_response([{"role": "user", "content": prompt}])
+            generations.append([Generation(text=text)])
+        return LLMResult(generations=generations)
+
     @property
     def _llm_type(self) -> str:
         return "deepseek"
@@ -85,12 +157,54 @@ class LLMService:
         ]
 
         try:
-            response = self.llm._generate_response(messages)
+            with timed_stage("llm"):
+                response = self.llm._generate_response(messages)
             return response
         except Exception as e:
             raise RuntimeError(f"Error generating response: {str(e)}")
         
+    async def agenerate_response(self, system_prompt: str, user_prompt: str) -> str:
+        """Generate a response using the DeepSeek API asynchronously"""
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+        try:
+            with timed_stage("llm"):
+                return await self.llm._agenerate_response(messages)
+        except Exception as e:
+            raise RuntimeError(f"Error generating response: {str(e)}")
+
+    @staticmethod
+    def build_context_prompt(context: str, query: str) -> str:
+        """Build the user prompt that combines retrieved context and the question"""
+        return f"Context information is below:\n{context}\n\nGiven the context, please answer the question: {query}"
+        
     def generate_with_context(self, system_prompt: str, context: str, query: str) -> str:
         """Generate a response with context"""
-        user_prompt = f"Context information is below:\n{context}\n\nGiven the context, please answer the question: {query}"
-        return self.generate_response(system_prompt, user_prompt)
\ No newline at end of file
+        user_prompt = self.build_context_prompt(context, query)
+        return self.generate_response(system_prompt, user_prompt)
+
+    async def agenerate_with_context(self, system_prompt: str, context: str, query: str) -> str:
+        """Generate a response with context asynchronously"""
+        user_prompt = self.build_context_prompt(context, query)
+        return await self.agenerate_response(system_prompt, user_prompt)
+
+    async def astream_with_context(self, system_prompt: str, context: str, query: str) -> AsyncIterator[str]:
+        """Stream a response with context token by token"""
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": self.build_context_prompt(context, query)}
+        ]
+
+        try:
+            with timed_stage("llm"):
+                with timed_stage("llm_first_token"):
+                    stream = self.llm._astream_response(messages)
+                    token = await anext(stream, None)
+                while token is not None:
+                    yield token
+                    token = await anext(stream, None)
+        except Exception as e:
+            raise RuntimeError(f"Error generating response: {str(e)}")
\ No newline at end of file
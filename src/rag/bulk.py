@@ -0,0 +1,155 @@
+from src.data.processor import DocumentProcessor
+from src.models.embeddings import EmbeddingModel
+from src.rag.indexing import MANIFEST_FILE, parse_pdf, chunk_pdf_pages
+from src.rag.manifest import IndexManifest
+from src.utils.vector_store import VectorStore
+from concurrent.futures import ProcessPoolExecutor, Future
+from collections import deque
+from langchain_core.documents import Document
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+def parse_and_chunk(pdf_path: str, chunk_strategy: str) -> Tuple[str, List[Document], List[str]]:
+    """Hash, parse and chunk one PDF; runs in a worker process"""
+    # Hashing here rather than in the parent spreads it across the workers
+    doc_id = IndexManifest.hash_file(pdf_path)
+    # Files are already parsed in parallel, so each one is read by a single process
+    pages, doc_metadata = parse_pdf(pdf_path, workers=1)
+    chunks, chunk_ids = chunk_pdf_pages(DocumentProcessor(), pages, pdf_path, doc_id, doc_metadata, chunk_strategy=chunk_strategy)
+    return doc_id, chunks, chunk_ids
+
+class BulkIngester:
+    """Index a directory of PDFs in one resumable pass"""
+
+    def __init__(
+        self,
+        embedding_model: EmbeddingModel,
+        vector_store: VectorStore,
+        persist_directory: str,
+        chunk_strategy: str = "insurance",
+        workers: Optional[int] = None,
+        embed_batch_size: int = 512,
+    ):
+        self.embedding_model = embedding_model
+        self.vector_store = vector_store
+        self.persist_directory = persist_directory
+        self.chunk_strategy = chunk_strategy
+        self.workers = workers or os.cpu_count() or 1
+        # Chunks from several documents are embedded and stored together once this many accumulate
+        self.embed_batch_size = embed_batch_size
+        self.manifest = IndexManifest(os.path.join(persist_directory, MANIFEST_FILE))
+
+    @staticmethod
+    def find_pdfs(directory: str) -> List[str]:
+        """Recursively list the PDFs under a directory in a stable order"""
+        paths = []
+        for root, _, files in os.walk(directory):
+            paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(".pdf"))
+        return sorted(paths)
+
+    def _pending_files(self, paths: List[str]) -> Iterator[Tuple[str, Tuple[int, int]]]:
+        """Yield (path, (size, mtime)) for files that are new or changed since a previous run"""
+        # Unchanged files are recognised by path, size and modification time, so a resume hashes only new or changed ones
+        indexed = {
+            (entry.get("source"), entry.get("size"), entry.get("mtime_ns"))
+            for entry in self.manifest.documents.values()
+            if "mtime_ns" in entry
+        }
+        for path in paths:
+            stat = os.stat(path)
+            if (path, stat.st_size, stat.st_mtime_ns) not in indexed:
+                yield path, (stat.st_size, stat.st_mtime_ns)
+
+    def ingest(self, directory: str) -> Dict[str, Any]:
+        """Parse PDFs in parallel processes, embed in cross-document batches and build one index"""
+        start = time.perf_counter()
+        paths = self.find_pdfs(directory)
+        stats = {"files": len(paths), "indexed": 0, "skipped": 0, "failed": 0, "chunks": 0}
+
+        if self.vector_store.store is None and os.path.exists(self.persist_directory):
+            self.vector_store.load(self.persist_directory)
+
+        # Keep every flush as an append segment and fold them into the base index once at the end
+        max_segments = self.vector_store.max_segments
+        self.vector_store.max_segments = float("inf")
+
+        batch: List[Tuple[str, Tuple[int, int], str, List[Document], List[str]]] = []
+        batch_chunks = 0
+        seen = set()
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                in_flight: "deque[Tuple[str, Tuple[int, int], Future]]" = deque()
+                pending = self._pending_files(paths)
+
+                def submit_next() -> bool:
+                    for path, file_stat in pending:
+                        in_flight.append((path, file_stat, executor.submit(parse_and_chunk, path, self.chunk_strategy)))
+                        return True
+                    return False
+
+                # Bound the number of parsed documents held in memory at once
+                for _ in range(self.workers * 2):
+                    if not submit_next():
+                        break
+
+                while in_flight:
+                    path, file_stat, future = in_flight.popleft()
+                    submit_next()
+                    try:
+                        doc_id, chunks, chunk_ids = future.result()
+                    except Exception as e:
+                        logger.error(f"Failed to parse {path}: {e}")
+                        stats["failed"] += 1
+                        continue
+
+                    # A touched or copied file whose content is already indexed is skipped
+                    if doc_id in self.manifest or doc_id in seen:
+                        continue
+                    seen.add(doc_id)
+                    batch.append((path, file_stat, doc_id, chunks, chunk_ids))
+                    batch_chunks += len(chunks)
+                    if batch_chunks >= self.embed_batch_size:
+                        stats["chunks"] += self._flush(batch)
+                        stats["indexed"] += len(batch)
+                        batch, batch_chunks = [], 0
+
+                if batch:
+                    stats["chunks"] += self._flush(batch)
+                    stats["indexed"] += len(batch)
+        finally:
+            self.vector_store.max_segments = max_segments
+
+        stats["skipped"] = stats["files"] - stats["indexed"] - stats["failed"]
+        self._finalise()
+        stats["seconds"] = round(time.perf_counter() - start, 2)
+        return stats
+
+    def _flush(self, batch: List[Tuple[str, Tuple[int, int], str, List[Document], List[str]]]) -> int:
+        """Embed and store a batch of documents, then mark them completed"""
+        chunks = [chunk for _, _, _, doc_chunks, _ in batch for chunk in doc_chunks]
+        chunk_ids = [chunk_id for _, _, _, _, doc_chunk_ids in batch for chunk_id in doc_chunk_ids]
+
+        if chunks:
+            embeddings = self.embedding_model.embed_documents([chunk.page_content for chunk in chunks])
+            self.vector_store.add_documents(chunks, persist_directory=self.persist_directory, ids=chunk_ids, embeddings=embeddings)
+
+        # Only record documents once their vectors are on disk, so an interrupted run resumes cleanly
+        self.manifest.add_many({
+            doc_id: {"source": path, "size": size, "mtime_ns": mtime_ns, "chunks": len(doc_chunks), "chunk_ids": doc_chunk_ids}
+            for path, (size, mtime_ns), doc_id, doc_chunks, doc_chunk_ids in batch
+        })
+        logger.info(f"Indexed {len(batch)} documents ({len(chunks)} chunks)")
+        return len(chunks)
+
+    def _finalise(self) -> None:
+        """Train the configured index type on the full corpus and write a single base index"""
+        if not self.vector_store.store:
+            return
+        if self.vector_store.current_index_type() != self.vector_store.index_type or self.vector_store.needs_retrain():
+            self.vector_store.rebuild(persist_directory=self.persist_directory)
+        else:
+            self.vector_store.compact(self.persist_directory)
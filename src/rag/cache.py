@@ -0,0 +1,359 @@
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
+import copy
+import hashlib
+import numpy as np
+import os
+import re
+import sqlite3
+import threading
+import time
+
+def normalize_query(query: str) -> str:
+    """Normalise a query so trivially different phrasings share a cache key"""
+    normalized = re.sub(r"\s+", " ", query.strip().lower())
+    return normalized.rstrip("?!. ")
+
+class AnswerCache:
+    """LRU/TTL cache of generated answers, matched exactly or by query embedding similarity"""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0, similarity_threshold: Optional[float] = 0.95):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Cosine similarity above which two queries share an answer; None disables semantic matching
+        self.similarity_threshold = similarity_threshold
+
+        self.index_version = None
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+        self._entries: "OrderedDict[Tuple[str, int], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Stacked unit embeddings for vectorised similarity lookups, rebuilt lazily
+        self._matrix = None
+        self._matrix_keys: List[Tuple[str, int]] = []
+
+    @property
+    def semantic(self) -> bool:
+        """Whether near-duplicate queries are matched by embedding"""
+        return self.similarity_threshold is not None
+
+    def get(self, query: str, top_k: int, index_version) -> Optional[Dict[str, Any]]:
+        """Look up an answer for the exact normalised query"""
+        with self._lock:
+            current = self._check_version(index_version)
+            key = (normalize_query(query), top_k)
+            entry = self._live_entry(key) if current else None
+            if entry is None:
+                if not self.semantic:
+                    self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry["result"])
+
+    def get_similar(self, embedding: List[float], top_k: int, index_version) -> Optional[Dict[str, Any]]:
+        """Look up an answer for a near-duplicate query by cosine similarity"""
+        with self._lock:
+            if not self._check_version(index_version):
+                self.misses += 1
+                return None
+            if self._matrix is None:
+                self._rebuild_matrix()
+            if not self._matrix_keys:
+                self.misses += 1
+                return None
+
+            query_vector = self._unit(embedding)
+            scores = self._matrix @ query_vector
+
+            # Consider candidates from best to worst, skipping other top_k values and expired entries
+            for position in np.argsort(-scores):
+                if scores[position] < self.similarity_threshold:
+                    break
+                key = self._matrix_keys[position]
+                if key[1] != top_k:
+                    continue
+                entry = self._live_entry(key)
+                if entry is None:
+                    continue
+
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.semantic_hits += 1
+                return copy.deepcopy(entry["result"])
+
+            self.misses += 1
+            return None
+
+    def put(self, query: str, top_k: int, index_version, result: Dict[str, Any], embedding: Optional[List[float]] = None) -> None:
+        """Store an answer computed against the given index version"""
+        with self._lock:
+            # Drop results computed against an index that has since changed
+            if not self._check_version(index_version):
+                return
+
+            key = (normalize_query(query), top_k)
+            self._entries[key] = {
+                "result": copy.deepcopy(result),
+                "embedding": self._unit(embedding) if embedding is not None else None,
+                "expires_at": time.monotonic() + self.ttl_seconds,
+            }
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def clear(self) -> None:
+        """Remove all cached answers"""
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit and miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _check_version(self, index_version) -> bool:
+        """Invalidate everything when the vector store has changed; False for a version older than the cached one"""
+        # Versions only increase, so an older one comes from a request that started before the latest update
+        if self.index_version is not None and index_version is not None and index_version < self.index_version:
+            return False
+        if index_version != self.index_version:
+            self._entries.clear()
+            self._matrix = None
+            self.index_version = index_version
+        return True
+
+    def _live_entry(self, key: Tuple[str, int]) -> Optional[Dict[str, Any]]:
+        """Get an entry, evicting it if its TTL has passed"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry["expires_at"] < time.monotonic():
+            del self._entries[key]
+            self._matrix = None
+            return None
+        return entry
+
+    def _rebuild_matrix(self) -> None:
+        """Stack the cached query embeddings into one matrix"""
+        keys = [key for key, entry in self._entries.items() if entry["embedding"] is not None]
+        self._matrix_keys = keys
+        self._matrix = np.stack([self._entries[key]["embedding"] for key in keys]) if keys else np.empty((0, 0), dtype=np.float32)
+
+    @staticmethod
+    def _unit(embedding: List[float]) -> np.ndarray:
+        """Normalise an embedding to unit length for cosine similarity"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+class QueryEmbeddingCache:
+    """LRU/TTL cache of query embeddings, optionally backed by a SQLite file shared between worker processes"""
+
+    # Puts between sweeps of expired and excess rows from the disk tier
+    _PRUNE_INTERVAL = 256
+    # Keys looked up per statement, to stay under SQLite's limit on bound parameters
+    _LOOKUP_BATCH = 500
+
+    def __init__(self, namespace: str, max_entries: int = 4096, ttl_seconds: float = 86400.0, path: Optional[str] = None, max_disk_entries: int = 100000):
+        # Identifies the embedding model so vectors from different models never mix
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        # Wall-clock expiry times, so entries written by one process expire correctly in another
+        self._entries: "OrderedDict[str, Tuple[List[float], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Separate from the memory lock, so a lookup that hits memory never waits for another thread's disk write
+        self._disk_lock = threading.Lock()
+        self._puts = 0
+        self._conn = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS query_embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, expires_at REAL NOT NULL)")
+            self._conn.commit()
+
+    def _key(self, query: str) -> str:
+        """Cache key of a query for this embedding model"""
+        return hashlib.sha256(f"{self.namespace}\0{normalize_query(query)}".encode("utf-8")).hexdigest()
+
+    def get(self, query: str) -> Optional[List[float]]:
+        """Look up the embedding of a query, checking memory before disk"""
+        return self.get_many([query])[0]
+
+    def get_many(self, queries: List[str]) -> List[Optional[List[float]]]:
+        """Look up the embeddings of several queries, reading any that miss memory from disk in one statement"""
+        keys, embeddings, missing = self._memory_lookup(queries)
+        if missing and self._conn is not None:
+            self._fill_from_disk(keys, embeddings, missing, self._disk_lookup([keys[i] for i in missing]))
+        return self._count_misses(embeddings)
+
+    async def aget(self, query: str) -> Optional[List[float]]:
+        """Look up the embedding of a query without blocking the event loop on the disk tier"""
+        return (await self.aget_many([query]))[0]
+
+    async def aget_many(self, queries: List[str]) -> List[Optional[List[float]]]:
+        """Look up several embeddings, checking memory inline and reading disk in a worker thread"""
+        keys, embeddings, missing = self._memory_lookup(queries)
+        if missing and self._conn is not None:
+            found = await asyncio.to_thread(self._disk_lookup, [keys[i] for i in missing])
+            self._fill_from_disk(keys, embeddings, missing, found)
+        return self._count_misses(embeddings)
+
+    def put(self, query: str, embedding: List[float]) -> None:
+        """Store the embedding of a query in memory and, if configured, on disk"""
+        self.put_many([query], [embedding])
+
+    def put_many(self, queries: List[str], embeddings: List[List[float]]) -> None:
+        """Store several embeddings, writing them to disk in one transaction"""
+        rows = self._memory_store(queries, embeddings)
+        if self._conn is not None:
+            self._disk_store(rows)
+
+    async def aput(self, query: str, embedding: List[float]) -> None:
+        """Store the embedding of a query without blocking the event loop on the disk tier"""
+        await self.aput_many([query], [embedding])
+
+    async def aput_many(self, queries: List[str], embeddings: List[List[float]]) -> None:
+        """Store several embeddings in memory inline and on disk in a worker thread"""
+        rows = self._memory_store(queries, embeddings)
+        if self._conn is not None:
+            await asyncio.to_thread(self._disk_store, rows)
+
+    def _memory_lookup(self, queries: List[str]) -> Tuple[List[str], List[Optional[List[float]]], List[int]]:
+        """Resolve queries from the in-memory tier, returning their keys, the hits and the positions that missed"""
+        keys = [self._key(query) for query in queries]
+        now = time.time()
+        embeddings: List[Optional[List[float]]] = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] >= now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    embeddings.append(entry[0])
+                    continue
+                if entry is not None:
+                    del self._entries[key]
+                embeddings.append(None)
+        return keys, embeddings, [i for i, embedding in enumerate(embeddings) if embedding is None]
+
+    def _disk_lookup(self, keys: List[str]) -> Dict[str, Tuple[List[float], float]]:
+        """Read unexpired embeddings for the given keys from the disk tier"""
+        now = time.time()
+        rows = []
+        with self._disk_lock:
+            if self._conn is None:
+                return {}
+            for start in range(0, len(keys), self._LOOKUP_BATCH):
+                batch = keys[start:start + self._LOOKUP_BATCH]
+                placeholders = ", ".join("?" * len(batch))
+                rows.extend(self._conn.execute(
+                    f"SELECT key, vector, expires_at FROM query_embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall())
+        return {
+            key: (np.frombuffer(vector, dtype=np.float32).tolist(), expires_at)
+            for key, vector, expires_at in rows
+            if expires_at >= now
+        }
+
+    def _fill_from_disk(self, keys: List[str], embeddings: List[Optional[List[float]]], missing: List[int], found: Dict[str, Tuple[List[float], float]]) -> None:
+        """Place embeddings read from disk in the results and promote them to memory"""
+        with self._lock:
+            for position in missing:
+                entry = found.get(keys[position])
+                if entry is not None:
+                    self._remember(keys[position], *entry)
+                    embeddings[position] = entry[0]
+                    self.hits += 1
+                    self.disk_hits += 1
+
+    def _count_misses(self, embeddings: List[Optional[List[float]]]) -> List[Optional[List[float]]]:
+        """Record the lookups that found nothing"""
+        with self._lock:
+            self.misses += sum(embedding is None for embedding in embeddings)
+        return embeddings
+
+    def _memory_store(self, queries: List[str], embeddings: List[List[float]]) -> List[Tuple[str, bytes, float]]:
+        """Store embeddings in memory, returning the rows to write to disk"""
+        expires_at = time.time() + self.ttl_seconds
+        rows = []
+        with self._lock:
+            for query, embedding in zip(queries, embeddings):
+                key = self._key(query)
+                self._remember(key, list(embedding), expires_at)
+                rows.append((key, np.asarray(embedding, dtype=np.float32).tobytes(), expires_at))
+        return rows
+
+    def _disk_store(self, rows: List[Tuple[str, bytes, float]]) -> None:
+        """Write embeddings to the disk tier with a single commit"""
+        with self._disk_lock:
+            if self._conn is None or not rows:
+                return
+            self._conn.executemany("INSERT OR REPLACE INTO query_embeddings (key, vector, expires_at) VALUES (?, ?, ?)", rows)
+            previous, self._puts = self._puts, self._puts + len(rows)
+            if previous // self._PRUNE_INTERVAL != self._puts // self._PRUNE_INTERVAL:
+                self._prune_disk()
+            self._conn.commit()
+
+    def clear(self) -> None:
+        """Remove all cached embeddings from memory"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit and miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def close(self) -> None:
+        """Close the disk tier"""
+        with self._disk_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _remember(self, key: str, embedding: List[float], expires_at: float) -> None:
+        """Add an entry to the in-memory tier, evicting the least recently used"""
+        self._entries[key] = (embedding, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _prune_disk(self) -> None:
+        """Delete expired rows and the soonest-expiring rows beyond the disk limit"""
+        self._conn.execute("DELETE FROM query_embeddings WHERE expires_at < ?", (time.time(),))
+        self._conn.execute(
+            "DELETE FROM query_embeddings WHERE key IN "
+            "(SELECT key FROM query_embeddings ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        )
@@ -0,0 +1,92 @@
+from src.utils.vector_store import VectorStore
+from src.utils.metrics import metrics
+from typing import Callable, Optional
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class BackgroundCompactor:
+    """Worker thread that purges deleted chunks from the vector store, retrains an index the corpus has outgrown, and picks up other workers' changes"""
+
+    def __init__(self, get_vector_store: Callable[[], VectorStore], persist_directory: Optional[str] = None, interval_seconds: float = 60.0, min_deleted_ratio: float = 0.1, refresh_seconds: float = 5.0):
+        # Called on every check, so an index swapped in after start-up is the one compacted
+        self.get_vector_store = get_vector_store
+        self.persist_directory = persist_directory
+        self.interval_seconds = interval_seconds
+        # Share of the index that must be deleted chunks before a purge is worth rebuilding for
+        self.min_deleted_ratio = min_deleted_ratio
+        # How often to check the persist directory for chunks, deletions and saves written by other worker processes
+        self.refresh_seconds = refresh_seconds
+
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the worker thread"""
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="index-compactor", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the worker thread, letting a purge in progress finish"""
+        if self._thread is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def trigger(self) -> None:
+        """Check for deleted chunks now rather than at the next interval"""
+        self._wake.set()
+
+    def refresh(self) -> bool:
+        """Load what other processes wrote to the persist directory, returning whether there was anything"""
+        if not self.persist_directory:
+            return False
+        return self.get_vector_store().refresh(self.persist_directory)
+
+    def compact_if_needed(self) -> bool:
+        """Retrain an outgrown index, or purge deleted chunks if they exceed the threshold, returning whether either ran"""
+        vector_store = self.get_vector_store()
+        if vector_store.needs_retrain():
+            start = time.perf_counter()
+            # A full rebuild also drops any deleted chunks
+            vector_store.rebuild(persist_directory=self.persist_directory)
+            metrics.increment("index_retrains_total")
+            logger.info(f"Retrained the {vector_store.index_type} index on {vector_store.trained_size} vectors in {time.perf_counter() - start:.2f}s")
+            return True
+
+        if not vector_store.deleted or vector_store.deleted_ratio < self.min_deleted_ratio:
+            return False
+
+        start = time.perf_counter()
+        deleted = len(vector_store.deleted)
+        vector_store.purge(persist_directory=self.persist_directory)
+        metrics.increment("index_compactions_total")
+        logger.info(f"Purged {deleted} deleted chunks from the index in {time.perf_counter() - start:.2f}s")
+        return True
+
+    def _run(self) -> None:
+        """Check periodically, or when triggered, until stopped"""
+        next_check = time.monotonic() + self.interval_seconds
+        while True:
+            triggered = self._wake.wait(max(min(self.refresh_seconds, next_check - time.monotonic()), 0))
+            self._wake.clear()
+            if self._stopping:
+                break
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Index refresh failed: {e}")
+            if not triggered and time.monotonic() < next_check:
+                continue
+            next_check = time.monotonic() + self.interval_seconds
+            try:
+                self.compact_if_needed()
+            except Exception as e:
+                # Keep serving from the tombstoned index and try again at the next check
+                logger.error(f"Index compaction failed: {e}")
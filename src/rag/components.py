@@ -0,0 +1,232 @@
+from src.models.embeddings import EmbeddingModel
+from src.models.llm import LLMService
+from src.rag.cache import AnswerCache, QueryEmbeddingCache
+from src.rag.compaction import BackgroundCompactor
+from src.rag.context import ContextPacker
+from src.rag.generator import AnswerGenerator
+from src.rag.indexing import DocumentIndexer
+from src.rag.jobs import IngestionJob, IngestionQueue
+from src.rag.reranker import create_reranker
+from src.rag.retriever import Retriever
+from src.utils.vector_store import VectorStore
+from src.utils.metrics import Sample, metrics
+from typing import Any, Dict, List, Optional
+import os
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class RAGComponents:
+    """Application-scoped container for the RAG pipeline, shared by all requests"""
+
+    def __init__(
+        self,
+        embedding_model_type: str = "deepseek",
+        llm_model_name: str = "deepseek-chat",
+        temperature: float = 0.0,
+        persist_directory: str = "data/vector_store",
+        embedding_cache_path: Optional[str] = "data/embedding_cache.sqlite",
+        index_type: str = "flat",
+        index_params: Optional[Dict[str, Any]] = None,
+        search_params: Optional[Dict[str, Any]] = None,
+        hybrid_retrieval: bool = True,
+        context_max_tokens: int = 3000,
+        ingestion_workers: int = 2,
+        ingestion_queue_size: int = 16,
+        embedding_model: Optional[EmbeddingModel] = None,
+        llm_service: Optional[LLMService] = None,
+        query_embedding_cache_path: Optional[str] = None,
+        upload_directory: str = "data/pdfs",
+        compaction_interval: float = 60.0,
+        compaction_min_deleted_ratio: float = 0.1,
+        refresh_interval: float = 5.0,
+        reranker: Optional[str] = None,
+        rerank_candidates: int = 20,
+    ):
+        setup_start = time.perf_counter()
+        self.persist_directory = persist_directory
+        # Uploaded PDFs live here and are removed along with their documents
+        self.upload_directory = upload_directory
+        self.search_params = search_params
+        self.hybrid_retrieval = hybrid_retrieval
+        self.context_max_tokens = context_max_tokens
+        # Built once so a cross-encoder model is loaded once per process, not per index swap
+        self.reranker = create_reranker(reranker)
+        self.rerank_candidates = rerank_candidates
+
+        # Initialise the models once per process, unless they are provided
+        self.embedding_model = embedding_model or EmbeddingModel(model_type=embedding_model_type, cache_path=embedding_cache_path)
+        self.llm_service = llm_service or LLMService(model_name=llm_model_name, temperature=temperature)
+
+        # Shared across index swaps; entries are invalidated by the index version
+        self.answer_cache = AnswerCache()
+        # Query embeddings outlive index swaps; a cache path shares them between worker processes
+        self.query_cache = QueryEmbeddingCache(namespace=self.embedding_model.namespace, path=query_embedding_cache_path)
+
+        # Load the vector store once, if it exists
+        vector_store = VectorStore(
+            embedding_model=self.embedding_model,
+            db_type="faiss",
+            index_type=index_type,
+            index_params=index_params,
+            lexical=hybrid_retrieval
+        )
+        if os.path.exists(persist_directory):
+            vector_store.load(persist_directory)
+
+        # Initialise the indexer to append into the same store that serves queries
+        self.indexer = DocumentIndexer(embedding_model=self.embedding_model, vector_store=vector_store)
+
+        self.answer_generator = self._build_answer_generator(vector_store)
+
+        # Bounded background ingestion; started and stopped by the application lifespan
+        self.ingestion_queue = IngestionQueue(
+            self._run_ingestion_job,
+            max_queue_size=ingestion_queue_size,
+            num_workers=ingestion_workers
+        )
+        # Purges deleted chunks from the index in the background; started and stopped with the queue
+        self.compactor = BackgroundCompactor(
+            lambda: self.indexer.vector_store,
+            persist_directory=persist_directory,
+            interval_seconds=compaction_interval,
+            min_deleted_ratio=compaction_min_deleted_ratio,
+            refresh_seconds=refresh_interval
+        )
+        metrics.observe("stage_seconds", time.perf_counter() - setup_start, stage="components_setup")
+
+    def start(self) -> None:
+        """Start background workers"""
+        self.ingestion_queue.start()
+        self.compactor.start()
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Stop background workers after the queued jobs finish, waiting at most timeout seconds"""
+        deadline = time.monotonic() + timeout
+        self.ingestion_queue.stop(timeout)
+        self.compactor.stop(max(deadline - time.monotonic(), 0))
+
+    def _build_answer_generator(self, vector_store: VectorStore) -> AnswerGenerator:
+        """Build an answer generator on top of the given vector store"""
+        retriever = Retriever(
+            vector_store=vector_store,
+            search_params=self.search_params,
+            hybrid=self.hybrid_retrieval,
+            context_packer=ContextPacker(max_tokens=self.context_max_tokens),
+            query_cache=self.query_cache,
+            reranker=self.reranker,
+            rerank_candidates=self.rerank_candidates
+        )
+        return AnswerGenerator(retriever=retriever, llm_service=self.llm_service, answer_cache=self.answer_cache)
+
+    def metrics_samples(self) -> List[Sample]:
+        """Cache, index and queue figures reported by the metrics endpoint"""
+        cache_stats = self.answer_cache.stats()
+        samples: List[Sample] = [
+            ("answer_cache_hits_total", {"match": "exact"}, cache_stats["hits"] - cache_stats["semantic_hits"]),
+            ("answer_cache_hits_total", {"match": "semantic"}, cache_stats["semantic_hits"]),
+            ("answer_cache_misses_total", {}, cache_stats["misses"]),
+            ("answer_cache_entries", {}, cache_stats["entries"]),
+            ("ingestion_queue_pending", {}, self.ingestion_queue.pending),
+        ]
+
+        query_cache_stats = self.query_cache.stats()
+        samples.append(("query_embedding_cache_hits_total", {"tier": "memory"}, query_cache_stats["hits"] - query_cache_stats["disk_hits"]))
+        samples.append(("query_embedding_cache_hits_total", {"tier": "disk"}, query_cache_stats["disk_hits"]))
+        samples.append(("query_embedding_cache_misses_total", {}, query_cache_stats["misses"]))
+
+        # Only present when the embedding model is wrapped with the persistent cache
+        embedding_cache = self.embedding_model.model
+        if hasattr(embedding_cache, "hits") and hasattr(embedding_cache, "misses"):
+            samples.append(("embedding_cache_hits_total", {}, embedding_cache.hits))
+            samples.append(("embedding_cache_misses_total", {}, embedding_cache.misses))
+
+        samples.append(("index_vectors", {}, self.vector_store.vector_count))
+        samples.append(("index_deleted_vectors", {}, len(self.vector_store.deleted)))
+        samples.append(("index_trained_vectors", {}, self.vector_store.trained_size or 0))
+        return samples
+
+    @property
+    def vector_store(self) -> VectorStore:
+        """The vector store currently serving queries"""
+        return self.answer_generator.retriever.vector_store
+
+    def swap_vector_store(self, vector_store: VectorStore) -> None:
+        """Atomically replace the vector store used for queries"""
+        answer_generator = self._build_answer_generator(vector_store)
+
+        # A single reference assignment, so in-flight queries keep the old generator
+        self.answer_generator = answer_generator
+        logger.info("Swapped in updated vector store")
+
+    def index_pdf(self, pdf_path: str, **kwargs):
+        """Index a PDF into the shared vector store"""
+        # Index writes are serialised by the vector store's write lock
+        result = self.indexer.index_pdf(
+            pdf_path=pdf_path,
+            persist_directory=self.persist_directory,
+            **kwargs
+        )
+        # Queries pick up the new chunks as soon as the store's write lock is released
+        if self.indexer.vector_store is not self.vector_store:
+            self.swap_vector_store(self.indexer.vector_store)
+        return result
+
+    def indexed_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Manifest entry for a document with the given content hash, if it is already indexed"""
+        return self.indexer.get_manifest(self.persist_directory).get(doc_id)
+
+    def indexed_documents(self) -> Dict[str, Dict[str, Any]]:
+        """Manifest entries of every indexed document, by id"""
+        return dict(self.indexer.get_manifest(self.persist_directory).documents)
+
+    def delete_document(self, doc_id: str) -> Dict[str, Any]:
+        """Delete a document from the shared vector store, along with its uploaded file"""
+        result = self.indexer.delete_document(doc_id, persist_directory=self.persist_directory)
+        self._remove_upload(result.get("source"))
+        # Queries skip the deleted chunks at once; the compactor decides when to rebuild without them
+        self.compactor.trigger()
+        return result
+
+    def replace_pdf(self, old_doc_id: str, pdf_path: str, **kwargs) -> Dict[str, Any]:
+        """Index a new version of a document in place of an old one"""
+        result = self.indexer.replace_pdf(old_doc_id, pdf_path, persist_directory=self.persist_directory, **kwargs)
+        if self.indexer.vector_store is not self.vector_store:
+            self.swap_vector_store(self.indexer.vector_store)
+        if "replaced" in result:
+            self._remove_upload(result["replaced"].get("source"))
+            self.compactor.trigger()
+        return result
+
+    def _run_ingestion_job(self, job: IngestionJob) -> Dict[str, Any]:
+        """Index a queued upload, removing the file if it is a duplicate or fails"""
+        try:
+            if job.replaces:
+                result = self.replace_pdf(job.replaces, pdf_path=job.file_path, doc_id=job.doc_id)
+            else:
+                result = self.index_pdf(pdf_path=job.file_path, doc_id=job.doc_id)
+        except Exception:
+            self._remove_file(job.file_path)
+            raise
+
+        if result["status"] == "already_indexed":
+            # Identical content is already indexed, so drop the duplicate copy
+            self._remove_file(job.file_path)
+        elif self.indexer.vector_store.needs_retrain():
+            # The index was trained on a much smaller corpus; retrain it in the background
+            self.compactor.trigger()
+        return result
+
+    def _remove_upload(self, file_path: Optional[str]) -> None:
+        """Delete a document's file if it is an upload, leaving files indexed from elsewhere alone"""
+        if file_path and os.path.dirname(os.path.abspath(file_path)) == os.path.abspath(self.upload_directory):
+            self._remove_file(file_path)
+
+    @staticmethod
+    def _remove_file(file_path: str) -> None:
+        """Delete an uploaded file, ignoring files that are already gone"""
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
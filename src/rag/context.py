@@ -0,0 +1,100 @@
+from dataclasses import dataclass
+from typing import List, Set
+from langchain_core.documents import Document
+from src.utils.tokens import count_tokens, truncate_to_tokens
+import re
+
+@dataclass
+class PackedContext:
+    """Context string sent to the LLM together with the chunks it contains"""
+    text: str
+    documents: List[Document]
+    tokens: int
+
+class ContextPacker:
+    """Pack retrieved chunks into a context string that fits a token budget"""
+
+    def __init__(self, max_tokens: int = 3000, duplicate_threshold: float = 0.8, min_chunk_tokens: int = 50):
+        self.max_tokens = max_tokens
+        # Share of a chunk's word shingles already in the context above which it is dropped as a duplicate
+        self.duplicate_threshold = duplicate_threshold
+        # A chunk is only truncated to fit the budget if at least this much of it survives
+        self.min_chunk_tokens = min_chunk_tokens
+
+    def pack(self, documents: List[Document]) -> PackedContext:
+        """Add chunks in rank order until the budget is spent, skipping near-duplicates"""
+        parts, kept = [], []
+        kept_shingles: List[Set[str]] = []
+        used = 0
+
+        for doc in documents:
+            content = self._trim_overlap(doc, kept)
+            shingles = self._shingles(content)
+            if not shingles or self._is_duplicate(shingles, kept_shingles):
+                continue
+
+            header = self._header(len(kept) + 1, doc)
+            header_tokens = count_tokens(header)
+            remaining = self.max_tokens - used - header_tokens
+            content_tokens = count_tokens(content)
+            if content_tokens > remaining:
+                # Truncate the chunk if a useful amount fits, otherwise the context is full
+                if remaining < self.min_chunk_tokens and kept:
+                    break
+                content = truncate_to_tokens(content, remaining)
+                content_tokens = count_tokens(content)
+                if not content:
+                    break
+
+            parts.append(f"{header}{content}\n")
+            kept.append(doc)
+            kept_shingles.append(shingles)
+            used += header_tokens + content_tokens
+            if used >= self.max_tokens:
+                break
+
+        text = "\n".join(parts)
+        return PackedContext(text=text, documents=kept, tokens=count_tokens(text))
+
+    @staticmethod
+    def _header(position: int, doc: Document) -> str:
+        """Citation line placed above each chunk"""
+        source = doc.metadata.get("source", "Unknown")
+        section = doc.metadata.get("section", "General")
+        return f"[Documment {position}] From: {source}, Section: {section}\n"
+
+    @staticmethod
+    def _shingles(text: str, size: int = 3) -> Set[str]:
+        """Overlapping word n-grams used to detect near-duplicate chunks"""
+        words = re.findall(r"\w+", text.lower())
+        if len(words) < size:
+            return {" ".join(words)} if words else set()
+        return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+    def _is_duplicate(self, shingles: Set[str], kept_shingles: List[Set[str]]) -> bool:
+        """Whether most of a chunk is already covered by one chunk in the context"""
+        return any(
+            len(shingles & other) / len(shingles) >= self.duplicate_threshold
+            for other in kept_shingles
+        )
+
+    @staticmethod
+    def _trim_overlap(doc: Document, kept: List[Document], probe_chars: int = 40) -> str:
+        """Drop the start of a chunk that repeats the end of a kept chunk from the same source"""
+        content = doc.page_content
+        probe = content[:probe_chars]
+        if len(probe) < probe_chars:
+            return content
+
+        for other in kept:
+            if other.metadata.get("source") != doc.metadata.get("source"):
+                continue
+            text = other.page_content
+            # The overlap must run to the end of the kept chunk; whole repeats are left to duplicate detection
+            start = text.find(probe, 1)
+            while start != -1:
+                overlap = len(text) - start
+                if content[:overlap] == text[start:]:
+                    return content[overlap:].lstrip()
+                start = text.find(probe, start + 1)
+        return content
@@ -1,11 +1,22 @@
 from src.models.llm import LLMService
 from src.rag.retriever import Retriever
-from typing import Dict, Any
+from src.rag.cache import AnswerCache, normalize_query
+from src.rag.context import PackedContext
+from src.utils.metadata_index import Filters
+from src.utils.metrics import metrics, timed_stage
+from typing import Dict, Any, List, AsyncIterator, Optional, Tuple
+from langchain_core.documents import Document
+import asyncio
+import copy
+import json
 
 class AnswerGenerator:
-    def __init__(self, retriever: Retriever, llm_service: LLMService):
+    def __init__(self, retriever: Retriever, llm_service: LLMService, answer_cache: Optional[AnswerCache] = None):
         self.retriever = retriever
         self.llm_service = llm_service
+        self.answer_cache = answer_cache
+        # Shared computations of queries currently being answered, by normalised query, top_k, index version and filters
+        self._in_flight: Dict[Tuple[str, int, Any, str], "asyncio.Future[Dict[str, Any]]"] = {}
 
         # Default system prompt for travel insurance queries
         self.system_prompt = """
@@ -16,42 +27,260 @@ class AnswerGenerator:
         Format your responses clearly and concisely.
         """
 
-    def generate_answer(self, query: str, top_k: int = 3) -> Dict[str, Any]:
-        """Generate an answer for the given query"""
+    def generate_answer(self, query: str, top_k: int = 3, filters: Optional[Filters] = None) -> Dict[str, Any]:
+        """Generate an answer for the given query, optionally from documents matching metadata filters"""
+        # Serve repeated and near-duplicate questions from the cache
+        index_version = self.retriever.index_version if self.answer_cache else None
+        cached, embedding = self._cache_lookup(query, top_k, index_version, filters)
+        if cached is not None:
+            return cached
+
         # Retrive relevant documents
-        retrieved_docs = self.retriever.retrieve(query, top_k=top_k)
+        with timed_stage("retrieve"):
+            retrieved_docs = self.retriever.retrieve(query, top_k=top_k, embedding=embedding, filters=filters)
 
         # If not docuemnts are retrieved, return a default message
         if not retrieved_docs:
-            return {
-                "answer": "I don't have enough information to answer this question.",
-                "sources": [],
-                "context": "",
-            }
+            return self._cache_store(query, top_k, index_version, self._no_answer(), embedding, filters)
         
-        # Format the retrieved documents into context
-        context = self.retriever.format_context(retrieved_docs)
+        # Pack the retrieved documents into a context within the token budget
+        packed = self.retriever.pack_context(retrieved_docs)
 
         # Generate the answer using the LLM service
         answer = self.llm_service.generate_with_context(
             self.system_prompt,
-            context,
+            packed.text,
             query
         )
 
-        # Extract sources
-        sources = [
+        result = self._build_result(answer, packed)
+        return self._cache_store(query, top_k, index_version, result, embedding, filters)
+
+    async def agenerate_answer(self, query: str, top_k: int = 3, filters: Optional[Filters] = None) -> Dict[str, Any]:
+        """Generate an answer for the given query without blocking the event loop"""
+        # Identical concurrent queries against the same index share one computation
+        key = (normalize_query(query), top_k, self.retriever.index_version, json.dumps(filters, sort_keys=True))
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._agenerate_answer(query, top_k, filters))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish_flight(key, done))
+        else:
+            metrics.increment("coalesced_queries_total")
+
+        # Shielded so a disconnecting caller does not cancel the answer for the others
+        result = await asyncio.shield(task)
+        return copy.deepcopy(result)
+
+    def _finish_flight(self, key: Tuple[str, int, Any, str], task: "asyncio.Future[Dict[str, Any]]") -> None:
+        """Forget a finished shared computation so later queries start afresh"""
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark a failure as retrieved in case every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    async def _agenerate_answer(self, query: str, top_k: int, filters: Optional[Filters] = None) -> Dict[str, Any]:
+        """Generate an answer for one query"""
+        index_version = self.retriever.index_version if self.answer_cache else None
+        cached, embedding = await self._acache_lookup(query, top_k, index_version, filters)
+        if cached is not None:
+            return cached
+
+        with timed_stage("retrieve"):
+            retrieved_docs = await self.retriever.aretrieve(query, top_k=top_k, embedding=embedding, filters=filters)
+
+        if not retrieved_docs:
+            return self._cache_store(query, top_k, index_version, self._no_answer(), embedding, filters)
+
+        packed = self.retriever.pack_context(retrieved_docs)
+
+        answer = await self.llm_service.agenerate_with_context(
+            self.system_prompt,
+            packed.text,
+            query
+        )
+
+        result = self._build_result(answer, packed)
+        return self._cache_store(query, top_k, index_version, result, embedding, filters)
+
+    async def astream_answer(self, query: str, top_k: int = 3, filters: Optional[Filters] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream an answer as events: sources first, then tokens, then done"""
+        index_version = self.retriever.index_version if self.answer_cache else None
+        cached, embedding = await self._acache_lookup(query, top_k, index_version, filters)
+        if cached is not None:
+            yield {"event": "sources", "data": cached["sources"]}
+            yield {"event": "token", "data": cached["answer"]}
+            yield {"event": "done", "data": None}
+            return
+
+        with timed_stage("retrieve"):
+            retrieved_docs = await self.retriever.aretrieve(query, top_k=top_k, embedding=embedding, filters=filters)
+        packed = self.retriever.pack_context(retrieved_docs) if retrieved_docs else None
+
+        # Send sources before generation starts so clients can render them immediately
+        yield {"event": "sources", "data": self._extract_sources(packed.documents if packed else [])}
+
+        if packed is None:
+            result = self._no_answer()
+            yield {"event": "token", "data": result["answer"]}
+        else:
+            tokens = []
+            async for token in self.llm_service.astream_with_context(self.system_prompt, packed.text, query):
+                tokens.append(token)
+                yield {"event": "token", "data": token}
+            result = self._build_result("".join(tokens), packed)
+
+        self._cache_store(query, top_k, index_version, result, embedding, filters)
+        yield {"event": "done", "data": None}
+
+    async def agenerate_answers(self, queries: List[str], top_k: int = 3, max_concurrency: int = 8, filters: Optional[Filters] = None) -> List[Dict[str, Any]]:
+        """Answer a batch of queries, returning the results in query order"""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+        async for position, result in self.astream_answers(queries, top_k=top_k, max_concurrency=max_concurrency, filters=filters):
+            results[position] = result
+        return results
+
+    async def astream_answers(self, queries: List[str], top_k: int = 3, max_concurrency: int = 8, filters: Optional[Filters] = None) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """Answer a batch of queries, yielding (position, result) pairs as each one finishes"""
+        index_version = self.retriever.index_version if self.answer_cache else None
+
+        # Exact cache hits are answered before any embedding or search work
+        with timed_stage("cache_lookup"):
+            hits, pending = self._batch_cache_lookup(queries, top_k, index_version, filters)
+        for position, cached in hits:
+            yield position, cached
+        if not pending:
+            return
+
+        # One embedding call for every remaining query, reused for the semantic cache and retrieval
+        embeddings = await self.retriever.aembed_queries([queries[position] for position in pending])
+        if self.answer_cache and self.answer_cache.semantic and not filters:
+            misses = []
+            for position, embedding in zip(pending, embeddings):
+                cached = self.answer_cache.get_similar(embedding, top_k, index_version)
+                if cached is not None:
+                    yield position, cached
+                else:
+                    misses.append((position, embedding))
+            if not misses:
+                return
+            pending, embeddings = [position for position, _ in misses], [embedding for _, embedding in misses]
+
+        # A single multi-query index search for the whole batch
+        with timed_stage("retrieve"):
+            retrieved = await self.retriever.aretrieve_batch([queries[position] for position in pending], top_k=top_k, embeddings=embeddings, filters=filters)
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def answer(position: int, documents: List[Document], embedding: List[float]) -> Tuple[int, Dict[str, Any]]:
+            query = queries[position]
+            if not documents:
+                return position, self._cache_store(query, top_k, index_version, self._no_answer(), embedding, filters)
+
+            packed = self.retriever.pack_context(documents)
+            # Bound the LLM calls in flight so a large batch cannot exhaust the API rate limit
+            async with semaphore:
+                try:
+                    answer = await self.llm_service.agenerate_with_context(self.system_prompt, packed.text, query)
+                except Exception as e:
+                    # One failed completion should not discard the rest of the batch
+                    return position, self._failed(str(e))
+            return position, self._cache_store(query, top_k, index_version, self._build_result(answer, packed), embedding, filters)
+
+        tasks = [asyncio.create_task(answer(*args)) for args in zip(pending, retrieved, embeddings)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            # Stop outstanding completions if the consumer goes away
+            for task in tasks:
+                task.cancel()
+
+    def _batch_cache_lookup(self, queries: List[str], top_k: int, index_version, filters: Optional[Filters] = None) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[int]]:
+        """Split a batch into exact cache hits and the positions still to answer"""
+        if not self.answer_cache or filters:
+            return [], list(range(len(queries)))
+
+        hits, pending = [], []
+        for position, query in enumerate(queries):
+            cached = self.answer_cache.get(query, top_k, index_version)
+            if cached is not None:
+                hits.append((position, cached))
+            else:
+                pending.append(position)
+        return hits, pending
+
+    def _cache_lookup(self, query: str, top_k: int, index_version, filters: Optional[Filters] = None) -> Tuple[Optional[Dict[str, Any]], Optional[List[float]]]:
+        """Check the answer cache, returning the query embedding if one was computed"""
+        # Cached answers are keyed by query alone, so filtered queries neither read nor write them
+        if not self.answer_cache or filters:
+            return None, None
+
+        with timed_stage("cache_lookup"):
+            cached = self.answer_cache.get(query, top_k, index_version)
+            if cached is not None or not self.answer_cache.semantic:
+                return cached, None
+
+            # The embedding is reused for retrieval on a miss, so it costs nothing extra
+            embedding = self.retriever.embed_query(query)
+            return self.answer_cache.get_similar(embedding, top_k, index_version), embedding
+
+    async def _acache_lookup(self, query: str, top_k: int, index_version, filters: Optional[Filters] = None) -> Tuple[Optional[Dict[str, Any]], Optional[List[float]]]:
+        """Check the answer cache without blocking the event loop"""
+        if not self.answer_cache or filters:
+            return None, None
+
+        with timed_stage("cache_lookup"):
+            cached = self.answer_cache.get(query, top_k, index_version)
+            if cached is not None or not self.answer_cache.semantic:
+                return cached, None
+
+            embedding = await self.retriever.aembed_query(query)
+            return self.answer_cache.get_similar(embedding, top_k, index_version), embedding
+
+    def _cache_store(self, query: str, top_k: int, index_version, result: Dict[str, Any], embedding: Optional[List[float]], filters: Optional[Filters] = None) -> Dict[str, Any]:
+        """Store a freshly generated result in the answer cache"""
+        if self.answer_cache and not filters:
+            self.answer_cache.put(query, top_k, index_version, result, embedding=embedding)
+        return result
+
+    def _no_answer(self) -> Dict[str, Any]:
+        """Result returned when no documents are retrieved"""
+        return {
+            "answer": "I don't have enough information to answer this question.",
+            "sources": [],
+            "context": "",
+            "context_tokens": 0,
+        }
+
+    def _failed(self, error: str) -> Dict[str, Any]:
+        """Result for a batched query whose answer could not be generated"""
+        return {
+            "answer": None,
+            "sources": [],
+            "context": "",
+            "context_tokens": 0,
+            "error": error,
+        }
+
+    def _extract_sources(self, documents: List[Document]) -> List[Dict[str, str]]:
+        """Extract source citations from retrieved documents"""
+        return [
             {
                 "source": doc.metadata.get("source", "Unknown"),
                 "section": doc.metadata.get("section", "General")
             }
-            for doc in retrieved_docs
+            for doc in documents
         ]
 
+    def _build_result(self, answer: str, packed: PackedContext) -> Dict[str, Any]:
+        """Combine the answer with the sources and context it was generated from"""
         return {
             "answer": answer,
-            "sources": sources,
-            "context": context
+            "sources": self._extract_sources(packed.documents),
+            "context": packed.text,
+            "context_tokens": packed.tokens
         }
     
     def set_system_prompt(self, prompt: str) -> None:
@@ -3,55 +3,213 @@ from src.data.processor import DocumentProcessor
 from src.utils.vector_store import VectorStore
 from src.models.embeddings import EmbeddingModel
 from src.utils.pdf_parser import PDFParser
-from typing import Dict, Any, Optional
+from src.rag.manifest import IndexManifest
+from src.api.exceptions import DocumentProcessingError, DocumentNotFoundError
+from langchain_core.documents import Document
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 import os
+import threading
+import time
+import uuid
+
+MANIFEST_FILE = "manifest.json"
+
+def parse_pdf(pdf_path: str, workers: Optional[int] = None) -> Tuple[Iterator[str], Dict[str, Any]]:
+    """Open a PDF, returning a stream of cleaned page texts and the document metadata"""
+    # Parse the PDF
+    parser = PDFParser()
+    if not parser.open(pdf_path):
+        raise DocumentProcessingError(f"Could not open PDF: {pdf_path}")
+
+    try:
+        doc_metadata = parser.extract_metadata()
+    except Exception:
+        parser.close()
+        raise
+    return _stream_pages(parser, workers), doc_metadata
+
+def _stream_pages(parser: PDFParser, workers: Optional[int]) -> Iterator[str]:
+    """Yield pages one at a time, closing the parser once they have all been read"""
+    try:
+        # Keep line breaks so the chunker can find section headings
+        yield from parser.iter_pages(workers=workers)
+    finally:
+        # Close the parser
+        parser.close()
+
+def timed(iterable: Iterable, timings: Dict[str, float], stage: str) -> Iterator:
+    """Pass items through, recording the time spent producing them as a stage"""
+    iterator = iter(iterable)
+    elapsed = 0.0
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            break
+        finally:
+            elapsed += time.perf_counter() - start
+            timings[stage] = round(elapsed, 4)
+        yield item
+
+def chunk_pdf_pages(processor: DocumentProcessor, pages: Iterable[str], pdf_path: str, doc_id: str, doc_metadata: Dict[str, Any], chunk_strategy: str = "insurance", additional_metadata: Optional[Dict[str, Any]] = None) -> Tuple[List[Document], List[str]]:
+    """Chunk a parsed PDF, returning the chunks and their ids"""
+    # Prepare metadata
+    metadata = {
+        "source": pdf_path,
+        "title": doc_metadata.get("title") or os.path.basename(pdf_path),
+        "author": doc_metadata.get("author") or "Unknown",
+        "created_date": doc_metadata.get("creationDate") or "Unknown",
+        "doc_id": doc_id,
+    }
+
+    # Add any additional metadata
+    if additional_metadata:
+        metadata.update(additional_metadata)
+
+    # Process and chunk the document
+    chunks = processor.process_pages(
+        pages,
+        metadata=metadata,
+        chunk_strategy=chunk_strategy
+    )
+    chunk_ids = [chunk.metadata.get("chunk_id") or str(uuid.uuid4()) for chunk in chunks]
+    return chunks, chunk_ids
 
 class DocumentIndexer:
-    def __init__(self, embedding_model_type = "openai", vector_store_type = "faiss", chunk_strategy = "insurance"):
+    def __init__(self, embedding_model_type = "openai", vector_store_type = "faiss", chunk_strategy = "insurance", embedding_model: Optional[EmbeddingModel] = None, vector_store: Optional[VectorStore] = None, parse_workers: Optional[int] = None):
         self.loader = DocumentLoader()
         self.processor = DocumentProcessor()
-        self.embedding_model = EmbeddingModel(model_type=embedding_model_type)
-        self.vector_store = VectorStore(embedding_model=self.embedding_model, db_type=vector_store_type)
+        # Reuse a shared embedding model and vector store if they are provided
+        self.embedding_model = embedding_model or EmbeddingModel(model_type=embedding_model_type)
+        self.vector_store = vector_store or VectorStore(embedding_model=self.embedding_model, db_type=vector_store_type)
         self.chunk_strategy = chunk_strategy
+        # Worker processes used to extract the pages of long PDFs
+        self.parse_workers = parse_workers or min(4, os.cpu_count() or 1)
+        self.manifest = IndexManifest()
+        # Documents currently being indexed, so concurrent duplicate uploads are skipped
+        self._in_progress = set()
+        self._lock = threading.Lock()
+
+    def get_manifest(self, persist_directory: Optional[str] = None) -> IndexManifest:
+        """Get the document manifest stored alongside the vector store"""
+        path = os.path.join(persist_directory, MANIFEST_FILE) if persist_directory else None
+        if self.manifest.path != path:
+            self.manifest = IndexManifest(path)
+        return self.manifest
     
-    def index_pdf(self, pdf_path: str, persist_directory: Optional[str] = None, additional_metadata: Dict[str, Any] = None):
+    def index_pdf(self, pdf_path: str, persist_directory: Optional[str] = None, additional_metadata: Dict[str, Any] = None, doc_id: Optional[str] = None):
         """Index a PDF document into a vector store"""
-        # Parse the PDF
-        parser = PDFParser()
-        parser.open(pdf_path)
+        timings = {}
+        stage_start = time.perf_counter()
 
-        # Extract text and metadata
-        text = parser.extract_all_text()
-        cleaned_text = parser.clean_text(text)
-        doc_metadata = parser.extract_metadata()
+        # Skip documents whose exact content is already indexed or being indexed
+        manifest = self.get_manifest(persist_directory)
+        doc_id = doc_id or IndexManifest.hash_file(pdf_path)
+        with self._lock:
+            existing = manifest.get(doc_id)
+            if existing or doc_id in self._in_progress:
+                return {
+                    "documents": os.path.basename(pdf_path),
+                    "doc_id": doc_id,
+                    "chunks": existing["chunks"] if existing else 0,
+                    "status": "already_indexed",
+                    "timings": {},
+                }
+            self._in_progress.add(doc_id)
 
-        # Close the parser
-        parser.close()
+            # Pick up the existing index so new chunks are appended to it
+            if self.vector_store.store is None and persist_directory and os.path.exists(persist_directory):
+                self.vector_store.load(persist_directory)
 
-        # Prepare metadata
-        metadata = {
-            "source": pdf_path,
-            "title": doc_metadata.get("title", os.path.basename(pdf_path)),
-            "author": doc_metadata.get("author", "Unknown"),
-            "created_date": doc_metadata.get("creationDate", "Unknown"),
-        }
+        try:
+            return self._index_new_pdf(pdf_path, doc_id, manifest, persist_directory, additional_metadata, timings, stage_start)
+        finally:
+            with self._lock:
+                self._in_progress.discard(doc_id)
 
-        # Add any additional metadata
-        if additional_metadata:
-            metadata.update(additional_metadata)
+    def _index_new_pdf(self, pdf_path: str, doc_id: str, manifest: IndexManifest, persist_directory: Optional[str], additional_metadata: Optional[Dict[str, Any]], timings: Dict[str, float], stage_start: float):
+        """Parse, chunk, embed and store a PDF that is not yet indexed"""
+        # Pages are extracted and chunked as a stream, so only a window of pages is held in memory
+        pages, doc_metadata = parse_pdf(pdf_path, workers=self.parse_workers)
 
         # Process and chunk the document
-        chunks = self.processor.process_document(
-            cleaned_text,
-            metadata=metadata,
-            chunk_strategy=self.chunk_strategy
+        chunks, chunk_ids = chunk_pdf_pages(
+            self.processor,
+            timed(pages, timings, "parse"),
+            pdf_path,
+            doc_id,
+            doc_metadata,
+            chunk_strategy=self.chunk_strategy,
+            additional_metadata=additional_metadata
         )
+        stage_start = self._record(timings, "chunk", stage_start)
+        # Page extraction is timed separately from the chunking it is interleaved with
+        timings["chunk"] = round(max(timings["chunk"] - timings.get("parse", 0.0), 0.0), 4)
+
+        # Embed concurrently with other jobs; only the store write below is serialised
+        embeddings = self.embedding_model.embed_documents([chunk.page_content for chunk in chunks])
+        stage_start = self._record(timings, "embed", stage_start)
+
+        # Append only the new chunks to the vector database
+        self.vector_store.add_documents(chunks, persist_directory=persist_directory, ids=chunk_ids, embeddings=embeddings)
 
-        # Store in vector database
-        self.vector_store.create_from_documents(chunks, persist_directory=persist_directory)
+        manifest.add(doc_id, {
+            "source": pdf_path,
+            "chunks": len(chunks),
+            "chunk_ids": chunk_ids,
+        })
+        self._record(timings, "store", stage_start)
 
         return {
             "documents": os.path.basename(pdf_path),
+            "doc_id": doc_id,
             "chunks": len(chunks),
-            "status": "indexed"
-        }
\ No newline at end of file
+            "status": "indexed",
+            "timings": timings,
+        }
+
+    def delete_document(self, doc_id: str, persist_directory: Optional[str] = None) -> Dict[str, Any]:
+        """Remove a document's chunks from the index and forget it in the manifest"""
+        manifest = self.get_manifest(persist_directory)
+        with self._lock:
+            entry = manifest.get(doc_id)
+            if entry is None:
+                raise DocumentNotFoundError(f"No indexed document with id {doc_id}")
+
+            if self.vector_store.store is None and persist_directory and os.path.exists(persist_directory):
+                self.vector_store.load(persist_directory)
+
+        # The manifest records each document's chunk ids, so no other chunks are touched
+        deleted = self.vector_store.delete(entry.get("chunk_ids", []), persist_directory=persist_directory)
+        manifest.remove(doc_id)
+        return {
+            "doc_id": doc_id,
+            "source": entry.get("source"),
+            "chunks": deleted,
+            "status": "deleted",
+        }
+
+    def replace_pdf(self, old_doc_id: str, pdf_path: str, persist_directory: Optional[str] = None, **kwargs):
+        """Index a new version of a document, then delete the old one, so it never drops out of answers"""
+        if self.get_manifest(persist_directory).get(old_doc_id) is None:
+            raise DocumentNotFoundError(f"No indexed document with id {old_doc_id}")
+
+        result = self.index_pdf(pdf_path, persist_directory=persist_directory, **kwargs)
+        if result["doc_id"] != old_doc_id:
+            try:
+                result["replaced"] = self.delete_document(old_doc_id, persist_directory=persist_directory)
+                # New content that was already indexed as another document keeps its already_indexed status
+                if result["status"] == "indexed":
+                    result["status"] = "replaced"
+            except DocumentNotFoundError:
+                # Deleted by another request while the new version was being indexed
+                pass
+        return result
+
+    @staticmethod
+    def _record(timings: Dict[str, float], stage: str, stage_start: float) -> float:
+        """Record the duration of a stage and return the start of the next one"""
+        now = time.perf_counter()
+        timings[stage] = round(now - stage_start, 4)
+        return now
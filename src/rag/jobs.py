@@ -0,0 +1,128 @@
+from src.api.exceptions import IngestionQueueFullError
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+import logging
+import queue
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class IngestionJob:
+    """Status of one queued document indexing job"""
+    filename: str
+    file_path: str
+    # Content hash computed while the upload was received, so indexing need not hash the file again
+    doc_id: Optional[str] = None
+    # Id of an indexed document this upload replaces once it is indexed
+    replaces: Optional[str] = None
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    status: str = "queued"
+    chunks: int = 0
+    error: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+class IngestionQueue:
+    """Bounded queue of indexing jobs processed by a pool of worker threads"""
+
+    def __init__(self, index_fn: Callable[[IngestionJob], Dict[str, Any]], max_queue_size: int = 16, num_workers: int = 2, max_jobs: int = 1000):
+        self.index_fn = index_fn
+        self.num_workers = num_workers
+        # Number of jobs whose status is remembered, oldest finished jobs are forgotten first
+        self.max_jobs = max_jobs
+
+        self._queue: "queue.Queue[Optional[IngestionJob]]" = queue.Queue(maxsize=max_queue_size)
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._workers = []
+        # Set when shutdown stops waiting, so workers leave the remaining queued jobs alone
+        self._abandon = threading.Event()
+
+    def start(self) -> None:
+        """Start the worker threads"""
+        self._abandon.clear()
+        for i in range(self.num_workers):
+            worker = threading.Thread(target=self._run_worker, name=f"ingestion-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Stop the workers once they finish the jobs already queued, waiting at most timeout seconds"""
+        deadline = time.monotonic() + timeout
+        try:
+            for _ in self._workers:
+                # Bounded, so a full queue cannot hold up shutdown
+                self._queue.put(None, timeout=max(deadline - time.monotonic(), 0))
+        except queue.Full:
+            pass
+        for worker in self._workers:
+            worker.join(max(deadline - time.monotonic(), 0))
+
+        if any(worker.is_alive() for worker in self._workers):
+            logger.warning(f"Stopped waiting for ingestion workers with {self.pending} jobs still queued")
+            self._abandon.set()
+        self._workers = []
+
+    def submit(self, file_path: str, filename: str, doc_id: Optional[str] = None, replaces: Optional[str] = None) -> IngestionJob:
+        """Queue a document for indexing, raising if the queue is full"""
+        job = IngestionJob(filename=filename, file_path=file_path, doc_id=doc_id, replaces=replaces)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict_finished()
+
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            raise IngestionQueueFullError("Ingestion queue is full, please retry later")
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        """Get a job by its id"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs waiting for a worker"""
+        return self._queue.qsize()
+
+    def _evict_finished(self) -> None:
+        """Forget the oldest finished jobs beyond the history limit"""
+        excess = len(self._jobs) - self.max_jobs
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished][:max(excess, 0)]:
+            del self._jobs[job_id]
+
+    def _run_worker(self) -> None:
+        """Process jobs until a stop sentinel is received"""
+        while True:
+            job = self._queue.get()
+            if job is None or self._abandon.is_set():
+                break
+
+            job.status = "processing"
+            job.started_at = time.time()
+            try:
+                result = self.index_fn(job)
+                job.chunks = result.get("chunks", 0)
+                job.timings = result.get("timings", {})
+                job.status = result.get("status", "indexed")
+                logger.info(f"Indexing job {job.id} for {job.filename} finished: {job.status}")
+            except Exception as e:
+                # Record the failure so it can be reported through the job status endpoint
+                job.status = "failed"
+                job.error = str(e)
+                logger.error(f"Indexing job {job.id} for {job.filename} failed: {e}")
+            finally:
+                job.finished_at = time.time()
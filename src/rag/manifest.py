@@ -0,0 +1,115 @@
+from typing import Dict, Any, List, Optional
+import hashlib
+import json
+import os
+import threading
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Journal records always allowed before the manifest is rewritten, however small it is
+MIN_JOURNAL_RECORDS = 1000
+
+class IndexManifest:
+    """Per-document record of what has been indexed, keyed by content hash"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        # Changes are appended here and folded into the manifest file only occasionally
+        self.journal_path = f"{path}.journal" if path else None
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self._journal_records = 0
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.documents = json.load(f).get("documents", {})
+        if self.journal_path and os.path.exists(self.journal_path):
+            self._replay_journal()
+
+    @staticmethod
+    def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+        """Compute the SHA-256 of a file without reading it into memory at once"""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(chunk_size), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Get the manifest entry for a document"""
+        return self.documents.get(doc_id)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.documents
+
+    def add(self, doc_id: str, entry: Dict[str, Any]) -> None:
+        """Record an indexed document and persist the change"""
+        self.add_many({doc_id: entry})
+
+    def add_many(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        """Record several indexed documents with a single write"""
+        with self._lock:
+            now = time.time()
+            records = []
+            for doc_id, entry in entries.items():
+                self.documents[doc_id] = {**entry, "indexed_at": now}
+                records.append({"op": "add", "doc_id": doc_id, "entry": self.documents[doc_id]})
+            self._append(records)
+
+    def remove(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Forget a document and persist the change"""
+        with self._lock:
+            entry = self.documents.pop(doc_id, None)
+            if entry is not None:
+                self._append([{"op": "remove", "doc_id": doc_id}])
+        return entry
+
+    def save(self) -> None:
+        """Atomically write the whole manifest to disk and start a new journal"""
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"documents": self.documents}, f)
+        os.replace(tmp_path, self.path)
+        # Replaying a journal left behind by a crash here is harmless, since every record sets or removes one entry
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._journal_records = 0
+
+    def _append(self, records: List[Dict[str, Any]]) -> None:
+        """Append changes to the journal, so a write costs the size of the change rather than the manifest"""
+        if not self.path or not records:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(record) + "\n" for record in records))
+        self._journal_records += len(records)
+
+        # Rewriting once the journal is as long as the manifest keeps the amortised cost per change constant
+        if self._journal_records >= max(MIN_JOURNAL_RECORDS, len(self.documents)):
+            self.save()
+
+    def _replay_journal(self) -> None:
+        """Apply the changes recorded since the manifest file was last written"""
+        torn = False
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Only the last record can be torn, by a crash while it was being written
+                    logger.warning(f"Skipping a partly written record in {self.journal_path}")
+                    torn = True
+                    continue
+                if record["op"] == "add":
+                    self.documents[record["doc_id"]] = record["entry"]
+                else:
+                    self.documents.pop(record["doc_id"], None)
+                self._journal_records += 1
+        if torn:
+            # Start a clean journal so the next record is not appended to the torn one
+            self.save()
@@ -0,0 +1,117 @@
+from src.utils.vector_store import VectorStore
+from src.utils.metrics import timed_stage
+from langchain_core.documents import Document
+from typing import Any, List, Optional
+import numpy as np
+import threading
+
+DEFAULT_CROSS_ENCODER = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+class CrossEncoderReranker:
+    """Re-scores retrieved chunks against the query with a small cross-encoder run on the CPU"""
+
+    # Scores query and chunk text directly, so no query embedding is needed
+    needs_embedding = False
+
+    def __init__(self, model_name: str = DEFAULT_CROSS_ENCODER, max_length: int = 256, batch_size: int = 64, model: Optional[Any] = None):
+        self.model_name = model_name
+        # Chunks are truncated to this many tokens, which bounds the cost of each pair
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self._model = model
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        """The cross-encoder, loaded on first use so start-up does not wait for it"""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    # Imported here because loading torch is slow and most deployments never rerank
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, max_length=self.max_length, device="cpu")
+        return self._model
+
+    def rerank(self, query: str, documents: List[Document], top_k: int, embedding: Optional[List[float]] = None, vector_store: Optional[VectorStore] = None) -> List[Document]:
+        """Keep the top_k chunks that the cross-encoder scores highest for the query"""
+        return self.rerank_batch([query], [documents], top_k)[0]
+
+    def rerank_batch(self, queries: List[str], rankings: List[List[Document]], top_k: int, embeddings: Optional[List[List[float]]] = None, vector_store: Optional[VectorStore] = None) -> List[List[Document]]:
+        """Rerank the candidates of several queries with one batched model call"""
+        pairs = [(query, doc.page_content) for query, documents in zip(queries, rankings) for doc in documents]
+        if not pairs:
+            return [[] for _ in rankings]
+
+        with timed_stage("rerank"):
+            scores = np.asarray(self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False), dtype=np.float32)
+
+        results, start = [], 0
+        for documents in rankings:
+            document_scores = scores[start:start + len(documents)]
+            start += len(documents)
+            # Ties keep the retrieval order
+            order = np.argsort(-document_scores, kind="stable")[:top_k]
+            results.append([documents[i] for i in order])
+        return results
+
+class MMRReranker:
+    """Picks chunks that are relevant to the query but not redundant with each other, by maximal marginal relevance"""
+
+    # Relevance is measured against the query embedding
+    needs_embedding = True
+
+    def __init__(self, lambda_mult: float = 0.7):
+        # Weight of relevance against diversity; 1.0 keeps the retrieval order
+        self.lambda_mult = lambda_mult
+
+    def rerank(self, query: str, documents: List[Document], top_k: int, embedding: Optional[List[float]] = None, vector_store: Optional[VectorStore] = None) -> List[Document]:
+        """Keep top_k chunks, trading relevance to the query against similarity to the chunks already kept"""
+        return self.rerank_batch([query], [documents], top_k, embeddings=[embedding], vector_store=vector_store)[0]
+
+    def rerank_batch(self, queries: List[str], rankings: List[List[Document]], top_k: int, embeddings: Optional[List[List[float]]] = None, vector_store: Optional[VectorStore] = None) -> List[List[Document]]:
+        """Rerank the candidates of several queries"""
+        results = []
+        with timed_stage("rerank"):
+            for documents, embedding in zip(rankings, embeddings or [None] * len(rankings)):
+                # The candidates' vectors are read back from the index rather than embedded again
+                vectors = vector_store.get_vectors([doc.id for doc in documents]) if vector_store and embedding is not None else None
+                if vectors is None or len(documents) <= 1:
+                    results.append(documents[:top_k])
+                    continue
+                results.append([documents[i] for i in self.select(np.asarray(embedding, dtype=np.float32), vectors, top_k)])
+        return results
+
+    def select(self, query_vector: np.ndarray, vectors: np.ndarray, top_k: int) -> List[int]:
+        """Greedy MMR selection, returning the positions of the chosen vectors in order"""
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        query_vector = query_vector / max(float(np.linalg.norm(query_vector)), 1e-12)
+        relevance = vectors @ query_vector
+        similarity = vectors @ vectors.T
+
+        selected = [int(np.argmax(relevance))]
+        # Highest similarity of each candidate to any chunk selected so far
+        redundancy = similarity[selected[0]].copy()
+        available = np.ones(len(vectors), dtype=bool)
+        available[selected[0]] = False
+        while len(selected) < min(top_k, len(vectors)):
+            scores = self.lambda_mult * relevance - (1 - self.lambda_mult) * redundancy
+            scores[~available] = -np.inf
+            chosen = int(np.argmax(scores))
+            selected.append(chosen)
+            available[chosen] = False
+            np.maximum(redundancy, similarity[chosen], out=redundancy)
+        return selected
+
+# Supported rerankers, selected by name in configuration
+RERANKERS = {
+    "cross_encoder": CrossEncoderReranker,
+    "mmr": MMRReranker,
+}
+
+def create_reranker(name: Optional[str], **kwargs):
+    """Create a reranker by name, or None when reranking is disabled"""
+    if not name or name == "none":
+        return None
+    if name not in RERANKERS:
+        raise ValueError(f"Unsupported reranker: {name}. Choose from {', '.join(RERANKERS)}.")
+    return RERANKERS[name](**kwargs)
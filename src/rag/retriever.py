@@ -1,29 +1,252 @@
 from src.utils.vector_store import VectorStore
-from typing import List
+from src.utils.metadata_index import Filters
+from src.rag.cache import QueryEmbeddingCache
+from src.rag.context import ContextPacker, PackedContext
+from src.rag.reranker import CrossEncoderReranker, MMRReranker
+from src.utils.metrics import metrics, timed_stage
+from typing import Any, Dict, List, Optional, Tuple, Union
 from langchain_core.documents import Document
+import asyncio
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int = 60) -> List[Document]:
+    """Merge several rankings of documents, scoring each by the sum of 1 / (k + rank)"""
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = doc.id or doc.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            documents.setdefault(key, doc)
+
+    # Ties keep the order of the first ranking
+    return [documents[key] for key in sorted(scores, key=scores.get, reverse=True)]
 
 class Retriever:
-    def __init__(self, vector_store: VectorStore):
+    def __init__(self, vector_store: VectorStore, search_params: Optional[Dict[str, Any]] = None, hybrid: bool = False, rrf_k: int = 60, candidate_multiplier: int = 4, context_packer: Optional[ContextPacker] = None, query_cache: Optional[QueryEmbeddingCache] = None, reranker: Optional[Union[CrossEncoderReranker, MMRReranker]] = None, rerank_candidates: int = 20):
         self.vector_store = vector_store
+        # ANN tuning passed to every search, e.g. {"nprobe": 16} or {"ef_search": 128}
+        self.search_params = search_params or {}
+        # Fuse BM25 and vector rankings when the store has a lexical index
+        self.hybrid = hybrid
+        self.rrf_k = rrf_k
+        # Candidates fetched from each ranking per result kept
+        self.candidate_multiplier = candidate_multiplier
+        # Keeps the prompt within a token budget
+        self.context_packer = context_packer or ContextPacker()
+        # Skips the embedding round trip for repeated queries
+        self.query_cache = query_cache
+        # Optional second stage choosing the best top_k from a larger candidate set
+        self.reranker = reranker
+        self.rerank_candidates = rerank_candidates
+
+    @property
+    def use_hybrid(self) -> bool:
+        """Whether queries are answered by hybrid lexical and vector retrieval"""
+        return self.hybrid and getattr(self.vector_store, "lexical_index", None) is not None
+
+    def retrieve(self, query: str, top_k: int = 3, embedding: Optional[List[float]] = None, filters: Optional[Filters] = None) -> List[Document]:
+        """Retrieve documents based on a query, optionally only those whose metadata matches filters"""
+        if self.reranker is None:
+            return self._retrieve(query, top_k, embedding, filters)
+
+        # Over-fetch, then let the reranker keep the best top_k
+        if embedding is None and self.reranker.needs_embedding:
+            embedding = self.embed_query(query)
+        candidates = self._retrieve(query, max(self.rerank_candidates, top_k), embedding, filters)
+        return self.reranker.rerank(query, candidates, top_k, embedding=embedding, vector_store=self.vector_store)
+
+    async def aretrieve(self, query: str, top_k: int = 3, embedding: Optional[List[float]] = None, filters: Optional[Filters] = None) -> List[Document]:
+        """Retrieve documents based on a query without blocking the event loop"""
+        if self.reranker is None:
+            return await self._aretrieve(query, top_k, embedding, filters)
 
-    def retrieve(self, query: str, top_k: int = 3) -> List[Document]:
-        """Retrieve documents based on a query"""
+        if embedding is None and self.reranker.needs_embedding:
+            embedding = await self.aembed_query(query)
+        candidates = await self._aretrieve(query, max(self.rerank_candidates, top_k), embedding, filters)
+        # Scoring is CPU-bound, so it runs in a worker thread
+        return await asyncio.to_thread(self.reranker.rerank, query, candidates, top_k, embedding=embedding, vector_store=self.vector_store)
+
+    def retrieve_batch(self, queries: List[str], top_k: int = 3, embeddings: Optional[List[List[float]]] = None, filters: Optional[Filters] = None) -> List[List[Document]]:
+        """Retrieve documents for several queries with one embedding call and one index search"""
+        if self.reranker is None:
+            return self._retrieve_batch(queries, top_k, embeddings, filters)
+
+        if embeddings is None:
+            embeddings = self.embed_queries(queries)
+        candidates = self._retrieve_batch(queries, max(self.rerank_candidates, top_k), embeddings, filters)
+        return self.reranker.rerank_batch(queries, candidates, top_k, embeddings=embeddings, vector_store=self.vector_store)
+
+    async def aretrieve_batch(self, queries: List[str], top_k: int = 3, embeddings: Optional[List[List[float]]] = None, filters: Optional[Filters] = None) -> List[List[Document]]:
+        """Retrieve documents for several queries without blocking the event loop"""
+        if self.reranker is None:
+            return await self._aretrieve_batch(queries, top_k, embeddings, filters)
+
+        if embeddings is None:
+            embeddings = await self.aembed_queries(queries)
+        candidates = await self._aretrieve_batch(queries, max(self.rerank_candidates, top_k), embeddings, filters)
+        # One batched scoring call for every query in the batch
+        return await asyncio.to_thread(self.reranker.rerank_batch, queries, candidates, top_k, embeddings=embeddings, vector_store=self.vector_store)
+
+    def _retrieve(self, query: str, top_k: int, embedding: Optional[List[float]], filters: Optional[Filters]) -> List[Document]:
+        """Retrieve the top_k documents for a query from the index"""
         if not self.vector_store:
             raise ValueError("Vector store is not initialized.")
+
+        if embedding is None and self.query_cache is not None:
+            embedding = self.embed_query(query)
+
+        if self.use_hybrid:
+            if embedding is None:
+                embedding = self.embed_query(query)
+            fetch_k = top_k * self.candidate_multiplier
+            vector_docs = self.vector_store.similarity_search_by_vector(embedding, k=fetch_k, **self.search_params, filters=filters)
+            lexical_docs = [doc for doc, _ in self.vector_store.lexical_search(query, k=fetch_k, filters=filters)]
+            return reciprocal_rank_fusion([vector_docs, lexical_docs], k=self.rrf_k)[:top_k]
+
+        # Reuse the query embedding if the caller already computed it
+        if embedding is not None:
+            return self.vector_store.similarity_search_by_vector(embedding, k=top_k, **self.search_params, filters=filters)
         
-        results = self.vector_store.similarity_search(query, k=top_k)
+        results = self.vector_store.similarity_search(query, k=top_k, **self.search_params, filters=filters)
         return results
-    
-    def format_context(self, documents: List[Document]) -> str:
-        """Format retrieved documents into a context string"""
-        context_parts = []
 
-        for i, doc in enumerate(documents):
-            # Format each document with its metadata
-            source = doc.metadata.get("source", "Unknown")
-            section = doc.metadata.get("section", "General")
+    async def _aretrieve(self, query: str, top_k: int, embedding: Optional[List[float]], filters: Optional[Filters]) -> List[Document]:
+        """Retrieve the top_k documents for a query from the index without blocking the event loop"""
+        if not self.vector_store:
+            raise ValueError("Vector store is not initialized.")
+
+        if embedding is None and self.query_cache is not None:
+            embedding = await self.aembed_query(query)
+
+        if self.use_hybrid:
+            if embedding is None:
+                embedding = await self.aembed_query(query)
+            fetch_k = top_k * self.candidate_multiplier
+            vector_docs, lexical_results = await asyncio.gather(
+                self.vector_store.asimilarity_search_by_vector(embedding, k=fetch_k, **self.search_params, filters=filters),
+                self.vector_store.alexical_search(query, k=fetch_k, filters=filters)
+            )
+            lexical_docs = [doc for doc, _ in lexical_results]
+            return reciprocal_rank_fusion([vector_docs, lexical_docs], k=self.rrf_k)[:top_k]
 
-            context_part = f"[Documment {i+1}] From: {source}, Section: {section}\n{doc.page_content}\n"
-            context_parts.append(context_part)
+        if embedding is not None:
+            return await self.vector_store.asimilarity_search_by_vector(embedding, k=top_k, **self.search_params, filters=filters)
+        return await self.vector_store.asimilarity_search(query, k=top_k, **self.search_params, filters=filters)
 
-        return "\n".join(context_parts)
\ No newline at end of file
+    def _retrieve_batch(self, queries: List[str], top_k: int, embeddings: Optional[List[List[float]]], filters: Optional[Filters]) -> List[List[Document]]:
+        """Retrieve the top_k documents for several queries from the index"""
+        if not self.vector_store:
+            raise ValueError("Vector store is not initialized.")
+        if not queries:
+            return []
+
+        if embeddings is None:
+            embeddings = self.embed_queries(queries)
+
+        if not self.use_hybrid:
+            return self.vector_store.similarity_search_by_vectors(embeddings, k=top_k, **self.search_params, filters=filters)
+
+        fetch_k = top_k * self.candidate_multiplier
+        vector_rankings = self.vector_store.similarity_search_by_vectors(embeddings, k=fetch_k, **self.search_params, filters=filters)
+        lexical_rankings = [[doc for doc, _ in self.vector_store.lexical_search(query, k=fetch_k, filters=filters)] for query in queries]
+        return self._fuse_batch(vector_rankings, lexical_rankings, top_k)
+
+    async def _aretrieve_batch(self, queries: List[str], top_k: int, embeddings: Optional[List[List[float]]], filters: Optional[Filters]) -> List[List[Document]]:
+        """Retrieve the top_k documents for several queries from the index without blocking the event loop"""
+        if not self.vector_store:
+            raise ValueError("Vector store is not initialized.")
+        if not queries:
+            return []
+
+        if embeddings is None:
+            embeddings = await self.aembed_queries(queries)
+
+        if not self.use_hybrid:
+            return await self.vector_store.asimilarity_search_by_vectors(embeddings, k=top_k, **self.search_params, filters=filters)
+
+        fetch_k = top_k * self.candidate_multiplier
+        vector_rankings, lexical_results = await asyncio.gather(
+            self.vector_store.asimilarity_search_by_vectors(embeddings, k=fetch_k, **self.search_params, filters=filters),
+            asyncio.gather(*(self.vector_store.alexical_search(query, k=fetch_k, filters=filters) for query in queries))
+        )
+        lexical_rankings = [[doc for doc, _ in results] for results in lexical_results]
+        return self._fuse_batch(vector_rankings, lexical_rankings, top_k)
+
+    def _fuse_batch(self, vector_rankings: List[List[Document]], lexical_rankings: List[List[Document]], top_k: int) -> List[List[Document]]:
+        """Fuse the vector and lexical rankings of each query in a batch"""
+        return [
+            reciprocal_rank_fusion([vector_docs, lexical_docs], k=self.rrf_k)[:top_k]
+            for vector_docs, lexical_docs in zip(vector_rankings, lexical_rankings)
+        ]
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query for retrieval"""
+        cached = self.query_cache.get(query) if self.query_cache else None
+        if cached is not None:
+            return cached
+        embedding = self.vector_store.embed_query(query)
+        if self.query_cache:
+            self.query_cache.put(query, embedding)
+        return embedding
+
+    async def aembed_query(self, query: str) -> List[float]:
+        """Embed a query for retrieval asynchronously"""
+        # Only the in-memory cache tier is checked on the event loop; disk reads and writes run in a worker thread
+        cached = await self.query_cache.aget(query) if self.query_cache else None
+        if cached is not None:
+            return cached
+        embedding = await self.vector_store.aembed_query(query)
+        if self.query_cache:
+            await self.query_cache.aput(query, embedding)
+        return embedding
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed several queries for retrieval in one call"""
+        embeddings, missing = self._cached_embeddings(queries)
+        if missing:
+            self._fill_embeddings(queries, embeddings, missing, self.vector_store.embed_queries([queries[i] for i in missing]))
+        return embeddings
+
+    async def aembed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed several queries for retrieval in one call asynchronously"""
+        embeddings = await self.query_cache.aget_many(queries) if self.query_cache else [None] * len(queries)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            computed = await self.vector_store.aembed_queries([queries[i] for i in missing])
+            self._place_embeddings(embeddings, missing, computed)
+            if self.query_cache:
+                await self.query_cache.aput_many([queries[i] for i in missing], computed)
+        return embeddings
+
+    def _cached_embeddings(self, queries: List[str]) -> Tuple[List[Optional[List[float]]], List[int]]:
+        """Resolve cached query embeddings and list the positions still to embed"""
+        embeddings = self.query_cache.get_many(queries) if self.query_cache else [None] * len(queries)
+        return embeddings, [i for i, embedding in enumerate(embeddings) if embedding is None]
+
+    def _fill_embeddings(self, queries: List[str], embeddings: List[Optional[List[float]]], missing: List[int], computed: List[List[float]]) -> None:
+        """Place freshly computed embeddings in the batch and cache them"""
+        self._place_embeddings(embeddings, missing, computed)
+        if self.query_cache:
+            self.query_cache.put_many([queries[i] for i in missing], computed)
+
+    @staticmethod
+    def _place_embeddings(embeddings: List[Optional[List[float]]], missing: List[int], computed: List[List[float]]) -> None:
+        """Put freshly computed embeddings at the positions that missed the cache"""
+        for position, embedding in zip(missing, computed):
+            embeddings[position] = embedding
+
+    @property
+    def index_version(self):
+        """Version of the underlying index, which changes whenever it is updated"""
+        return self.vector_store.version
+    
+    def pack_context(self, documents: List[Document]) -> PackedContext:
+        """Pack retrieved documents into a context that fits the token budget"""
+        with timed_stage("context"):
+            packed = self.context_packer.pack(documents)
+        metrics.increment("context_tokens_total", packed.tokens)
+        return packed
+
+    def format_context(self, documents: List[Document]) -> str:
+        """Format retrieved documents into a context string"""
+        return self.pack_context(documents).text
@@ -0,0 +1,131 @@
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+import math
+import numpy as np
+import os
+import pickle
+import re
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+# Words too common in policy documents to help rank them
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from has have how i if in is it its me my no not of on or our s
+so than that the their them then there these they this to was we what when where which who will with
+would you your
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase terms, keeping hyphenated terms such as "pre-existing" whole as well as their parts"""
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if "-" in token:
+            terms.append(token)
+            terms.extend(part for part in token.split("-") if part not in STOPWORDS)
+        elif token not in STOPWORDS:
+            terms.append(token)
+    return terms
+
+class BM25Index:
+    """Compact BM25 inverted index over the chunks in the vector store, keyed by docstore id"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids: List[str] = []
+        # Postings hold packed chunk positions and term frequencies per term
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.doc_lengths = array("I")
+        self.total_length = 0
+        # Per-chunk length normalisation, rebuilt lazily after additions
+        self._norms: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    @classmethod
+    def from_documents(cls, ids: Iterable[str], texts: Iterable[str]) -> "BM25Index":
+        """Build an index over the given chunks"""
+        index = cls()
+        index.add(list(ids), list(texts))
+        return index
+
+    def add(self, ids: List[str], texts: List[str]) -> None:
+        """Add chunks to the index"""
+        for doc_id, text in zip(ids, texts):
+            position = len(self.doc_ids)
+            terms = tokenize(text)
+
+            frequencies: Dict[str, int] = {}
+            for term in terms:
+                frequencies[term] = frequencies.get(term, 0) + 1
+            for term, frequency in frequencies.items():
+                postings = self.postings.get(term)
+                if postings is None:
+                    postings = self.postings[term] = (array("I"), array("H"))
+                postings[0].append(position)
+                postings[1].append(min(frequency, 65535))
+
+            self.doc_ids.append(doc_id)
+            self.doc_lengths.append(len(terms))
+            self.total_length += len(terms)
+        self._norms = None
+
+    def search(self, query: str, k: int = 4, mask: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
+        """Return the ids and BM25 scores of the best matching chunks, limited to the positions set in mask if given"""
+        count = len(self.doc_ids)
+        terms = set(tokenize(query))
+        if not count or not terms or k < 1:
+            return []
+
+        if self._norms is None:
+            lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32).astype(np.float32)
+            average_length = max(self.total_length / count, 1.0)
+            self._norms = self.k1 * (1 - self.b + self.b * lengths / average_length)
+
+        scores = np.zeros(count, dtype=np.float32)
+        for term in terms:
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            positions = np.frombuffer(postings[0], dtype=np.uint32)
+            frequencies = np.frombuffer(postings[1], dtype=np.uint16).astype(np.float32)
+            idf = math.log(1 + (count - len(positions) + 0.5) / (len(positions) + 0.5))
+            scores[positions] += idf * frequencies * (self.k1 + 1) / (frequencies + self._norms[positions])
+        if mask is not None:
+            scores[~mask[:count]] = 0
+
+        matches = np.flatnonzero(scores)
+        if len(matches) > k:
+            matches = matches[np.argpartition(-scores[matches], k - 1)[:k]]
+        matches = matches[np.argsort(-scores[matches], kind="stable")]
+        return [(self.doc_ids[position], float(scores[position])) for position in matches]
+
+    def save(self, path: str) -> None:
+        """Atomically write the index to disk"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        state = {
+            "k1": self.k1,
+            "b": self.b,
+            "doc_ids": self.doc_ids,
+            "postings": self.postings,
+            "doc_lengths": self.doc_lengths,
+            "total_length": self.total_length,
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Load an index written by save"""
+        # The file is written by this application, so unpickling it is trusted
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        index = cls(k1=state["k1"], b=state["b"])
+        index.doc_ids = state["doc_ids"]
+        index.postings = state["postings"]
+        index.doc_lengths = state["doc_lengths"]
+        index.total_length = state["total_length"]
+        return index
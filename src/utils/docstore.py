@@ -0,0 +1,147 @@
+from collections.abc import Mapping
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+import json
+import os
+import sqlite3
+import threading
+
+DOCSTORE_FILE = "docstore.sqlite"
+
+# Rows inserted per statement when writing a docstore
+_WRITE_BATCH = 10000
+# Ids looked up per statement when resolving positions
+_LOOKUP_BATCH = 500
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    """Chunk text and metadata read lazily by id from a SQLite file, with unsaved additions held in memory"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        # Chunks added since the file was written; they reach disk when the store is next saved
+        self._added: Dict[str, Document] = {}
+        self._added_positions: Dict[int, str] = {}
+        self._conn = None
+        self._base_count = 0
+        if path:
+            # Read-only, so any number of worker processes can share the file and its page cache
+            self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+            self._base_count = self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def search(self, search: str) -> Union[str, Document]:
+        """Look up a chunk by id"""
+        document = self._added.get(search)
+        if document is not None:
+            return document
+        if self._conn is None:
+            return f"ID {search} not found."
+
+        with self._lock:
+            row = self._conn.execute("SELECT text, metadata FROM chunks WHERE id = ?", (search,)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(id=search, page_content=row[0], metadata=json.loads(row[1]))
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        """Add chunks in memory until the store is saved"""
+        overlapping = set(texts).intersection(self._added)
+        if overlapping:
+            raise ValueError(f"Tried to add ids that already exist: {overlapping}")
+        self._added.update(texts)
+
+    def positions(self, ids: Iterable[str]) -> Dict[str, int]:
+        """Index positions of the given chunk ids, skipping ids that are not stored"""
+        ids = list(ids)
+        wanted = set(ids)
+        found = {doc_id: position for position, doc_id in self._added_positions.items() if doc_id in wanted}
+        if self._conn is None:
+            return found
+
+        with self._lock:
+            # Batched to stay under SQLite's limit on bound parameters
+            for start in range(0, len(ids), _LOOKUP_BATCH):
+                batch = ids[start:start + _LOOKUP_BATCH]
+                placeholders = ", ".join("?" * len(batch))
+                found.update(self._conn.execute(f"SELECT id, position FROM chunks WHERE id IN ({placeholders})", batch).fetchall())
+        return found
+
+    def position_map(self) -> "PositionMap":
+        """Mapping from index position to chunk id, for the FAISS wrapper"""
+        return PositionMap(self)
+
+    def close(self) -> None:
+        """Close the database file"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _id_at(self, position: int) -> Optional[str]:
+        """Chunk id stored at an index position"""
+        # FAISS returns numpy integers, which SQLite does not bind as integers
+        position = int(position)
+        doc_id = self._added_positions.get(position)
+        if doc_id is not None or self._conn is None or not 0 <= position < self._base_count:
+            return doc_id
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM chunks WHERE position = ?", (position,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def write(path: str, rows: Iterable[Tuple[int, str, str, dict]]) -> None:
+        """Atomically write (position, id, text, metadata) rows to a new docstore file"""
+        tmp_path = f"{path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.execute("PRAGMA journal_mode=OFF")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("CREATE TABLE chunks (position INTEGER PRIMARY KEY, id TEXT NOT NULL, text TEXT NOT NULL, metadata TEXT NOT NULL)")
+            batch = []
+            for position, doc_id, text, metadata in rows:
+                batch.append((position, doc_id, text, json.dumps(metadata, default=str)))
+                if len(batch) >= _WRITE_BATCH:
+                    conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", batch)
+                    batch = []
+            conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", batch)
+            # Built after the inserts, which is much faster than maintaining it row by row
+            conn.execute("CREATE UNIQUE INDEX chunks_id ON chunks (id)")
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(tmp_path, path)
+
+class PositionMap(Mapping):
+    """Index position to chunk id mapping over a SQLiteDocstore, so ids are not all held in memory"""
+    # Appends only: chunks leave a saved docstore when the index is rebuilt, never by deleting a position
+
+    def __init__(self, docstore: SQLiteDocstore):
+        self.docstore = docstore
+
+    def __getitem__(self, position: int) -> str:
+        doc_id = self.docstore._id_at(position)
+        if doc_id is None:
+            raise KeyError(position)
+        return doc_id
+
+    def __setitem__(self, position: int, doc_id: str) -> None:
+        self.docstore._added_positions[position] = doc_id
+
+    def update(self, positions: Dict[int, str]) -> None:
+        """Record the ids of appended chunks, as FAISS.add_embeddings does"""
+        for position, doc_id in positions.items():
+            self[position] = doc_id
+
+    def __iter__(self) -> Iterator[int]:
+        yield from range(self.docstore._base_count)
+        yield from self.docstore._added_positions
+
+    def __len__(self) -> int:
+        return self.docstore._base_count + len(self.docstore._added_positions)
+
+    def __contains__(self, position) -> bool:
+        return self.docstore._id_at(position) is not None
@@ -0,0 +1,98 @@
+from contextlib import contextmanager
+from typing import Iterator, Optional
+import fcntl
+import os
+import threading
+
+class ReadWriteLock:
+    """Lock held by any number of readers at once or by a single writer, which may re-enter and read"""
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer: Optional[int] = None
+        # Waiting writers hold back new readers, so a steady stream of queries cannot starve an update
+        self._writers_waiting = 0
+        self._local = threading.local()
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        """Hold the lock shared with other readers"""
+        depth = getattr(self._local, "depth", 0)
+        # A writer reading its own state, or a nested read, already excludes other writers
+        if depth or self._writer == threading.get_ident():
+            self._local.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._local.depth = depth
+            return
+
+        with self._condition:
+            while self._writer is not None or self._writers_waiting:
+                self._condition.wait()
+            self._readers += 1
+        self._local.depth = 1
+        try:
+            yield
+        finally:
+            self._local.depth = 0
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        """Hold the lock exclusively"""
+        me = threading.get_ident()
+        if self._writer == me:
+            yield
+            return
+
+        with self._condition:
+            self._writers_waiting += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = me
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = None
+                self._condition.notify_all()
+
+class FileLock:
+    """Exclusive lock on a file, held across processes, which the holding thread may re-enter"""
+
+    def __init__(self, path: str):
+        self.path = path
+        # Threads of one process queue here, since they would share the file lock
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+
+    @contextmanager
+    def hold(self) -> Iterator[None]:
+        """Hold the lock, waiting for any other process that holds it"""
+        with self._lock:
+            if not self._depth:
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                except BaseException:
+                    os.close(fd)
+                    raise
+                self._fd = fd
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if not self._depth:
+                    # Closing the descriptor releases the lock
+                    os.close(self._fd)
+                    self._fd = None
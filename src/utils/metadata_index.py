@@ -0,0 +1,93 @@
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import os
+import pickle
+
+# Per-chunk fields with a distinct value for nearly every chunk, which no one filters on
+EXCLUDED_FIELDS = frozenset({"chunk_id", "chunk_index", "page_start", "page_end", "char_start", "char_end"})
+
+# A filter value, or a list of values any of which may match
+Filters = Dict[str, Any]
+
+class MetadataIndex:
+    """Inverted index from metadata field values to the index positions of the chunks that have them"""
+
+    def __init__(self, excluded_fields: Iterable[str] = EXCLUDED_FIELDS):
+        self.excluded_fields = frozenset(excluded_fields)
+        # Postings hold packed chunk positions per (field, value)
+        self.postings: Dict[Tuple[str, str], array] = {}
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    @classmethod
+    def from_metadatas(cls, metadatas: Iterable[Dict[str, Any]]) -> "MetadataIndex":
+        """Build an index over the given chunk metadata"""
+        index = cls()
+        index.add(metadatas)
+        return index
+
+    def add(self, metadatas: Iterable[Dict[str, Any]]) -> None:
+        """Add chunks, in the same order as they were added to the vector index"""
+        for metadata in metadatas:
+            for field, value in metadata.items():
+                if field in self.excluded_fields or not isinstance(value, (str, int, float, bool)):
+                    continue
+                key = (field, self._value(value))
+                postings = self.postings.get(key)
+                if postings is None:
+                    postings = self.postings[key] = array("I")
+                postings.append(self.count)
+            self.count += 1
+
+    def mask(self, filters: Optional[Filters], size: Optional[int] = None) -> Optional[np.ndarray]:
+        """Boolean mask over index positions of the chunks matching every filter, or None when there are none"""
+        if not filters:
+            return None
+
+        size = self.count if size is None else size
+        mask = np.ones(size, dtype=bool)
+        for field, values in filters.items():
+            # Any of the listed values may match, and every field must match
+            field_mask = np.zeros(size, dtype=bool)
+            for value in values if isinstance(values, (list, tuple, set)) else [values]:
+                postings = self.postings.get((field, self._value(value)))
+                if postings is not None:
+                    field_mask[np.frombuffer(postings, dtype=np.uint32)] = True
+            mask &= field_mask
+        return mask
+
+    def values(self, field: str) -> List[str]:
+        """Distinct values of a field"""
+        return sorted(value for key_field, value in self.postings if key_field == field)
+
+    @staticmethod
+    def _value(value: Any) -> str:
+        """Compare values as strings, so 2024 in a JSON filter matches "2024" in metadata"""
+        return str(value).lower() if isinstance(value, bool) else str(value)
+
+    def save(self, path: str) -> None:
+        """Atomically write the index to disk"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        state = {
+            "excluded_fields": self.excluded_fields,
+            "postings": self.postings,
+            "count": self.count,
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "MetadataIndex":
+        """Load an index written by save"""
+        # The file is written by this application, so unpickling it is trusted
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        index = cls(excluded_fields=state["excluded_fields"])
+        index.postings = state["postings"]
+        index.count = state["count"]
+        return index
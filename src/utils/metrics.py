@@ -0,0 +1,142 @@
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+import threading
+import time
+
+METRIC_PREFIX = "askmydocs"
+QUANTILES = (0.5, 0.95, 0.99)
+
+LabelSet = Tuple[Tuple[str, str], ...]
+# (metric name, labels, value) read from a component when metrics are scraped
+Sample = Tuple[str, Dict[str, str], float]
+
+# Stage durations of the current request, collected for the Server-Timing header
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+class _Summary:
+    """Count, sum and a sliding window of recent observations"""
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.total = 0.0
+        self.values: Deque[float] = deque(maxlen=window)
+
+class MetricsRegistry:
+    """In-process latency summaries and counters, rendered in the Prometheus text format"""
+
+    def __init__(self, window: int = 2048, prefix: str = METRIC_PREFIX):
+        # Quantiles are computed over this many of the most recent observations
+        self.window = window
+        self.prefix = prefix
+        self._summaries: Dict[str, Dict[LabelSet, _Summary]] = {}
+        self._counters: Dict[str, Dict[LabelSet, float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Record one observation of a summary metric, e.g. a duration in seconds"""
+        key = self._labels(labels)
+        with self._lock:
+            series = self._summaries.setdefault(name, {})
+            summary = series.get(key)
+            if summary is None:
+                summary = series[key] = _Summary(self.window)
+            summary.count += 1
+            summary.total += value
+            summary.values.append(value)
+
+    def increment(self, name: str, value: float = 1.0, **labels: str) -> None:
+        """Add to a counter"""
+        key = self._labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def counter(self, name: str, **labels: str) -> float:
+        """Current value of a counter"""
+        with self._lock:
+            return self._counters.get(name, {}).get(self._labels(labels), 0.0)
+
+    def quantiles(self, name: str, **labels: str) -> Dict[float, float]:
+        """Recent p50/p95/p99 of a summary metric"""
+        with self._lock:
+            summary = self._summaries.get(name, {}).get(self._labels(labels))
+            values = list(summary.values) if summary else []
+        if not values:
+            return {}
+        return dict(zip(QUANTILES, np.quantile(values, QUANTILES).tolist()))
+
+    def render(self, samples: Iterable[Sample] = ()) -> str:
+        """Render every metric, plus samples read from components, in the Prometheus text format"""
+        lines: List[str] = []
+        with self._lock:
+            summaries = {name: {key: (s.count, s.total, list(s.values)) for key, s in series.items()} for name, series in self._summaries.items()}
+            counters = {name: dict(series) for name, series in self._counters.items()}
+
+        for name, series in sorted(summaries.items()):
+            full_name = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {full_name} summary")
+            for key, (count, total, values) in sorted(series.items()):
+                if values:
+                    for quantile, value in zip(QUANTILES, np.quantile(values, QUANTILES).tolist()):
+                        lines.append(f"{full_name}{self._format(key + (('quantile', str(quantile)),))} {value:.6g}")
+                lines.append(f"{full_name}_sum{self._format(key)} {total:.6g}")
+                lines.append(f"{full_name}_count{self._format(key)} {count}")
+
+        for name, labels, value in samples:
+            counters.setdefault(name, {})[self._labels(labels)] = value
+        for name, series in sorted(counters.items()):
+            full_name = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {full_name} {'counter' if name.endswith('_total') else 'gauge'}")
+            for key, value in sorted(series.items()):
+                lines.append(f"{full_name}{self._format(key)} {value:.6g}")
+
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Forget all recorded metrics"""
+        with self._lock:
+            self._summaries.clear()
+            self._counters.clear()
+
+    @staticmethod
+    def _labels(labels: Dict[str, str]) -> LabelSet:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    @staticmethod
+    def _format(key: LabelSet) -> str:
+        if not key:
+            return ""
+        parts = []
+        for name, value in key:
+            value = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            parts.append(f'{name}="{value}"')
+        return "{" + ",".join(parts) + "}"
+
+# Process-wide registry shared by all components
+metrics = MetricsRegistry()
+
+@contextmanager
+def timed_stage(stage: str) -> Iterator[None]:
+    """Time a pipeline stage, recording it in the metrics and the current request's trace"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.observe("stage_seconds", elapsed, stage=stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+def start_trace() -> Dict[str, float]:
+    """Start collecting stage timings for the current request"""
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+def format_server_timing(timings: Dict[str, float]) -> str:
+    """Format stage timings as a Server-Timing header value in milliseconds"""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
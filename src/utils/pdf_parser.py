@@ -1,6 +1,19 @@
 import fitz 
 import re
-from typing import Dict, List, Any
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Any, Optional
+
+def extract_page_range(file_path: str, start: int, stop: int) -> List[str]:
+    """Extract and clean a range of pages; runs in a worker process with its own handle on the file"""
+    parser = PDFParser()
+    if not parser.open(file_path):
+        raise ValueError(f"Could not open PDF: {file_path}")
+    try:
+        return [parser.clean_page(parser.doc[i].get_text()) for i in range(start, stop)]
+    finally:
+        parser.close()
 
 class PDFParser:
     def __init__(self):
@@ -22,10 +35,7 @@ class PDFParser:
         if not self.doc:
             return ""
         
-        text = ""
-        for page in self.doc:
-            text += page.get_text()
-        return text
+        return "".join(page.get_text() for page in self.doc)
     
     def extract_text_by_page(self) -> List[str]:
         """Extract text from each page as a list"""
@@ -33,6 +43,36 @@ class PDFParser:
             return []
         return [page.get_text() for page in self.doc]
     
+    def iter_pages(self, workers: Optional[int] = None, batch_size: int = 8, parallel_threshold: int = 32) -> Iterator[str]:
+        """Yield the cleaned text of each page in order, extracting long documents in parallel worker processes"""
+        if not self.doc:
+            return
+
+        page_count = self.doc.page_count
+        workers = workers or 1
+        if workers <= 1 or page_count < parallel_threshold:
+            for page in self.doc:
+                yield self.clean_page(page.get_text())
+            return
+
+        # Only a window of page batches is in flight, so memory does not grow with the document
+        window = workers * 2
+        ranges = iter(range(0, page_count, batch_size))
+        # Spawned workers are safe to start from a multi-threaded server
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            in_flight = deque()
+            for start in ranges:
+                in_flight.append(executor.submit(extract_page_range, self.file_path, start, min(start + batch_size, page_count)))
+                if len(in_flight) >= window:
+                    break
+
+            while in_flight:
+                pages = in_flight.popleft().result()
+                start = next(ranges, None)
+                if start is not None:
+                    in_flight.append(executor.submit(extract_page_range, self.file_path, start, min(start + batch_size, page_count)))
+                yield from pages
+
     def extract_metadata(self) -> Dict[str, Any]:
         """Extract document metadata"""
         if not self.doc:
@@ -49,6 +89,16 @@ class PDFParser:
         cleaned = re.sub(r'\s+', ' ', cleaned)
         return cleaned.strip()
     
+    def clean_page(self, text: str) -> str:
+        """Clean the text of one page, keeping line breaks so headings can still be found"""
+        # Remove page numbers
+        cleaned = re.sub(r'^\s*\d+\s*$', '', text, flags=re.MULTILINE)
+        # Remove headers/footers (customize for your specific documents)
+        cleaned = re.sub(r'Travel Insurance Policy[^\S\n]*\|.*', '', cleaned)
+        # Remove repeated whitespace within lines and blank lines
+        lines = (re.sub(r'[^\S\n]+', ' ', line).strip() for line in cleaned.split('\n'))
+        return '\n'.join(line for line in lines if line)
+
     def close(self):
         """Close the PDF document"""
         if self.doc:
@@ -0,0 +1,45 @@
+from functools import lru_cache
+import logging
+import math
+import os
+
+logger = logging.getLogger(__name__)
+
+# Average characters per token, used when the tiktoken encoding is unavailable
+CHARS_PER_TOKEN = 4
+
+@lru_cache(maxsize=None)
+def get_encoding():
+    """Load the tiktoken encoding once, or None if it cannot be loaded (e.g. offline)"""
+    name = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        logger.warning(f"Could not load tiktoken encoding {name}, estimating token counts instead: {e}")
+        return None
+
+def count_tokens(text: str) -> int:
+    """Count the tokens in a text"""
+    encoding = get_encoding()
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut a text down to at most max_tokens tokens"""
+    if max_tokens <= 0:
+        return ""
+
+    encoding = get_encoding()
+    if encoding is None:
+        if len(text) <= max_tokens * CHARS_PER_TOKEN:
+            return text
+        truncated = text[:max_tokens * CHARS_PER_TOKEN]
+        # Avoid ending on half a word
+        return truncated.rsplit(" ", 1)[0] if " " in truncated else truncated
+
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
@@ -0,0 +1,131 @@
+from python_multipart.multipart import MultipartParser, parse_options_header
+from python_multipart.exceptions import MultipartParseError
+from src.api.exceptions import FileTooLargeError, InvalidUploadError, UnsupportedFileTypeError
+from typing import AsyncIterable, List, Optional, Tuple
+import asyncio
+import hashlib
+import os
+import tempfile
+import uuid
+
+# Allowance for the multipart boundaries, part headers and other form fields around the file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+def check_content_length(content_length: Optional[str], max_bytes: int) -> None:
+    """Reject a request whose declared body size already exceeds the limit, before any of it is read"""
+    if content_length is None:
+        return
+    try:
+        declared = int(content_length)
+    except ValueError:
+        raise InvalidUploadError("Invalid Content-Length header")
+    if declared > max_bytes + MULTIPART_OVERHEAD_BYTES:
+        raise FileTooLargeError(f"File exceeds the {max_bytes} byte upload limit")
+
+async def save_upload(stream: AsyncIterable[bytes], content_type: str, directory: str, max_bytes: int, field_name: str = "file", suffix: str = ".pdf") -> Tuple[str, str, str, int]:
+    """Parse a multipart body as it arrives, writing its file once to a temporary file; returns the path, filename, SHA-256 and size"""
+    media_type, options = parse_options_header(content_type)
+    boundary = options.get(b"boundary")
+    if media_type != b"multipart/form-data" or not boundary:
+        raise InvalidUploadError("Expected a multipart/form-data body")
+
+    # Parser callbacks only record what they see; the loop below does the I/O
+    headers = {}
+    header_field, header_value = [], []
+    received: List[bytes] = []
+    state = {"filename": None, "in_file": False, "done": False}
+
+    def on_part_begin():
+        headers.clear()
+
+    def on_header_field(data, start, end):
+        header_field.append(data[start:end])
+
+    def on_header_value(data, start, end):
+        header_value.append(data[start:end])
+
+    def on_header_end():
+        headers[b"".join(header_field).lower()] = b"".join(header_value)
+        header_field.clear()
+        header_value.clear()
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(headers.get(b"content-disposition", b""))
+        name = disposition.get(b"name", b"").decode("utf-8", "replace")
+        filename = disposition.get(b"filename")
+        # Only the first file field is kept; other form fields are ignored
+        if name == field_name and filename is not None and state["filename"] is None:
+            state["filename"] = filename.decode("utf-8", "replace")
+            state["in_file"] = True
+
+    def on_part_data(data, start, end):
+        if state["in_file"]:
+            received.append(data[start:end])
+
+    def on_part_end():
+        if state["in_file"]:
+            state["in_file"] = False
+            state["done"] = True
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+
+    # Create the temporary file next to its destination so publishing it is an atomic rename
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in stream:
+                try:
+                    parser.write(chunk)
+                except MultipartParseError as e:
+                    raise InvalidUploadError(f"Malformed multipart body: {e}")
+
+                # Reject the wrong file type as soon as the part headers arrive
+                if state["filename"] is not None and not state["filename"].lower().endswith(suffix):
+                    raise UnsupportedFileTypeError(f"Only {suffix} files are supported")
+
+                if received:
+                    data = b"".join(received)
+                    received.clear()
+                    size += len(data)
+                    # Stop receiving as soon as the limit is crossed
+                    if size > max_bytes:
+                        raise FileTooLargeError(f"File exceeds the {max_bytes} byte upload limit")
+                    digest.update(data)
+                    await asyncio.to_thread(f.write, data)
+
+                if state["done"]:
+                    break
+    except BaseException:
+        discard_upload(tmp_path)
+        raise
+
+    if state["filename"] is None or not state["done"]:
+        discard_upload(tmp_path)
+        raise InvalidUploadError(f"No complete '{field_name}' file in the upload")
+    return tmp_path, state["filename"], digest.hexdigest(), size
+
+def publish_upload(tmp_path: str, directory: str, filename: str) -> str:
+    """Atomically move a fully written upload to its final name"""
+    # Only keep the base name so a crafted filename cannot escape the directory
+    file_path = os.path.join(directory, f"{uuid.uuid4()}_{os.path.basename(filename)}")
+    os.replace(tmp_path, file_path)
+    return file_path
+
+def discard_upload(tmp_path: str) -> None:
+    """Delete a temporary upload, ignoring files that are already gone"""
+    try:
+        os.remove(tmp_path)
+    except OSError:
+        pass
@@ -1,43 +1,1039 @@
 from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_core.documents import Document
+from src.models.embedding_cache import CachedEmbeddings
 from src.models.embeddings import EmbeddingModel
-from typing import List, Optional
+from src.utils.bm25 import BM25Index
+from src.utils.docstore import DOCSTORE_FILE, SQLiteDocstore
+from src.utils.locks import FileLock, ReadWriteLock
+from src.utils.metadata_index import Filters, MetadataIndex
+from src.utils.metrics import timed_stage
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import asyncio
+import faiss
+import itertools
+import json
+import logging
+import math
+import numpy as np
 import os
+import pickle
+import shutil
+import threading
+import uuid
+
+INDEX_FILE = "index.faiss"
+# Pickled LangChain docstore written by earlier versions, migrated on load
+LEGACY_DOCSTORE_FILE = "index.pkl"
+SEGMENTS_DIR = "segments"
+LEXICAL_INDEX_FILE = "bm25.pkl"
+METADATA_INDEX_FILE = "metadata.pkl"
+TOMBSTONES_FILE = "tombstones.pkl"
+# Index type the store was configured for and the corpus size it was trained on
+INDEX_INFO_FILE = "index_info.json"
+# Names the generation directory holding the current base index, so a new base is swapped in with one atomic rename
+CURRENT_FILE = "CURRENT"
+# Held by whichever process is writing to the persist directory
+WRITE_LOCK_FILE = "write.lock"
+GENERATION_PREFIX = "generation-"
+GENERATION_DIR = GENERATION_PREFIX + "{:08d}"
+# Files of a base index, kept together in its generation directory
+BASE_FILES = (INDEX_FILE, DOCSTORE_FILE, LEGACY_DOCSTORE_FILE, LEXICAL_INDEX_FILE, METADATA_INDEX_FILE, TOMBSTONES_FILE, INDEX_INFO_FILE)
+
+# An automatically sized IVF index is retrained once the corpus calls for this many times its cells
+RETRAIN_GROWTH = 2
+
+# FAISS index factory templates for the supported index types
+INDEX_TYPES = {
+    "flat": "Flat",
+    "ivf_flat": "IVF{nlist},Flat",
+    "hnsw": "HNSW{hnsw_m},Flat",
+    "ivf_pq": "IVF{nlist},PQ{pq_m}x{pq_nbits}",
+    "sq_fp16": "SQfp16",
+    "sq8": "SQ8",
+}
+
+DEFAULT_INDEX_PARAMS = {
+    "nlist": None,          # IVF cells; chosen from the corpus size when not set
+    "nprobe": 8,            # IVF cells visited per query
+    "hnsw_m": 32,           # HNSW graph degree
+    "ef_construction": 40,  # HNSW build-time candidate list size
+    "ef_search": 64,        # HNSW query-time candidate list size
+    "pq_m": None,           # PQ sub-quantizers; chosen from the dimension when not set
+    "pq_nbits": 8,          # Bits per PQ code
+    "rescore": False,       # Keep exact float32 vectors beside compressed codes and re-rank candidates with them
+    "rescore_factor": 4,    # Candidates re-ranked per result when rescoring
+}
+
+logger = logging.getLogger(__name__)
+
+# Process-wide counter so versions are unique across store instances too
+_versions = itertools.count(1)
 
 class VectorStore:
-    def __init__(self, embedding_model: EmbeddingModel, db_type="faiss"):
+    def __init__(self, embedding_model: EmbeddingModel, db_type="faiss", max_segments: int = 20, index_type: str = "flat", index_params: Optional[Dict[str, Any]] = None, lexical: bool = True):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unsupported index type: {index_type}. Choose from {', '.join(INDEX_TYPES)}.")
+
         self.embedding_model = embedding_model.model
         self.db_type = db_type
+        self.index_type = index_type
+        self.index_params = {**DEFAULT_INDEX_PARAMS, **(index_params or {})}
+        # Number of vectors the current index was trained on
+        self.trained_size: Optional[int] = None
         self.store = None
+        # BM25 index over the same chunks for hybrid retrieval; None when disabled
+        self.lexical = lexical
+        self.lexical_index: Optional[BM25Index] = BM25Index() if lexical else None
+        # Chunk positions per metadata value, so filters are resolved without reading the docstore
+        self.metadata_index = MetadataIndex()
+        # Number of append segments kept on disk before they are folded into the base index
+        self.max_segments = max_segments
+        # Changes on every update so caches can detect a stale index
+        self.version = next(_versions)
+        # Whether the index reads its vectors straight from the memory-mapped index file
+        self._mapped = False
+        # Vectors appended to a mapped index, searched alongside it until the next save, so the mapping stays shared
+        self._delta = None
+        # Generation of the base index on disk; 0 is the layout without generation directories
+        self._generation = 0
+        # Segment files of that generation already in memory, and the tombstones file last read or written
+        self._segments: Set[str] = set()
+        self._tombstones_stamp: Optional[Tuple[int, int, int]] = None
+        # Persist directory locks shared with other worker processes, one per directory
+        self._file_locks: Dict[str, FileLock] = {}
+        # Positions of deleted chunks, skipped by every search until a purge drops them from the index
+        self.deleted: Set[int] = set()
+        self._deleted_positions: Optional[np.ndarray] = None
+        # Chunk id to position lookup for in-memory stores, as (version, mapping), built on first use
+        self._id_positions: Optional[Tuple[int, Dict[str, int]]] = None
+        # Searches share the lock, so concurrent queries run in parallel; updates hold it exclusively
+        self._lock = ReadWriteLock()
+        # Serialises writers, so a purge that rebuilds outside the query lock cannot lose a concurrent update
+        self._update_lock = threading.RLock()
 
     def create_from_documents(self, documents: List[Document], persist_directory: Optional[str] = None):
         """Create a vector store from documents"""
         if self.db_type == "faiss":
-            self.store = FAISS.from_documents(documents, self.embedding_model)
-            
-            # Save if directory is provided
-            if persist_directory:
-                os.makedirs(persist_directory, exist_ok=True)
-                self.store.save_local(persist_directory)
+            texts = [doc.page_content for doc in documents]
+            ids = [str(uuid.uuid4()) for _ in documents]
+            embeddings = self.embedding_model.embed_documents(texts)
+            metadatas = [doc.metadata for doc in documents]
+            store = self._build_store(texts, embeddings, metadatas, ids)
+            lexical_index = self._build_lexical_index(ids, texts)
+            metadata_index = MetadataIndex.from_metadatas(metadatas)
+
+            with self._writing(persist_directory, sync=False), self._lock.write():
+                self.store = store
+                self._mapped = False
+                self._delta = None
+                self.lexical_index = lexical_index
+                self.metadata_index = metadata_index
+                self._set_deleted(set())
+                self.version = next(_versions)
+
+                # Save if directory is provided
+                if persist_directory:
+                    self._save_base(persist_directory)
         else:
             raise ValueError(f"Unsupported database type: {self.db_type}")
-        
+
         return self.store
-    
+
+    def add_documents(self, documents: List[Document], persist_directory: Optional[str] = None, ids: Optional[List[str]] = None, embeddings: Optional[List[List[float]]] = None) -> List[str]:
+        """Append documents to the vector store, persisting only the new vectors"""
+        if self.db_type != "faiss":
+            raise ValueError(f"Unsupported database type: {self.db_type}")
+        if not documents:
+            return []
+
+        texts = [doc.page_content for doc in documents]
+        metadatas = [doc.metadata for doc in documents]
+        ids = ids or [str(uuid.uuid4()) for _ in documents]
+
+        # Embed outside the lock so queries are only blocked for the index update
+        if embeddings is None:
+            embeddings = self.embedding_model.embed_documents(texts)
+
+        with self._writing(persist_directory), self._lock.write():
+            if self.store is None:
+                self.store = self._build_store(texts, embeddings, metadatas, ids)
+                self.lexical_index = self._build_lexical_index(ids, texts)
+                self.metadata_index = MetadataIndex.from_metadatas(metadatas)
+                self._set_deleted(set())
+            else:
+                self._append_vectors(ids, texts, metadatas, embeddings)
+                if self.lexical_index is not None:
+                    self.lexical_index.add(ids, texts)
+                self.metadata_index.add(metadatas)
+            self.version = next(_versions)
+
+            if persist_directory:
+                self._append_segment(persist_directory, ids, texts, metadatas, embeddings)
+                if len(self._list_segments(persist_directory, self._generation)) > self.max_segments:
+                    self.compact(persist_directory)
+
+        return ids
+
     def load(self, persist_directory: str):
         """Load a vector store from disk"""
         if not os.path.exists(persist_directory):
             raise FileNotFoundError(f"Persist directory does not exist: {persist_directory}")
-        
+
         if self.db_type == "faiss":
-            self.store = FAISS.load_local(persist_directory, self.embedding_model)
+            # Holds off writers in other processes, so the generation read here is not replaced part-way through
+            with self._writing(persist_directory, sync=False):
+                self._load_generation(persist_directory)
+
+        return self.store
+
+    def _load_generation(self, persist_directory: str) -> None:
+        """Load the base index of the current generation and replay its segments"""
+        store, mapped = None, False
+        generation = self._read_generation(persist_directory)
+        base_directory = self._generation_path(persist_directory, generation)
+        index_path = os.path.join(base_directory, INDEX_FILE)
+        docstore_path = os.path.join(base_directory, DOCSTORE_FILE)
+        legacy = os.path.exists(os.path.join(base_directory, LEGACY_DOCSTORE_FILE)) and not os.path.exists(docstore_path)
+        if legacy:
+            # The index files are written by this application, so unpickling them is trusted
+            store = FAISS.load_local(
+                base_directory,
+                self.embedding_model,
+                allow_dangerous_deserialization=True
+            )
+        elif os.path.exists(index_path):
+            # Map the vectors rather than reading them, so every worker shares one page-cached copy
+            index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP_IFC)
+            docstore = SQLiteDocstore(docstore_path)
+            store = FAISS(self.embedding_model, index, docstore, docstore.position_map())
+            mapped = True
+
+        # Replay the segments appended since the base index was written
+        segment_paths = self._list_segments(persist_directory, generation)
+        texts, embeddings, metadatas, ids = self._read_segments(segment_paths)
+
+        lexical_index = self._load_lexical_index(base_directory, store)
+        metadata_index = self._load_metadata_index(base_directory, store)
+        deleted = self._load_tombstones(base_directory)
+        tombstones_stamp = self._file_stamp(os.path.join(base_directory, TOMBSTONES_FILE))
+
+        with self._lock.write():
+            self._load_index_info(base_directory, store)
+            self._generation = generation
+            self.store = store
+            self._mapped = mapped
+            self._delta = None
+            self.lexical_index = lexical_index
+            self.metadata_index = metadata_index
+            self._set_deleted(deleted)
+            self._tombstones_stamp = tombstones_stamp
+            self._segments = set()
+            self._add_replayed(segment_paths, ids, texts, metadatas, embeddings)
+            self.version = next(_versions)
+
+            if legacy:
+                # Rewrite in the compact format so later starts map the index instead of unpickling it
+                logger.info(f"Migrating vector store in {persist_directory} to the memory-mapped format")
+                self._save_base(persist_directory)
+
+    def rebuild(self, index_type: Optional[str] = None, index_params: Optional[Dict[str, Any]] = None, persist_directory: Optional[str] = None):
+        """Rebuild the index, optionally as a different index type, retraining on the full corpus"""
+        if not self.store:
+            raise ValueError("Vector store is not initialized. Please create or load it first.")
+        if index_type and index_type not in INDEX_TYPES:
+            raise ValueError(f"Unsupported index type: {index_type}. Choose from {', '.join(INDEX_TYPES)}.")
+
+        with self._writing(persist_directory):
+            # Changed under the lock, so a concurrent append or retrain never builds with half-updated settings
+            if index_type:
+                self.index_type = index_type
+            if index_params:
+                self.index_params.update(index_params)
+            # Exclusive because recovering IVF vectors builds the index's direct map
+            with self._lock.write():
+                old_store = self.store
+                deleted = set(self.deleted)
+                # Deleted chunks are left out, so the rebuilt index holds live chunks only
+                positions = [i for i in sorted(old_store.index_to_docstore_id) if i not in deleted]
+                ids = [old_store.index_to_docstore_id[i] for i in positions]
+                documents = [old_store.docstore.search(doc_id) for doc_id in ids]
+                embeddings = self._all_stored_vectors()
+
+            texts = [doc.page_content for doc in documents]
+            metadatas = [doc.metadata for doc in documents]
+            if embeddings is None:
+                # Compressed codes cannot be decoded exactly, so fetch the vectors through the (cached) embedding model
+                embeddings = np.asarray(self.embedding_model.embed_documents(texts), dtype=np.float32).reshape(len(texts), old_store.index.d)
+            elif deleted:
+                embeddings = embeddings[positions]
+
+            # Queries keep using the old index until the new one is swapped in
+            store = self._build_store(texts, embeddings, metadatas, ids)
+            self._swap_rebuilt(store, ids, texts, metadatas, deleted, persist_directory)
 
         return self.store
-    
-    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
+
+    def _swap_rebuilt(self, store: FAISS, ids: List[str], texts: List[str], metadatas: List[dict], deleted: Set[int], persist_directory: Optional[str]) -> None:
+        """Serve queries from a rebuilt store, which holds no deleted chunks"""
+        # Dropping chunks shifts the positions the lexical and metadata indexes refer to
+        lexical_index = self._build_lexical_index(ids, texts) if deleted else self.lexical_index
+        metadata_index = MetadataIndex.from_metadatas(metadatas) if deleted else self.metadata_index
+        with self._lock.write():
+            self.store = store
+            self._mapped = False
+            self._delta = None
+            self.lexical_index = lexical_index
+            self.metadata_index = metadata_index
+            self._set_deleted(set())
+            self.version = next(_versions)
+            if persist_directory:
+                self._save_base(persist_directory)
+
+    def delete(self, ids: Iterable[str], persist_directory: Optional[str] = None) -> int:
+        """Delete chunks by id, returning how many were removed from search results"""
+        with self._writing(persist_directory), self._lock.write():
+            if not self.store:
+                return 0
+            positions = set(self._positions_of(ids).values()) - self.deleted
+            if not positions:
+                return 0
+
+            # Tombstone the positions; the vectors stay in the index until the next purge
+            self._set_deleted(self.deleted | positions)
+            self.version = next(_versions)
+            if persist_directory:
+                self._save_tombstones(persist_directory)
+        return len(positions)
+
+    def purge(self, persist_directory: Optional[str] = None):
+        """Drop deleted chunks from the index for good, keeping its current index type"""
+        with self._writing(persist_directory):
+            if not self.store or not self.deleted:
+                return self.store
+            if self._exact_vector_index(self.store.index) is None:
+                # Compressed codes cannot be decoded back to the embeddings, so drop them in place rather than re-embed
+                return self._purge_codes(persist_directory)
+            # Rebuilt as the configured type, which is the current one unless a flat fallback has grown large enough to train
+            return self.rebuild(
+                index_params={"rescore": self.is_rescored()},
+                persist_directory=persist_directory
+            )
+
+    def _purge_codes(self, persist_directory: Optional[str]):
+        """Purge deleted chunks from a compressed index by copying it without their codes"""
+        with self._writing(persist_directory):
+            with self._lock.read():
+                old_store = self.store
+                deleted = set(self.deleted)
+                positions = [i for i in sorted(old_store.index_to_docstore_id) if i not in deleted]
+                ids = [old_store.index_to_docstore_id[i] for i in positions]
+                documents = [old_store.docstore.search(doc_id) for doc_id in ids]
+                index = self._without_positions(self._merged_index(), deleted)
+
+            texts = [doc.page_content for doc in documents]
+            metadatas = [doc.metadata for doc in documents]
+            docstore = InMemoryDocstore({doc_id: Document(id=doc_id, page_content=text, metadata=metadata) for doc_id, text, metadata in zip(ids, texts, metadatas)})
+            store = FAISS(self.embedding_model, index, docstore, dict(enumerate(ids)))
+            self._swap_rebuilt(store, ids, texts, metadatas, deleted, persist_directory)
+        return self.store
+
+    @staticmethod
+    def _without_positions(index, removed: Set[int]):
+        """Copy of an index without the vectors at the given positions, the rest renumbered to stay consecutive"""
+        ntotal = index.ntotal
+        # Serialising makes an owned copy; a memory-mapped index cannot be modified
+        index = faiss.deserialize_index(faiss.serialize_index(index))
+        removed = np.fromiter(sorted(removed), dtype=np.int64, count=len(removed))
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            # FAISS cannot remove from an IVF index that keeps a direct map
+            ivf.make_direct_map(False)
+        index.remove_ids(faiss.IDSelectorBatch(removed))
+
+        if ivf is not None:
+            # Flat codes are compacted by the removal, but IVF lists keep their labels, so shift them down past the gaps
+            remap = np.arange(ntotal) - np.searchsorted(removed, np.arange(ntotal))
+            for cell in range(ivf.nlist):
+                size = ivf.invlists.list_size(cell)
+                if size:
+                    labels = faiss.rev_swig_ptr(ivf.invlists.get_ids(cell), size)
+                    labels[:] = remap[labels]
+        return index
+
+    @property
+    def deleted_ratio(self) -> float:
+        """Fraction of the vectors in the index that belong to deleted chunks"""
+        total = self.vector_count
+        return len(self.deleted) / total if total else 0.0
+
+    @property
+    def vector_count(self) -> int:
+        """Number of vectors in the store, including those appended since the base index was saved"""
+        if not self.store:
+            return 0
+        return self.store.index.ntotal + (self._delta.ntotal if self._delta is not None else 0)
+
+    def current_index_type(self) -> Optional[str]:
+        """Index type of the loaded index, which may differ from the configured one"""
+        if not self.store:
+            return None
+        return self._index_type_of(self.store.index)
+
+    @classmethod
+    def _index_type_of(cls, index) -> str:
+        """Index type of a FAISS index"""
+        index = cls._base_index(index)
+        if isinstance(index, faiss.IndexScalarQuantizer):
+            return "sq_fp16" if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "sq8"
+        if isinstance(index, faiss.IndexIVFPQ):
+            return "ivf_pq"
+        if isinstance(index, faiss.IndexIVFFlat):
+            return "ivf_flat"
+        if isinstance(index, faiss.IndexHNSW):
+            return "hnsw"
+        return "flat"
+
+    def is_rescored(self) -> bool:
+        """Whether the loaded index re-ranks candidates with exact float32 vectors"""
+        return bool(self.store) and isinstance(self.store.index, faiss.IndexRefine)
+
+    def resident_index_bytes(self) -> int:
+        """Serialised size of the index held in memory, excluding exact vectors a rescoring index maps from disk"""
+        if not self.store:
+            return 0
+        with self._lock.read():
+            resident = int(faiss.serialize_index(self._base_index(self.store.index)).nbytes)
+            if self._delta is not None:
+                resident += int(faiss.serialize_index(self._delta).nbytes)
+            return resident
+
+    @staticmethod
+    def _base_index(index):
+        """The compressed index inside a rescoring wrapper, or the index itself"""
+        return faiss.downcast_index(index.base_index) if isinstance(index, faiss.IndexRefine) else index
+
+    def _build_lexical_index(self, ids: List[str], texts: List[str]) -> Optional[BM25Index]:
+        """Build the BM25 index for a new store, if lexical retrieval is enabled"""
+        return BM25Index.from_documents(ids, texts) if self.lexical else None
+
+    def _load_lexical_index(self, base_directory: str, store: Optional[FAISS]) -> Optional[BM25Index]:
+        """Load the BM25 index saved with the base index, building it for stores written without one"""
+        if not self.lexical:
+            return None
+        path = os.path.join(base_directory, LEXICAL_INDEX_FILE)
+        if store is not None and os.path.exists(path):
+            return BM25Index.load(path)
+        if store is None:
+            return BM25Index()
+
+        logger.info("No lexical index found, building one from the stored documents")
+        ids = [store.index_to_docstore_id[i] for i in sorted(store.index_to_docstore_id)]
+        return BM25Index.from_documents(ids, [store.docstore.search(doc_id).page_content for doc_id in ids])
+
+    def _load_metadata_index(self, base_directory: str, store: Optional[FAISS]) -> MetadataIndex:
+        """Load the metadata index saved with the base index, building it for stores written without one"""
+        path = os.path.join(base_directory, METADATA_INDEX_FILE)
+        if store is not None and os.path.exists(path):
+            return MetadataIndex.load(path)
+        if store is None:
+            return MetadataIndex()
+
+        logger.info("No metadata index found, building one from the stored documents")
+        ids = [store.index_to_docstore_id[i] for i in sorted(store.index_to_docstore_id)]
+        return MetadataIndex.from_metadatas(store.docstore.search(doc_id).metadata for doc_id in ids)
+
+    def get_vectors(self, ids: List[str]) -> Optional[np.ndarray]:
+        """Vectors stored in the index for the given chunk ids, in the same order, or None if any are missing"""
+        for writing in (False, True):
+            with self._lock.write() if writing else self._lock.read():
+                if not self.store or not ids:
+                    return None
+                positions = self._positions_of(ids)
+                if len(positions) < len(set(ids)):
+                    return None
+
+                # A rescoring index keeps the exact vectors beside the compressed ones
+                index = self.store.index
+                if isinstance(index, faiss.IndexRefine):
+                    index = faiss.downcast_index(index.refine_index)
+                base_total = index.ntotal
+                ivf = faiss.try_extract_index_ivf(index)
+                if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+                    # IVF lists are keyed by cell, so reconstructing by position needs the direct map, built once exclusively
+                    if not writing:
+                        continue
+                    ivf.make_direct_map()
+                return np.vstack([
+                    index.reconstruct(positions[doc_id]) if positions[doc_id] < base_total else self._delta.reconstruct(positions[doc_id] - base_total)
+                    for doc_id in ids
+                ])
+
+    def _save_index_info(self, base_directory: str) -> None:
+        """Record the configured index type and training size, so a flat fallback or an outgrown index is retrained after a restart"""
+        with open(os.path.join(base_directory, INDEX_INFO_FILE), "w", encoding="utf-8") as f:
+            json.dump({"index_type": self.index_type, "trained_size": self.trained_size}, f)
+
+    def _load_index_info(self, base_directory: str, store: Optional[FAISS]) -> None:
+        """Restore the configured index type and training size saved with the base index"""
+        path = os.path.join(base_directory, INDEX_INFO_FILE)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                info = json.load(f)
+            self.index_type = info["index_type"]
+            self.trained_size = info["trained_size"]
+        elif store is not None:
+            # Stores written without the file were built as the type they hold
+            self.index_type = self._index_type_of(store.index)
+            self.trained_size = store.index.ntotal
+
+    def _load_tombstones(self, base_directory: str) -> Set[int]:
+        """Load the positions of chunks deleted since the index was last purged"""
+        path = os.path.join(base_directory, TOMBSTONES_FILE)
+        if not os.path.exists(path):
+            return set()
+        # The file is written by this application, so unpickling it is trusted
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def _save_tombstones(self, persist_directory: str) -> None:
+        """Atomically write the deleted positions of the current generation"""
+        self._write_tombstones(self._generation_path(persist_directory, self._generation))
+
+    def _write_tombstones(self, base_directory: str) -> None:
+        """Atomically write the deleted positions beside a base index, or remove the file when there are none"""
+        path = os.path.join(base_directory, TOMBSTONES_FILE)
+        if not self.deleted:
+            if os.path.exists(path):
+                os.remove(path)
+            self._tombstones_stamp = None
+            return
+
+        os.makedirs(base_directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self.deleted, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self._tombstones_stamp = self._file_stamp(path)
+
+    def _set_deleted(self, deleted: Set[int]) -> None:
+        """Replace the deleted positions, dropping the array cached for search masks"""
+        self.deleted = deleted
+        self._deleted_positions = None
+
+    def _positions_of(self, ids: Iterable[str]) -> Dict[str, int]:
+        """Index positions of the given chunk ids"""
+        docstore = self.store.docstore
+        if isinstance(docstore, SQLiteDocstore):
+            return docstore.positions(ids)
+        if self._id_positions is None or self._id_positions[0] != self.version:
+            self._id_positions = (self.version, {doc_id: position for position, doc_id in self.store.index_to_docstore_id.items()})
+        lookup = self._id_positions[1]
+        return {doc_id: lookup[doc_id] for doc_id in ids if doc_id in lookup}
+
+    def _search_mask(self, filters: Optional[Filters], size: int) -> Optional[np.ndarray]:
+        """Positions a search may return: those matching the filters that have not been deleted"""
+        mask = self.metadata_index.mask(filters, size)
+        if self.deleted:
+            if self._deleted_positions is None:
+                self._deleted_positions = np.fromiter(self.deleted, dtype=np.int64, count=len(self.deleted))
+            if mask is None:
+                mask = np.ones(size, dtype=bool)
+            mask[self._deleted_positions] = False
+        return mask
+
+    def _stored_vectors(self, index) -> Optional[np.ndarray]:
+        """Recover the original vectors from an index that stores them uncompressed"""
+        if index.ntotal == 0:
+            return np.empty((0, index.d), dtype=np.float32)
+
+        index = self._exact_vector_index(index)
+        if index is None:
+            return None
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.make_direct_map()
+        return index.reconstruct_n(0, index.ntotal)
+
+    def _merge_delta(self, vectors: np.ndarray, k: int, distances: np.ndarray, indices: np.ndarray, mask: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Search the appended vectors and merge their nearest hits with those of the base index"""
+        params, bitmap = None, None
+        if mask is not None:
+            bitmap = np.packbits(mask, bitorder="little")
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap)))
+        delta_distances, delta_indices = self._delta.search(vectors, k, params=params)
+        delta_indices = np.where(delta_indices == -1, -1, delta_indices + self.store.index.ntotal)
+
+        distances = np.hstack([distances, delta_distances])
+        indices = np.hstack([indices, delta_indices])
+        # Missing hits sort last; inner-product scores rank highest first
+        ascending = self._delta.metric_type == faiss.METRIC_L2
+        keys = np.where(indices == -1, np.inf, distances if ascending else -distances)
+        order = np.argsort(keys, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(indices, order, axis=1)
+
+    def _all_stored_vectors(self) -> Optional[np.ndarray]:
+        """Exact vectors of every position, appended ones included, or None if the base index only keeps compressed codes"""
+        vectors = self._stored_vectors(self.store.index)
+        if vectors is None or self._delta is None:
+            return vectors
+        return np.vstack([vectors, self._delta.reconstruct_n(0, self._delta.ntotal)])
+
+    def _merged_index(self):
+        """The base index with the appended vectors added, as one index"""
+        if self._delta is None:
+            return self.store.index
+        # Serialising makes an owned copy; a memory-mapped index cannot be modified
+        index = faiss.deserialize_index(faiss.serialize_index(self.store.index))
+        index.add(self._delta.reconstruct_n(0, self._delta.ntotal))
+        return index
+
+    def _append_vectors(self, ids: List[str], texts: List[str], metadatas: List[dict], embeddings) -> None:
+        """Add chunks to the loaded store, keeping the vectors of a mapped index in the appended index"""
+        if not self._mapped:
+            self.store.add_embeddings(list(zip(texts, embeddings)), metadatas=metadatas, ids=ids)
+            return
+
+        # FAISS aborts the process when vectors are added to a mapped index, and copying it would unshare its pages
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), self.store.index.d)
+        if self._delta is None:
+            self._delta = faiss.IndexFlat(self.store.index.d, self.store.index.metric_type)
+        start = self.vector_count
+        self._delta.add(vectors)
+        self.store.docstore.add({doc_id: Document(id=doc_id, page_content=text, metadata=metadata) for doc_id, text, metadata in zip(ids, texts, metadatas)})
+        self.store.index_to_docstore_id.update({start + i: doc_id for i, doc_id in enumerate(ids)})
+
+    def _exact_vector_index(self, index):
+        """The part of an index holding uncompressed vectors, or None if it only keeps compressed codes"""
+        # A rescoring index keeps the exact vectors in its refinement index
+        if isinstance(index, faiss.IndexRefine):
+            return self._exact_vector_index(faiss.downcast_index(index.refine_index))
+
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            return index if isinstance(ivf, faiss.IndexIVFFlat) else None
+        if isinstance(index, faiss.IndexHNSW):
+            return index if isinstance(index.storage, faiss.IndexFlat) else None
+        return index if isinstance(index, faiss.IndexFlat) else None
+
+    def _build_store(self, texts: List[str], embeddings, metadatas: List[dict], ids: Optional[List[str]] = None) -> FAISS:
+        """Build a LangChain FAISS store on a new index of the configured type"""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        index = self._create_index(vectors)
+        store = FAISS(self.embedding_model, index, InMemoryDocstore(), {})
+        # A purge of every chunk leaves nothing to add, and the wrapper cannot add an empty batch
+        if texts:
+            # Pass rows as arrays; converting to Python lists costs far more memory than the vectors themselves
+            store.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+        return store
+
+    def _index_plan(self, count: int, dim: int) -> Tuple[str, Dict[str, Any]]:
+        """Index type and parameters to train for a corpus of this size, falling back to flat when it is too small"""
+        params = dict(self.index_params)
+        params["nlist"] = params["nlist"] or max(1, min(int(4 * math.sqrt(count)), count // 39))
+        params["pq_m"] = params["pq_m"] or self._default_pq_m(dim)
+
+        index_type = self.index_type
+        if index_type.startswith("ivf"):
+            # k-means needs at least one point per cell, and PQ one per code
+            min_train = params["nlist"]
+            if index_type == "ivf_pq":
+                min_train = max(min_train, 2 ** params["pq_nbits"])
+            if count < min_train:
+                index_type = "flat"
+        return index_type, params
+
+    def needs_retrain(self) -> bool:
+        """Whether the corpus has outgrown the index it was trained on"""
+        if not self.store or not self.index_type.startswith("ivf"):
+            return False
+        count = self.vector_count - len(self.deleted)
+        index_type, params = self._index_plan(count, self.store.index.d)
+        if self.current_index_type() == "flat":
+            # A store that fell back to flat is trained as configured once it is large enough
+            return index_type != "flat"
+        if self.index_params["nlist"]:
+            return False
+        ivf = faiss.try_extract_index_ivf(self._base_index(self.store.index))
+        # Cells sized for a much smaller corpus grow long, and each probe scans more vectors
+        return ivf is not None and params["nlist"] >= RETRAIN_GROWTH * ivf.nlist
+
+    def _create_index(self, vectors: np.ndarray):
+        """Create a FAISS index for the configured type, training it on the given vectors"""
+        count, dim = vectors.shape
+        index_type, params = self._index_plan(count, dim)
+        if index_type != self.index_type:
+            logger.warning(f"{count} vectors are too few to train a {self.index_type} index, using a flat index until the corpus grows")
+        self.trained_size = count
+
+        factory = INDEX_TYPES[index_type].format(**params)
+        if params["rescore"] and index_type != "flat":
+            factory += ",RFlat"
+        index = faiss.index_factory(dim, factory)
+        if isinstance(index, faiss.IndexRefine):
+            index.k_factor = params["rescore_factor"]
+        if isinstance(self._base_index(index), faiss.IndexHNSW):
+            self._base_index(index).hnsw.efConstruction = params["ef_construction"]
+        if not index.is_trained:
+            index.train(vectors)
+        return index
+
+    @staticmethod
+    def _default_pq_m(dim: int) -> int:
+        """Largest number of PQ sub-quantizers up to 16 that divides the dimension"""
+        return next(m for m in range(min(16, dim), 0, -1) if dim % m == 0)
+
+    def _search_parameters(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None, selector=None):
+        """Per-query FAISS search parameters for the current index type"""
+        index = self.store.index
+        base = self._base_index(index)
+        params = None
+        if faiss.try_extract_index_ivf(base) is not None:
+            params = faiss.SearchParametersIVF(nprobe=nprobe or self.index_params["nprobe"])
+        elif isinstance(base, faiss.IndexHNSW):
+            params = faiss.SearchParametersHNSW(efSearch=ef_search or self.index_params["ef_search"])
+        if selector is not None:
+            # The base index applies the filter while it searches, so the refinement step only sees matching candidates
+            params = params or faiss.SearchParameters()
+            params.sel = selector
+
+        if isinstance(index, faiss.IndexRefine):
+            return faiss.IndexRefineSearchParameters(k_factor=self.index_params["rescore_factor"], base_index_params=params)
+        return params
+
+    def compact(self, persist_directory: str) -> None:
+        """Fold the append segments into a single base index on disk"""
+        with self._writing(persist_directory), self._lock.write():
+            if self.store is not None:
+                self._save_base(persist_directory)
+
+    def _save_base(self, persist_directory: str) -> None:
+        """Write the full index as a new generation, swap it in atomically and drop the files it replaces"""
+        generation = max(self._generation, self._read_generation(persist_directory)) + 1
+        base_directory = self._generation_path(persist_directory, generation)
+        # Left behind by a save that crashed before it was swapped in
+        shutil.rmtree(base_directory, ignore_errors=True)
+        os.makedirs(base_directory)
+        docstore_path = os.path.join(base_directory, DOCSTORE_FILE)
+
+        index_path = os.path.join(base_directory, INDEX_FILE)
+        faiss.write_index(self._merged_index(), index_path)
+        SQLiteDocstore.write(docstore_path, self._docstore_rows())
+        if self.lexical_index is not None:
+            self.lexical_index.save(os.path.join(base_directory, LEXICAL_INDEX_FILE))
+        self.metadata_index.save(os.path.join(base_directory, METADATA_INDEX_FILE))
+        self._save_index_info(base_directory)
+        # The full index still holds deleted chunks until they are purged, so their tombstones are kept
+        self._write_tombstones(base_directory)
+
+        # A single rename switches every file at once, so a crash never pairs an index with another generation's chunks
+        current_path = os.path.join(persist_directory, CURRENT_FILE)
+        with open(f"{current_path}.tmp", "w", encoding="utf-8") as f:
+            f.write(str(generation))
+        os.replace(f"{current_path}.tmp", current_path)
+        self._generation = generation
+        self._segments = set()
+
+        # Serve vectors and chunk text from the new files instead of holding them in memory
+        previous = self.store.docstore
+        docstore = SQLiteDocstore(docstore_path)
+        self.store.index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP_IFC)
+        self._mapped = True
+        self._delta = None
+        self.store.docstore = docstore
+        self.store.index_to_docstore_id = docstore.position_map()
+        if isinstance(previous, SQLiteDocstore):
+            previous.close()
+        # Files another process still maps stay readable after they are unlinked
+        self._remove_stale_files(persist_directory)
+
+    @staticmethod
+    def _read_generation(persist_directory: str) -> int:
+        """Generation of the base index currently on disk"""
+        path = os.path.join(persist_directory, CURRENT_FILE)
+        if not os.path.exists(path):
+            return 0
+        with open(path, "r", encoding="utf-8") as f:
+            return int(f.read().strip())
+
+    @staticmethod
+    def _generation_path(persist_directory: str, generation: int) -> str:
+        """Directory holding the base index files of a generation; generation 0 keeps them in the persist directory itself"""
+        return os.path.join(persist_directory, GENERATION_DIR.format(generation)) if generation else persist_directory
+
+    @classmethod
+    def base_directory(cls, persist_directory: str) -> str:
+        """Directory holding the files of the base index currently on disk"""
+        return cls._generation_path(persist_directory, cls._read_generation(persist_directory))
+
+    def _remove_stale_files(self, persist_directory: str) -> None:
+        """Delete the generations, segments and unversioned files the current generation replaces"""
+        current = GENERATION_DIR.format(self._generation)
+        for name in os.listdir(persist_directory):
+            if name.startswith(GENERATION_PREFIX) and name != current:
+                shutil.rmtree(os.path.join(persist_directory, name), ignore_errors=True)
+        for name in BASE_FILES:
+            path = os.path.join(persist_directory, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+        segments_dir = os.path.join(persist_directory, SEGMENTS_DIR)
+        for path in self._list_segments(persist_directory):
+            if self._segment_key(path)[0] != self._generation:
+                os.remove(path)
+        if os.path.isdir(segments_dir) and not os.listdir(segments_dir):
+            os.rmdir(segments_dir)
+
+    def _docstore_rows(self):
+        """Yield (position, id, text, metadata) for every chunk, in index order"""
+        positions = self.store.index_to_docstore_id
+        for position in range(self.vector_count):
+            doc_id = positions[position]
+            doc = self.store.docstore.search(doc_id)
+            yield position, doc_id, doc.page_content, doc.metadata
+
+    def _list_segments(self, persist_directory: str, generation: Optional[int] = None) -> List[str]:
+        """List segment files, of one generation if given, in the order they were written"""
+        segments_dir = os.path.join(persist_directory, SEGMENTS_DIR)
+        if not os.path.exists(segments_dir):
+            return []
+        paths = [os.path.join(segments_dir, name) for name in os.listdir(segments_dir) if name.endswith(".pkl")]
+        if generation is not None:
+            paths = [path for path in paths if self._segment_key(path)[0] == generation]
+        return sorted(paths, key=self._segment_key)
+
+    @staticmethod
+    def _segment_key(path: str) -> Tuple[int, int]:
+        """(generation, sequence) of a segment file; segments written before generations belong to generation 0"""
+        parts = os.path.basename(path)[:-len(".pkl")].split("-")
+        return (int(parts[0]), int(parts[1])) if len(parts) == 2 else (0, int(parts[0]))
+
+    def _append_segment(self, persist_directory: str, ids: List[str], texts: List[str], metadatas: List[dict], embeddings: List[List[float]]) -> None:
+        """Write one append segment holding only the new vectors"""
+        segments_dir = os.path.join(persist_directory, SEGMENTS_DIR)
+        os.makedirs(segments_dir, exist_ok=True)
+
+        # Segments extend the base of one generation, and are dropped along with it
+        existing = self._list_segments(persist_directory, self._generation)
+        sequence = self._segment_key(existing[-1])[1] + 1 if existing else 0
+        segment_path = os.path.join(segments_dir, f"{self._generation:08d}-{sequence:08d}.pkl")
+
+        segment = {
+            "ids": ids,
+            "texts": texts,
+            "metadatas": metadatas,
+            "embeddings": np.asarray(embeddings, dtype=np.float32),
+        }
+
+        # Write to a temporary file first so a crash never leaves a partial segment
+        tmp_path = f"{segment_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(segment, f)
+        os.replace(tmp_path, segment_path)
+        self._segments.add(os.path.basename(segment_path))
+
+    @staticmethod
+    def _read_segments(segment_paths: List[str]) -> Tuple[List[str], List[List[float]], List[dict], List[str]]:
+        """Texts, embeddings, metadata and ids of the given segments, concatenated in order"""
+        texts, embeddings, metadatas, ids = [], [], [], []
+        for segment_path in segment_paths:
+            with open(segment_path, "rb") as f:
+                segment = pickle.load(f)
+            texts.extend(segment["texts"])
+            embeddings.extend(segment["embeddings"].tolist())
+            metadatas.extend(segment["metadatas"])
+            ids.extend(segment["ids"])
+        return texts, embeddings, metadatas, ids
+
+    def _add_replayed(self, segment_paths: List[str], ids: List[str], texts: List[str], metadatas: List[dict], embeddings: List[List[float]]) -> None:
+        """Add the chunks read from segment files to the store and its lexical and metadata indexes"""
+        if texts:
+            if self.store is None:
+                self.store = self._build_store(texts, embeddings, metadatas, ids)
+            else:
+                # Kept beside the mapped index rather than copying it into this process
+                self._append_vectors(ids, texts, metadatas, embeddings)
+            if self.lexical_index is not None:
+                self.lexical_index.add(ids, texts)
+            self.metadata_index.add(metadatas)
+        self._segments.update(os.path.basename(path) for path in segment_paths)
+
+    @contextmanager
+    def _writing(self, persist_directory: Optional[str], sync: bool = True) -> Iterator[None]:
+        """Hold the update lock and, for a persisted store, the directory lock shared with other processes"""
+        with self._update_lock:
+            if not persist_directory:
+                yield
+                return
+            os.makedirs(persist_directory, exist_ok=True)
+            key = os.path.abspath(persist_directory)
+            if key not in self._file_locks:
+                self._file_locks[key] = FileLock(os.path.join(persist_directory, WRITE_LOCK_FILE))
+            with self._file_locks[key].hold():
+                if sync:
+                    # Build on what other workers wrote, so their chunks are neither overwritten nor renumbered
+                    self._sync(persist_directory)
+                yield
+
+    def _sync(self, persist_directory: str) -> None:
+        """Catch up with the saves, segments and deletions other processes wrote to the directory"""
+        generation = self._read_generation(persist_directory)
+        if self.store is None or generation != self._generation:
+            self._load_generation(persist_directory)
+            return
+
+        # Segments are numbered under the directory lock, so replaying them in order gives every process the same positions
+        segment_paths = [path for path in self._list_segments(persist_directory, generation) if os.path.basename(path) not in self._segments]
+        if segment_paths:
+            texts, embeddings, metadatas, ids = self._read_segments(segment_paths)
+            with self._lock.write():
+                self._add_replayed(segment_paths, ids, texts, metadatas, embeddings)
+                self.version = next(_versions)
+
+        base_directory = self._generation_path(persist_directory, generation)
+        stamp = self._file_stamp(os.path.join(base_directory, TOMBSTONES_FILE))
+        if stamp != self._tombstones_stamp:
+            deleted = self._load_tombstones(base_directory)
+            with self._lock.write():
+                self._set_deleted(deleted)
+                self._tombstones_stamp = stamp
+                self.version = next(_versions)
+
+    def refresh(self, persist_directory: str) -> bool:
+        """Pick up chunks, deletions and saves other processes wrote to the directory, returning whether there were any"""
+        if not os.path.exists(persist_directory) or not self._changed_on_disk(persist_directory):
+            return False
+        version = self.version
+        with self._writing(persist_directory):
+            pass
+        return self.version != version
+
+    def _changed_on_disk(self, persist_directory: str) -> bool:
+        """Cheap check, without the directory lock, for files this process has not read"""
+        generation = self._read_generation(persist_directory)
+        if generation != self._generation:
+            return True
+        if any(os.path.basename(path) not in self._segments for path in self._list_segments(persist_directory, generation)):
+            return True
+        base_directory = self._generation_path(persist_directory, generation)
+        return self._file_stamp(os.path.join(base_directory, TOMBSTONES_FILE)) != self._tombstones_stamp
+
+    @staticmethod
+    def _file_stamp(path: str) -> Optional[Tuple[int, int, int]]:
+        """(inode, modification time, size) of a file, or None if it does not exist"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def similarity_search(self, query: str, k: int = 4, **search_kwargs) -> List[Document]:
         """Perform a similarity search on the vector store"""
         if not self.store:
             raise ValueError("Vector store is not initialized. Please create or load it first.")
-        
-        return self.store.similarity_search(query, k=k)
-    
\ No newline at end of file
+
+        # Embed outside the lock so a slow embedding call never blocks index updates
+        embedding = self.embed_query(query)
+        return self.similarity_search_by_vector(embedding, k=k, **search_kwargs)
+
+    async def asimilarity_search(self, query: str, k: int = 4, **search_kwargs) -> List[Document]:
+        """Perform a similarity search without blocking the event loop"""
+        if not self.store:
+            raise ValueError("Vector store is not initialized. Please create or load it first.")
+
+        embedding = await self.aembed_query(query)
+        return await self.asimilarity_search_by_vector(embedding, k=k, **search_kwargs)
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query with the store's embedding model"""
+        with timed_stage("embed_query"):
+            return self.embedding_model.embed_query(query)
+
+    async def aembed_query(self, query: str) -> List[float]:
+        """Embed a query with the store's embedding model asynchronously"""
+        with timed_stage("embed_query"):
+            return await self.embedding_model.aembed_query(query)
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed several queries in one batched call"""
+        with timed_stage("embed_queries"):
+            return self._query_embeddings().embed_documents(queries)
+
+    async def aembed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed several queries in one batched call asynchronously"""
+        with timed_stage("embed_queries"):
+            return await self._query_embeddings().aembed_documents(queries)
+
+    def _query_embeddings(self):
+        """The embedding backend without the document vector cache, which query texts would only grow"""
+        # Queries have their own cache in the retriever
+        if isinstance(self.embedding_model, CachedEmbeddings):
+            return self.embedding_model.embeddings
+        return self.embedding_model
+
+    def lexical_search(self, query: str, k: int = 4, filters: Optional[Filters] = None) -> List[Tuple[Document, float]]:
+        """Rank documents by BM25 score for the query terms, optionally only those matching metadata filters"""
+        with timed_stage("lexical_search"), self._lock.read():
+            if self.lexical_index is None or not self.store:
+                return []
+            mask = self._search_mask(filters, len(self.lexical_index))
+            return [
+                (self.store.docstore.search(doc_id), score)
+                for doc_id, score in self.lexical_index.search(query, k, mask=mask)
+            ]
+
+    async def alexical_search(self, query: str, k: int = 4, filters: Optional[Filters] = None) -> List[Tuple[Document, float]]:
+        """Rank documents by BM25 score without blocking the event loop"""
+        return await asyncio.to_thread(self.lexical_search, query, k, filters)
+
+    async def asimilarity_search_by_vector(self, embedding: List[float], k: int = 4, **search_kwargs) -> List[Document]:
+        """Perform a similarity search with a precomputed embedding without blocking the event loop"""
+        # Search in a worker thread so a concurrent index write cannot stall the loop
+        return await asyncio.to_thread(self.similarity_search_by_vector, embedding, k, **search_kwargs)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, nprobe: Optional[int] = None, ef_search: Optional[int] = None, filters: Optional[Filters] = None) -> List[Document]:
+        """Perform a similarity search with a precomputed query embedding"""
+        results = self._search(np.asarray([embedding], dtype=np.float32), k, nprobe=nprobe, ef_search=ef_search, filters=filters)
+        return [doc for doc, _ in results[0]]
+
+    def similarity_search_by_vectors(self, embeddings: List[List[float]], k: int = 4, nprobe: Optional[int] = None, ef_search: Optional[int] = None, filters: Optional[Filters] = None) -> List[List[Document]]:
+        """Search for several query embeddings at once, in a single vectorised index search"""
+        if not embeddings:
+            return []
+        results = self._search(np.asarray(embeddings, dtype=np.float32), k, nprobe=nprobe, ef_search=ef_search, filters=filters)
+        return [[doc for doc, _ in row] for row in results]
+
+    async def asimilarity_search_by_vectors(self, embeddings: List[List[float]], k: int = 4, **search_kwargs) -> List[List[Document]]:
+        """Search for several query embeddings at once without blocking the event loop"""
+        return await asyncio.to_thread(self.similarity_search_by_vectors, embeddings, k, **search_kwargs)
+
+    def _search(self, vectors: np.ndarray, k: int, nprobe: Optional[int] = None, ef_search: Optional[int] = None, filters: Optional[Filters] = None) -> List[List[Tuple[Document, float]]]:
+        """Search the index for each query vector, returning documents with their distances"""
+        with timed_stage("vector_search"), self._lock.read():
+            base_total = self.store.index.ntotal
+            selector, bitmap = None, None
+            mask = self._search_mask(filters, self.vector_count)
+            if mask is not None:
+                if not mask.any():
+                    return [[] for _ in vectors]
+                # FAISS skips positions whose bit is clear inside the index scan, rather than after it
+                # The bitmap must outlive the search, since the selector only holds a pointer to it
+                bitmap = np.packbits(mask[:base_total], bitorder="little")
+                selector = faiss.IDSelectorBitmap(base_total, faiss.swig_ptr(bitmap))
+            params = self._search_parameters(nprobe=nprobe, ef_search=ef_search, selector=selector)
+            distances, indices = self.store.index.search(vectors, k, params=params)
+            if self._delta is not None:
+                distances, indices = self._merge_delta(vectors, k, distances, indices, None if mask is None else mask[base_total:])
+
+            results = []
+            for row_distances, row_indices in zip(distances, indices):
+                row = []
+                for distance, position in zip(row_distances, row_indices):
+                    # FAISS pads with -1 when fewer than k vectors are found
+                    if position == -1:
+                        continue
+                    doc_id = self.store.index_to_docstore_id[position]
+                    row.append((self.store.docstore.search(doc_id), float(distance)))
+                results.append(row)
+            return results
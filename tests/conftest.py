@@ -1,4 +1,51 @@
 import sys
 import os
 
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
\ No newline at end of file
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import hashlib
+import pytest
+from langchain_core.embeddings import Embeddings
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic bag-of-words embeddings so tests never call an API"""
+
+    def __init__(self, dim: int = 32):
+        self.dim = dim
+        self.calls = 0
+
+    def _embed(self, text):
+        vector = [0.0] * self.dim
+        for word in text.lower().split():
+            bucket = int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dim
+            vector[bucket] += 1.0
+        return vector
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        self.calls += 1
+        return self._embed(text)
+
+
+class FakeEmbeddingModel:
+    """Stand-in for EmbeddingModel wrapping FakeEmbeddings"""
+
+    def __init__(self, dim: int = 32):
+        self.model_type = "fake"
+        self.namespace = f"fake:{dim}"
+        self.model = FakeEmbeddings(dim)
+
+    def embed_text(self, text):
+        return self.model.embed_query(text)
+
+    def embed_documents(self, documents):
+        return self.model.embed_documents(documents)
+
+
+@pytest.fixture
+def fake_embedding_model():
+    return FakeEmbeddingModel()
@@ -0,0 +1,35 @@
+from benchmarks.run import build_parser, run, summarize
+import json
+
+class TestBenchmarks:
+    def test_summarize(self):
+        """Test latency summaries are reported in milliseconds"""
+        stats = summarize([0.001, 0.002, 0.003])
+
+        assert stats["count"] == 3
+        assert stats["p50_ms"] == 2.0
+        assert summarize([]) == {"count": 0}
+
+    def test_run_smoke(self):
+        """Test every suite runs end to end at a tiny size"""
+        args = build_parser().parse_args([
+            "--documents", "1", "--pages", "2", "--workers", "1",
+            "--embed-texts", "8", "--batch-sizes", "4",
+            "--sizes", "50", "--dim", "16", "--queries", "5", "-k", "3",
+            "--quantization-size", "200", "--quantization-variants", "flat,sq8+rescore",
+            "--query-chunks", "20", "--requests", "4", "--concurrency", "2", "--llm-latency", "0",
+        ])
+
+        report = run(args)
+        results = report["results"]
+
+        assert set(results) == {"parse", "chunk", "embed", "vector_store", "quantization", "query"}
+        assert results["parse"]["sequential"]["pages"] == 2
+        assert results["chunk"]["insurance"]["chunks"] > 0
+        assert results["embed"]["batch_4"]["texts"] == 8
+        assert results["vector_store"]["50"]["search"]["count"] == 5
+        assert results["quantization"]["flat"]["recall_at_3"] == 1.0
+        assert results["quantization"]["sq8+rescore"]["resident_bytes"] < results["quantization"]["flat"]["resident_bytes"]
+        assert results["query"]["latency"]["count"] == 4
+        assert "llm" in results["query"]["stages"]
+        json.dumps(report)
@@ -0,0 +1,61 @@
+import pytest
+import numpy as np
+from src.utils.bm25 import BM25Index, tokenize
+
+class TestBM25Index:
+    def setup_method(self):
+        self.index = BM25Index.from_documents(
+            ["a", "b", "c"],
+            [
+                "The excess is the amount you pay towards any claim",
+                "Pre-existing medical conditions are excluded unless declared",
+                "Baggage cover for lost luggage and personal belongings",
+            ]
+        )
+
+    def test_tokenize(self):
+        """Test hyphenated terms are kept whole and split, and stopwords dropped"""
+        assert tokenize("The Pre-existing condition") == ["pre-existing", "pre", "existing", "condition"]
+
+    def test_exact_term_ranks_first(self):
+        """Test a rare exact term finds its chunk"""
+        results = self.index.search("what is the excess?", k=2)
+
+        assert results[0][0] == "a"
+        assert len(results) == 1
+
+    def test_hyphenated_term(self):
+        """Test hyphenated and split forms of a term both match"""
+        assert self.index.search("pre-existing", k=1)[0][0] == "b"
+        assert self.index.search("existing conditions", k=1)[0][0] == "b"
+
+    def test_top_k(self):
+        """Test only the k best chunks are returned, best first"""
+        index = BM25Index.from_documents(
+            ["x", "y", "z"],
+            ["claim form signed", "claim claim form", "claim claim claim"]
+        )
+        results = index.search("claim", k=2)
+
+        assert [doc_id for doc_id, _ in results] == ["z", "y"]
+        assert results[0][1] > results[1][1]
+
+    def test_no_match(self):
+        """Test unknown and stopword-only queries return nothing"""
+        assert self.index.search("helicopter", k=3) == []
+        assert self.index.search("the and of", k=3) == []
+
+    def test_save_load(self, tmp_path):
+        """Test the index round-trips through disk"""
+        path = str(tmp_path / "bm25.pkl")
+        self.index.save(path)
+        loaded = BM25Index.load(path)
+
+        assert len(loaded) == 3
+        assert loaded.search("baggage", k=1) == self.index.search("baggage", k=1)
+
+    def test_mask(self):
+        """Test a mask limits the ranking to the selected chunks"""
+        index = BM25Index.from_documents(["x", "y"], ["claim form", "claim claim"])
+
+        assert [doc_id for doc_id, _ in index.search("claim", k=2, mask=np.array([True, False]))] == ["x"]
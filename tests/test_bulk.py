@@ -0,0 +1,87 @@
+import os
+import fitz
+from src.rag.bulk import BulkIngester
+from src.utils.vector_store import VectorStore
+
+def make_pdf(path, text):
+    """Write a single-page PDF containing the given text"""
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 72), text)
+    doc.save(str(path))
+    doc.close()
+
+class TestBulkIngester:
+    def make_ingester(self, embedding_model, persist_dir):
+        vector_store = VectorStore(embedding_model=embedding_model)
+        return BulkIngester(
+            embedding_model=embedding_model,
+            vector_store=vector_store,
+            persist_directory=str(persist_dir),
+            chunk_strategy="default",
+            workers=2,
+            embed_batch_size=2
+        )
+
+    def test_ingests_directory(self, fake_embedding_model, tmp_path):
+        """Test every PDF under the directory ends up in one index"""
+        corpus = tmp_path / "corpus"
+        (corpus / "nested").mkdir(parents=True)
+        for i in range(4):
+            make_pdf(corpus / f"policy{i}.pdf", f"Policy {i} baggage cover")
+        make_pdf(corpus / "nested" / "policy4.pdf", "Policy 4 medical cover")
+
+        stats = self.make_ingester(fake_embedding_model, tmp_path / "store").ingest(str(corpus))
+
+        assert stats["indexed"] == 5
+        assert stats["chunks"] == 5
+        assert os.path.exists(os.path.join(VectorStore.base_directory(str(tmp_path / "store")), "index.faiss"))
+        assert not (tmp_path / "store" / "segments").exists()
+
+    def test_resumes_from_manifest(self, fake_embedding_model, tmp_path):
+        """Test a second run skips files completed by the first"""
+        corpus = tmp_path / "corpus"
+        corpus.mkdir()
+        make_pdf(corpus / "a.pdf", "Policy A baggage cover")
+        self.make_ingester(fake_embedding_model, tmp_path / "store").ingest(str(corpus))
+
+        make_pdf(corpus / "b.pdf", "Policy B medical cover")
+        ingester = self.make_ingester(fake_embedding_model, tmp_path / "store")
+        stats = ingester.ingest(str(corpus))
+
+        assert stats["indexed"] == 1
+        assert stats["skipped"] == 1
+        assert len(ingester.vector_store.store.index_to_docstore_id) == 2
+
+    def test_failed_files_are_not_marked_complete(self, fake_embedding_model, tmp_path):
+        """Test unreadable PDFs are reported and retried on the next run"""
+        corpus = tmp_path / "corpus"
+        corpus.mkdir()
+        (corpus / "broken.pdf").write_bytes(b"not a pdf")
+
+        ingester = self.make_ingester(fake_embedding_model, tmp_path / "store")
+        stats = ingester.ingest(str(corpus))
+
+        assert stats["failed"] == 1
+        assert len(ingester.manifest.documents) == 0
+
+    def test_resume_skips_unchanged_files_without_hashing(self, fake_embedding_model, tmp_path):
+        """Test a resume recognises completed files by path, size and mtime, and skips touched files by content"""
+        corpus = tmp_path / "corpus"
+        corpus.mkdir()
+        make_pdf(corpus / "a.pdf", "Policy A baggage cover")
+        make_pdf(corpus / "b.pdf", "Policy B medical cover")
+        self.make_ingester(fake_embedding_model, tmp_path / "store").ingest(str(corpus))
+
+        ingester = self.make_ingester(fake_embedding_model, tmp_path / "store")
+        paths = ingester.find_pdfs(str(corpus))
+        assert list(ingester._pending_files(paths)) == []
+
+        # Touching a file makes it a candidate again, but its unchanged content is not re-indexed
+        os.utime(corpus / "a.pdf", ns=(0, 0))
+        assert [path for path, _ in ingester._pending_files(paths)] == [str(corpus / "a.pdf")]
+        stats = ingester.ingest(str(corpus))
+
+        assert stats["indexed"] == 0
+        assert stats["skipped"] == 2
+        assert len(ingester.vector_store.store.index_to_docstore_id) == 2
@@ -0,0 +1,136 @@
+from unittest.mock import MagicMock
+import asyncio
+from src.rag.cache import AnswerCache, QueryEmbeddingCache, normalize_query
+
+RESULT = {"answer": "Yes, COVID is covered.", "sources": [], "context": ""}
+
+class TestAnswerCache:
+    def test_normalize_query(self):
+        """Test case, whitespace and trailing punctuation are ignored"""
+        assert normalize_query("  Is COVID   covered? ") == "is covid covered"
+
+    def test_exact_hit(self):
+        """Test a normalised repeat of a query is served from the cache"""
+        cache = AnswerCache()
+        cache.put("Is COVID covered?", 3, 1, RESULT)
+
+        assert cache.get("is covid covered", 3, 1) == RESULT
+        assert cache.get("is covid covered", 5, 1) is None
+        assert cache.stats()["hits"] == 1
+
+    def test_semantic_hit(self):
+        """Test near-duplicate query embeddings above the threshold match"""
+        cache = AnswerCache(similarity_threshold=0.9)
+        cache.put("Is COVID covered?", 3, 1, RESULT, embedding=[1.0, 0.0, 0.1])
+
+        assert cache.get_similar([1.0, 0.0, 0.12], 3, 1) == RESULT
+        assert cache.get_similar([0.0, 1.0, 0.0], 3, 1) is None
+        assert cache.stats()["semantic_hits"] == 1
+
+    def test_invalidated_by_index_version(self):
+        """Test a changed index version drops all cached answers"""
+        cache = AnswerCache()
+        cache.put("what is the excess", 3, 1, RESULT)
+
+        assert cache.get("what is the excess", 3, 2) is None
+        # Results computed against the old index are not stored
+        cache.put("what is the excess", 3, 1, RESULT)
+        assert cache.get("what is the excess", 3, 2) is None
+
+    def test_late_put_with_older_version_is_dropped(self):
+        """Test a slow request finishing after an update neither rolls the cache back nor evicts current answers"""
+        cache = AnswerCache()
+        cache.put("what is the excess", 3, 6, RESULT)
+
+        cache.put("is baggage covered", 3, 5, {"answer": "stale", "sources": [], "context": ""})
+
+        assert cache.index_version == 6
+        assert cache.get("what is the excess", 3, 6) == RESULT
+        assert cache.get("is baggage covered", 3, 6) is None
+        assert cache.get("what is the excess", 3, 5) is None
+        assert cache.get_similar([1.0, 0.0], 3, 5) is None
+        assert cache.get("what is the excess", 3, 6) == RESULT
+
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted first"""
+        cache = AnswerCache(max_entries=2)
+        cache.put("first", 3, 1, RESULT)
+        cache.put("second", 3, 1, RESULT)
+        cache.get("first", 3, 1)
+        cache.put("third", 3, 1, RESULT)
+
+        assert cache.get("first", 3, 1) is not None
+        assert cache.get("second", 3, 1) is None
+
+    def test_ttl_expiry(self):
+        """Test entries past their TTL are not served"""
+        cache = AnswerCache(ttl_seconds=-1)
+        cache.put("first", 3, 1, RESULT)
+        assert cache.get("first", 3, 1) is None
+
+class TestQueryEmbeddingCache:
+    def test_hit_by_normalised_query(self):
+        """Test trivially different phrasings share an embedding"""
+        cache = QueryEmbeddingCache(namespace="fake")
+        cache.put("What is the excess?", [1.0, 0.0])
+
+        assert cache.get("what is the  excess") == [1.0, 0.0]
+        assert cache.get("is baggage covered") is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_lru_eviction_and_ttl(self):
+        """Test the size and TTL limits"""
+        cache = QueryEmbeddingCache(namespace="fake", max_entries=1)
+        cache.put("first", [1.0])
+        cache.put("second", [2.0])
+        assert cache.get("first") is None
+        assert cache.get("second") == [2.0]
+
+        expired = QueryEmbeddingCache(namespace="fake", ttl_seconds=-1)
+        expired.put("first", [1.0])
+        assert expired.get("first") is None
+
+    def test_disk_tier_shared_between_instances(self, tmp_path):
+        """Test another process sees embeddings through the disk tier, per model"""
+        path = str(tmp_path / "queries.sqlite")
+        QueryEmbeddingCache(namespace="model-a", path=path).put("medical cover", [0.5, 0.25])
+
+        other_worker = QueryEmbeddingCache(namespace="model-a", path=path)
+        other_model = QueryEmbeddingCache(namespace="model-b", path=path)
+
+        assert other_worker.get("medical cover") == [0.5, 0.25]
+        assert other_worker.stats()["disk_hits"] == 1
+        assert other_model.get("medical cover") is None
+
+    def test_async_disk_tier_runs_off_event_loop(self, tmp_path, monkeypatch):
+        """Test async lookups and writes reach the disk tier through a worker thread, not the event loop"""
+        path = str(tmp_path / "queries.sqlite")
+        cache = QueryEmbeddingCache(namespace="fake", path=path)
+        offloaded = []
+        to_thread = asyncio.to_thread
+
+        async def tracking_to_thread(func, *args):
+            offloaded.append(func.__name__)
+            return await to_thread(func, *args)
+
+        monkeypatch.setattr("src.rag.cache.asyncio.to_thread", tracking_to_thread)
+
+        asyncio.run(cache.aput("medical cover", [0.5, 0.25]))
+        other_worker = QueryEmbeddingCache(namespace="fake", path=path)
+        assert asyncio.run(other_worker.aget("medical cover")) == [0.5, 0.25]
+        # A memory hit is answered inline
+        assert asyncio.run(other_worker.aget("medical cover")) == [0.5, 0.25]
+
+        assert offloaded == ["_disk_store", "_disk_lookup"]
+        assert other_worker.stats()["disk_hits"] == 1
+
+    def test_batch_put_commits_once(self, tmp_path):
+        """Test a batch of embeddings is written to disk in one transaction"""
+        cache = QueryEmbeddingCache(namespace="fake", path=str(tmp_path / "queries.sqlite"))
+        cache._conn = MagicMock(wraps=cache._conn)
+
+        cache.put_many(["first", "second", "third"], [[1.0], [2.0], [3.0]])
+
+        cache._conn.commit.assert_called_once()
+        assert cache.get_many(["first", "third", "fourth"]) == [[1.0], [3.0], None]
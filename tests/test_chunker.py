@@ -0,0 +1,71 @@
+import pytest
+from src.data.chunker import SectionChunker
+from src.data.processor import DocumentProcessor
+from src.utils.tokens import count_tokens
+
+class TestSectionChunker:
+    def setup_method(self):
+        self.chunker = SectionChunker(max_tokens=60, overlap_tokens=15)
+
+    def test_match_heading(self):
+        """Test headings are recognised without matching ordinary text"""
+        assert self.chunker.match_heading("EXCLUSIONS") == ("EXCLUSIONS", "")
+        assert self.chunker.match_heading("4.2 BAGGAGE COVER:") == ("4.2 BAGGAGE COVER", "")
+        assert self.chunker.match_heading("SECTION 3 - MEDICAL EXPENSES") == ("SECTION 3 - MEDICAL EXPENSES", "")
+        assert self.chunker.match_heading("EXCESS: You pay the first 100") == ("EXCESS", "You pay the first 100")
+        assert self.chunker.match_heading("We will pay up to GBP 1000 for BAGGAGE") is None
+        assert self.chunker.match_heading("N/A") is None
+
+    def test_splits_on_headings(self):
+        """Test each section becomes a chunk with its heading and page offsets"""
+        pages = [
+            "Welcome to your policy\nMEDICAL EXPENSES\nWe pay emergency treatment abroad",
+            "BAGGAGE\nLost luggage is covered up to 1000",
+        ]
+
+        chunks = list(self.chunker.chunk_pages(pages, metadata={"source": "policy.pdf"}))
+
+        assert [chunk.metadata["section"] for chunk in chunks] == ["GENERAL", "MEDICAL EXPENSES", "BAGGAGE"]
+        assert chunks[1].page_content == "MEDICAL EXPENSES\nWe pay emergency treatment abroad"
+        assert chunks[2].metadata["page_start"] == 2
+        assert chunks[2].metadata["source"] == "policy.pdf"
+
+    def test_char_offsets(self):
+        """Test offsets point at the chunk body in the joined page text"""
+        pages = ["Intro line\nEXCLUSIONS\nWar and civil unrest", "CLAIMS\nCall us within 28 days"]
+        document = "\n".join(pages)
+
+        for chunk in self.chunker.chunk_pages(pages):
+            body = document[chunk.metadata["char_start"]:chunk.metadata["char_end"]]
+            assert chunk.page_content.endswith(body)
+
+    def test_bounds_oversized_sections(self):
+        """Test long sections are split within the token limit with overlap"""
+        lines = [f"Clause {i} the insurer will pay reasonable costs incurred" for i in range(30)]
+        pages = ["BAGGAGE COVER\n" + "\n".join(lines)]
+
+        chunks = list(self.chunker.chunk_pages(pages))
+
+        assert len(chunks) > 1
+        assert all(count_tokens(chunk.page_content) <= 60 for chunk in chunks)
+        assert all(chunk.page_content.startswith("BAGGAGE COVER\n") for chunk in chunks)
+        # The last line of one chunk is repeated at the start of the next
+        first_lines = chunks[0].page_content.split("\n")
+        assert first_lines[-1] in chunks[1].page_content
+        assert "Clause 29" in chunks[-1].page_content
+
+    def test_splits_long_lines(self):
+        """Test a single line longer than the limit is split at word boundaries"""
+        pages = ["word " * 500]
+
+        chunks = list(self.chunker.chunk_pages(pages))
+
+        assert len(chunks) > 1
+        assert all(count_tokens(chunk.page_content) <= 60 for chunk in chunks)
+
+    def test_process_pages_strategy(self):
+        """Test the insurance strategy chunks by section"""
+        chunks = DocumentProcessor().process_pages(["COVER\nBaggage is covered"], {"source": "a.pdf"}, chunk_strategy="insurance")
+
+        assert chunks[0].metadata["section"] == "COVER"
+        assert chunks[0].metadata["chunk_id"]
@@ -0,0 +1,63 @@
+from unittest.mock import MagicMock
+import threading
+from src.rag.compaction import BackgroundCompactor
+
+class TestBackgroundCompactor:
+    def setup_method(self):
+        self.vector_store = MagicMock()
+        self.vector_store.needs_retrain.return_value = False
+        self.compactor = BackgroundCompactor(lambda: self.vector_store, persist_directory="store", min_deleted_ratio=0.2)
+
+    def test_purges_above_threshold(self):
+        """Test the index is purged once enough of it is deleted"""
+        self.vector_store.deleted = {0, 1}
+        self.vector_store.deleted_ratio = 0.5
+
+        assert self.compactor.compact_if_needed()
+        self.vector_store.purge.assert_called_once_with(persist_directory="store")
+
+    def test_skips_below_threshold(self):
+        """Test a few deletions are left as tombstones"""
+        self.vector_store.deleted = {0}
+        self.vector_store.deleted_ratio = 0.1
+
+        assert not self.compactor.compact_if_needed()
+        self.vector_store.purge.assert_not_called()
+
+    def test_retrains_outgrown_index(self):
+        """Test an index the corpus has outgrown is rebuilt, which also drops deleted chunks"""
+        self.vector_store.needs_retrain.return_value = True
+        self.vector_store.deleted = set()
+
+        assert self.compactor.compact_if_needed()
+        self.vector_store.rebuild.assert_called_once_with(persist_directory="store")
+        self.vector_store.purge.assert_not_called()
+
+    def test_trigger_wakes_worker(self):
+        """Test a trigger runs a check without waiting for the interval"""
+        self.compactor.interval_seconds = 3600
+        self.vector_store.deleted = {0}
+        self.vector_store.deleted_ratio = 1.0
+        purged = threading.Event()
+        self.vector_store.purge.side_effect = lambda **kwargs: purged.set()
+
+        self.compactor.start()
+        try:
+            self.compactor.trigger()
+            assert purged.wait(5)
+        finally:
+            self.compactor.stop()
+
+    def test_refresh_loads_other_workers_changes(self):
+        """Test the worker checks the persist directory for changes written by other processes"""
+        self.compactor.refresh_seconds = 0.01
+        refreshed = threading.Event()
+        self.vector_store.refresh.side_effect = lambda persist_directory: refreshed.set()
+
+        self.compactor.start()
+        try:
+            assert refreshed.wait(5)
+        finally:
+            self.compactor.stop()
+        self.vector_store.refresh.assert_called_with("store")
+        self.vector_store.purge.assert_not_called()
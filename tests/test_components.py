@@ -0,0 +1,78 @@
+from unittest.mock import MagicMock
+from src.rag.components import RAGComponents
+
+class TestRAGComponents:
+    def build(self, monkeypatch, tmp_path, exists=False):
+        """Build the container with mocked dependencies"""
+        self.vector_store_cls = MagicMock()
+        monkeypatch.setattr("src.rag.components.EmbeddingModel", MagicMock())
+        monkeypatch.setattr("src.rag.components.LLMService", MagicMock())
+        monkeypatch.setattr("src.rag.components.DocumentIndexer", MagicMock())
+        monkeypatch.setattr("src.rag.components.VectorStore", self.vector_store_cls)
+
+        persist_dir = tmp_path / "vector_store"
+        if exists:
+            persist_dir.mkdir()
+        return RAGComponents(persist_directory=str(persist_dir))
+
+    def test_loads_vector_store_once(self, monkeypatch, tmp_path):
+        """Test the vector store is loaded at construction, not per query"""
+        components = self.build(monkeypatch, tmp_path, exists=True)
+        self.vector_store_cls.return_value.load.assert_called_once()
+        assert components.vector_store == self.vector_store_cls.return_value
+
+        # Accessing the generator again does not touch disk
+        _ = components.answer_generator
+        self.vector_store_cls.return_value.load.assert_called_once()
+
+    def test_skips_load_without_index(self, monkeypatch, tmp_path):
+        """Test nothing is loaded when no index has been persisted"""
+        self.build(monkeypatch, tmp_path)
+        self.vector_store_cls.return_value.load.assert_not_called()
+
+    def test_swap_vector_store(self, monkeypatch, tmp_path):
+        """Test swapping replaces the generator without mutating the old one"""
+        components = self.build(monkeypatch, tmp_path)
+        old_generator = components.answer_generator
+        new_store = MagicMock()
+
+        components.swap_vector_store(new_store)
+
+        assert components.vector_store == new_store
+        assert old_generator.retriever.vector_store != new_store
+
+    def test_index_pdf_swaps_store(self, monkeypatch, tmp_path):
+        """Test indexing publishes the indexer's store to queries"""
+        components = self.build(monkeypatch, tmp_path)
+        components.indexer.index_pdf.return_value = {"chunks": 2}
+
+        result = components.index_pdf("policy.pdf")
+
+        assert result == {"chunks": 2}
+        assert components.vector_store == components.indexer.vector_store
+
+    def test_delete_document_removes_upload(self, monkeypatch, tmp_path):
+        """Test deleting a document removes its uploaded file and wakes the compactor"""
+        components = self.build(monkeypatch, tmp_path)
+        components.upload_directory = str(tmp_path)
+        upload = tmp_path / "policy.pdf"
+        upload.write_bytes(b"%PDF")
+        components.indexer.delete_document.return_value = {"source": str(upload), "chunks": 2, "status": "deleted"}
+        components.compactor = MagicMock()
+
+        result = components.delete_document("abc")
+
+        assert result["chunks"] == 2
+        assert not upload.exists()
+        components.compactor.trigger.assert_called_once()
+
+    def test_ingestion_wakes_compactor_to_retrain(self, monkeypatch, tmp_path):
+        """Test an upload that leaves the index outgrown schedules a background retrain"""
+        components = self.build(monkeypatch, tmp_path)
+        components.indexer.index_pdf.return_value = {"chunks": 2, "status": "indexed"}
+        components.indexer.vector_store.needs_retrain.return_value = True
+        components.compactor = MagicMock()
+
+        components._run_ingestion_job(MagicMock(replaces=None, file_path="policy.pdf", doc_id="abc"))
+
+        components.compactor.trigger.assert_called_once()
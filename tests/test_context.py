@@ -0,0 +1,59 @@
+import pytest
+from src.rag.context import ContextPacker
+from src.utils.tokens import count_tokens, truncate_to_tokens
+from langchain_core.documents import Document
+
+class TestContextPacker:
+    def make_doc(self, text, source="policy.pdf", section="COVERAGE"):
+        return Document(page_content=text, metadata={"source": source, "section": section})
+
+    def test_packs_in_rank_order(self):
+        """Test chunks are cited in rank order and tokens are reported"""
+        packer = ContextPacker(max_tokens=500)
+        docs = [self.make_doc("Lost baggage is covered up to 1000"), self.make_doc("Medical expenses abroad are covered", section="MEDICAL")]
+
+        packed = packer.pack(docs)
+
+        assert packed.documents == docs
+        assert packed.text.index("Lost baggage") < packed.text.index("Medical expenses")
+        assert "[Documment 2] From: policy.pdf, Section: MEDICAL" in packed.text
+        assert packed.tokens == count_tokens(packed.text)
+
+    def test_enforces_budget(self):
+        """Test the context never exceeds the token budget"""
+        packer = ContextPacker(max_tokens=120, min_chunk_tokens=20)
+        docs = [self.make_doc(f"clause {i} " + "cover applies to the insured traveller " * 30) for i in range(5)]
+
+        packed = packer.pack(docs)
+
+        assert packed.tokens <= 120
+        assert len(packed.documents) == 1
+        assert "clause 0" in packed.text
+
+    def test_drops_near_duplicates(self):
+        """Test a chunk mostly repeated in a kept chunk is skipped"""
+        packer = ContextPacker()
+        text = "The excess is the amount you pay towards each claim under this policy"
+        docs = [self.make_doc(text), self.make_doc(text + " section"), self.make_doc("Cancellation cover is optional")]
+
+        packed = packer.pack(docs)
+
+        assert [doc.page_content for doc in packed.documents] == [text, "Cancellation cover is optional"]
+
+    def test_trims_overlap(self):
+        """Test the overlap repeated from a kept chunk of the same source is trimmed"""
+        packer = ContextPacker()
+        overlap = "claims must be reported within 28 days of the incident occurring"
+        first = "Lost baggage must be reported to the police. " + overlap
+        second = overlap + " and supported by original receipts for every item claimed"
+
+        packed = packer.pack([self.make_doc(first), self.make_doc(second)])
+
+        assert packed.text.count(overlap) == 1
+        assert "supported by original receipts" in packed.text
+
+    def test_truncate_to_tokens(self):
+        """Test truncation respects the token limit"""
+        text = "word " * 200
+        assert count_tokens(truncate_to_tokens(text, 10)) <= 10
+        assert truncate_to_tokens("short", 10) == "short"
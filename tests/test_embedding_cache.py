@@ -0,0 +1,81 @@
+from langchain_core.documents import Document
+from src.models.embedding_cache import CachedEmbeddings
+from src.utils.vector_store import VectorStore
+import asyncio
+
+class TestCachedEmbeddings:
+    def test_reuses_cached_vectors(self, fake_embedding_model, tmp_path):
+        """Test unchanged texts are not embedded again"""
+        inner = fake_embedding_model.model
+        cache = CachedEmbeddings(inner, str(tmp_path / "cache.sqlite"), namespace="fake")
+
+        first = cache.embed_documents(["excess is $100", "baggage cover"])
+        calls = inner.calls
+        second = cache.embed_documents(["excess is $100", "baggage cover"])
+
+        assert second == first
+        assert inner.calls == calls
+        assert cache.hits == 2
+
+    def test_only_embeds_missing_texts(self, fake_embedding_model, tmp_path, monkeypatch):
+        """Test a revised document only embeds its new chunks"""
+        inner = fake_embedding_model.model
+        cache = CachedEmbeddings(inner, str(tmp_path / "cache.sqlite"), namespace="fake")
+        cache.embed_documents(["section one", "section two"])
+
+        seen = []
+        original = inner.embed_documents
+        monkeypatch.setattr(inner, "embed_documents", lambda texts: seen.extend(texts) or original(texts))
+        result = cache.embed_documents(["section one", "section three", "section three"])
+
+        assert seen == ["section three"]
+        assert result[1] == result[2]
+
+    def test_persists_across_instances(self, fake_embedding_model, tmp_path):
+        """Test the cache survives a process restart"""
+        path = str(tmp_path / "cache.sqlite")
+        CachedEmbeddings(fake_embedding_model.model, path, namespace="fake").embed_documents(["medical cover"])
+
+        inner = fake_embedding_model.model
+        calls = inner.calls
+        cache = CachedEmbeddings(inner, path, namespace="fake")
+        asyncio.run(cache.aembed_documents(["medical cover"]))
+
+        assert inner.calls == calls
+
+    def test_namespaces_are_isolated(self, fake_embedding_model, tmp_path):
+        """Test vectors from a different model are never returned"""
+        path = str(tmp_path / "cache.sqlite")
+        CachedEmbeddings(fake_embedding_model.model, path, namespace="model-a").embed_documents(["cover"])
+        cache = CachedEmbeddings(fake_embedding_model.model, path, namespace="model-b")
+        cache.embed_documents(["cover"])
+
+        assert cache.misses == 1
+
+    def test_async_cache_io_runs_off_event_loop(self, fake_embedding_model, tmp_path, monkeypatch):
+        """Test the async path reads and writes the cache database in a worker thread"""
+        cache = CachedEmbeddings(fake_embedding_model.model, str(tmp_path / "cache.sqlite"), namespace="fake")
+        offloaded = []
+        to_thread = asyncio.to_thread
+
+        async def tracking_to_thread(func, *args):
+            offloaded.append(func.__name__)
+            return await to_thread(func, *args)
+
+        monkeypatch.setattr("src.models.embedding_cache.asyncio.to_thread", tracking_to_thread)
+        asyncio.run(cache.aembed_documents(["medical cover"]))
+
+        assert offloaded == ["_split", "_store"]
+
+    def test_queries_bypass_document_cache(self, fake_embedding_model, tmp_path):
+        """Test batched query embeddings are not written to the document cache"""
+        cache = CachedEmbeddings(fake_embedding_model.model, str(tmp_path / "cache.sqlite"), namespace="fake")
+        fake_embedding_model.model = cache
+        store = VectorStore(embedding_model=fake_embedding_model)
+        store.create_from_documents([Document(page_content="baggage cover", metadata={})])
+        stored = cache._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+        store.embed_queries(["is baggage covered"])
+        asyncio.run(store.aembed_queries(["is medical covered"]))
+
+        assert cache._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] == stored
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from src.models.embeddings import DeepSeekEmbeddings
+from src.models.http_client import close_async_client
+
+class StubEmbeddingHandler(BaseHTTPRequestHandler):
+    """Local stand-in for the DeepSeek embeddings endpoint"""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.requests.append(body)
+            fail = server.failures > 0
+            if fail:
+                server.failures -= 1
+
+        if fail:
+            payload = b'{"error": "overloaded"}'
+            self.send_response(503)
+        else:
+            # Return items in reverse order to check the client re-sorts them
+            data = [
+                {"index": i, "embedding": [float(len(text)), float(i)]}
+                for i, text in enumerate(body["input"])
+            ]
+            payload = json.dumps({"data": list(reversed(data))}).encode()
+            self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubEmbeddingHandler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.failures = 0
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+class TestDeepSeekEmbeddings:
+    def make_client(self, server, **kwargs):
+        url = f"http://127.0.0.1:{server.server_address[1]}/v1/embeddings"
+        return DeepSeekEmbeddings(api_key="test-key", api_url=url, backoff_factor=0, **kwargs)
+
+    def test_embed_documents_batches(self, stub_server):
+        """Test texts are sent in batches rather than one request each"""
+        client = self.make_client(stub_server, batch_size=4, max_concurrency=2)
+        texts = [f"chunk {i}" * (i + 1) for i in range(10)]
+
+        embeddings = client.embed_documents(texts)
+
+        assert len(stub_server.requests) == 3
+        assert [e[0] for e in embeddings] == [float(len(t)) for t in texts]
+
+    def test_embed_query(self, stub_server):
+        """Test a single query is embedded with one request"""
+        client = self.make_client(stub_server)
+        assert client.embed_query("excess") == [6.0, 0.0]
+        assert stub_server.requests[0]["input"] == ["excess"]
+
+    def test_retries_transient_errors(self, stub_server):
+        """Test 5xx responses are retried before succeeding"""
+        stub_server.failures = 2
+        client = self.make_client(stub_server, max_retries=3)
+
+        assert client.embed_query("cover") == [5.0, 0.0]
+        assert len(stub_server.requests) == 3
+
+    def test_raises_after_retries_exhausted(self, stub_server):
+        """Test persistent errors are surfaced to the caller"""
+        stub_server.failures = 10
+        client = self.make_client(stub_server, max_retries=1)
+
+        with pytest.raises(Exception):
+            client.embed_query("cover")
+
+    def test_aembed_documents(self, stub_server):
+        """Test async embedding batches requests on the shared client"""
+        client = self.make_client(stub_server, batch_size=4, max_concurrency=2)
+        texts = [f"text {i}" for i in range(9)]
+
+        async def run():
+            try:
+                return await client.aembed_documents(texts)
+            finally:
+                await close_async_client()
+
+        embeddings = asyncio.run(run())
+
+        assert len(stub_server.requests) == 3
+        assert len(embeddings) == 9
+
+    def test_aembed_query_retries(self, stub_server):
+        """Test async embedding retries transient errors"""
+        stub_server.failures = 1
+        client = self.make_client(stub_server)
+
+        async def run():
+            try:
+                return await client.aembed_query("cover")
+            finally:
+                await close_async_client()
+
+        assert asyncio.run(run()) == [5.0, 0.0]
+        assert len(stub_server.requests) == 2
@@ -1,7 +1,11 @@
+import pytest
+import asyncio
 from unittest.mock import MagicMock
 from src.rag.generator import AnswerGenerator
 from src.models.llm import LLMService
 from src.rag.retriever import Retriever
+from src.rag.cache import AnswerCache
+from src.rag.context import PackedContext
 from langchain_core.documents import Document
 
 class TestAnswerGenerator:
@@ -29,8 +33,8 @@ class TestAnswerGenerator:
         ]
         self.mock_retriever.retrieve.return_value = mock_docs
 
-        # Mock format_context
-        self.mock_retriever.format_context.return_value = "Formatted context"
+        # Mock pack_context
+        self.mock_retriever.pack_context.side_effect = lambda docs: PackedContext("Formatted context", docs, 2)
 
         # Mock LLM service response
         self.mock_llm_service.generate_with_context.return_value = "Generated answer"
@@ -44,7 +48,7 @@ class TestAnswerGenerator:
         assert result["sources"][0]["source"] == "file.pdf"
 
         # Verify method calls
-        self.mock_retriever.retrieve.assert_called_once_with("test query", top_k=3)
+        self.mock_retriever.retrieve.assert_called_once_with("test query", top_k=3, embedding=None, filters=None)
         self.mock_llm_service.generate_with_context.assert_called_once()
 
     def test_generate_answer_no_docs(self):
@@ -62,6 +66,144 @@ class TestAnswerGenerator:
         # Verify LLM was not called
         self.mock_llm_service.generate_with_context.assert_not_called()
 
+    def test_agenerate_answer(self):
+        """Test async answer generation uses the async retriever and LLM"""
+        mock_docs = [
+            Document(page_content="Test content", metadata={"source": "file.pdf", "section": "COVERAGE"})
+        ]
+        self.mock_retriever.aretrieve.return_value = mock_docs
+        self.mock_retriever.pack_context.side_effect = lambda docs: PackedContext("Formatted context", docs, 2)
+        self.mock_llm_service.agenerate_with_context.return_value = "Generated answer"
+
+        result = asyncio.run(self.answer_generator.agenerate_answer("test query"))
+
+        assert result["answer"] == "Generated answer"
+        assert result["sources"][0]["section"] == "COVERAGE"
+        self.mock_retriever.aretrieve.assert_awaited_once_with("test query", top_k=3, embedding=None, filters=None)
+        self.mock_llm_service.generate_with_context.assert_not_called()
+
+    def test_astream_answer(self):
+        """Test streaming sends sources before any tokens"""
+        mock_docs = [
+            Document(page_content="Test content", metadata={"source": "file.pdf", "section": "COVERAGE"})
+        ]
+        self.mock_retriever.aretrieve.return_value = mock_docs
+        self.mock_retriever.pack_context.side_effect = lambda docs: PackedContext("Formatted context", docs, 2)
+
+        async def tokens(*args):
+            for token in ["Generated ", "answer"]:
+                yield token
+        self.mock_llm_service.astream_with_context = tokens
+
+        async def collect():
+            return [event async for event in self.answer_generator.astream_answer("test query")]
+        events = asyncio.run(collect())
+
+        assert [event["event"] for event in events] == ["sources", "token", "token", "done"]
+        assert events[0]["data"][0]["source"] == "file.pdf"
+        assert "".join(event["data"] for event in events[1:3]) == "Generated answer"
+
+    def test_generate_answer_uses_cache(self):
+        """Test a repeated query is answered without calling the LLM again"""
+        self.answer_generator.answer_cache = AnswerCache(similarity_threshold=None)
+        self.mock_retriever.index_version = 1
+        self.mock_retriever.retrieve.return_value = [
+            Document(page_content="Test content", metadata={"source": "file.pdf", "section": "COVERAGE"})
+        ]
+        self.mock_retriever.pack_context.side_effect = lambda docs: PackedContext("Formatted context", docs, 2)
+        self.mock_llm_service.generate_with_context.return_value = "Generated answer"
+
+        first = self.answer_generator.generate_answer("What is the excess?")
+        second = self.answer_generator.generate_answer("what is the excess")
+
+        assert first == second
+        self.mock_llm_service.generate_with_context.assert_called_once()
+
+    def test_semantic_cache_reuses_embedding(self):
+        """Test the query embedding computed for the cache is reused for retrieval"""
+        self.answer_generator.answer_cache = AnswerCache(similarity_threshold=0.9)
+        self.mock_retriever.index_version = 1
+        self.mock_retriever.embed_query.return_value = [1.0, 0.0]
+        self.mock_retriever.retrieve.return_value = []
+
+        self.answer_generator.generate_answer("test query")
+
+        self.mock_retriever.retrieve.assert_called_once_with("test query", top_k=3, embedding=[1.0, 0.0], filters=None)
+
+    def test_filtered_query_bypasses_cache(self):
+        """Test a filtered query is neither served from nor stored in the answer cache"""
+        self.answer_generator.answer_cache = AnswerCache(similarity_threshold=None)
+        self.mock_retriever.index_version = 1
+        self.answer_generator.answer_cache.put("what is the excess", 3, 1, {"answer": "Unfiltered", "sources": []})
+        self.mock_retriever.retrieve.return_value = []
+
+        result = self.answer_generator.generate_answer("what is the excess", filters={"source": "travel.pdf"})
+
+        assert result["answer"] != "Unfiltered"
+        self.mock_retriever.retrieve.assert_called_once_with("what is the excess", top_k=3, embedding=None, filters={"source": "travel.pdf"})
+        assert self.answer_generator.answer_cache.get("what is the excess", 3, 1)["answer"] == "Unfiltered"
+
+    def test_agenerate_answers(self):
+        """Test a batch shares one embedding and search, keeps query order and isolates failures"""
+        self.answer_generator.answer_cache = AnswerCache(similarity_threshold=None)
+        self.mock_retriever.index_version = 1
+        self.answer_generator.answer_cache.put("cached question", 3, 1, {"answer": "Cached", "sources": []})
+        self.mock_retriever.aembed_queries.return_value = [[1.0], [0.0]]
+        doc = Document(page_content="Test content", metadata={"source": "file.pdf", "section": "COVERAGE"})
+        self.mock_retriever.aretrieve_batch.return_value = [[doc], [doc]]
+        self.mock_retriever.pack_context.side_effect = lambda docs: PackedContext("Formatted context", docs, 2)
+
+        async def generate(system_prompt, context, query):
+            if query == "failing question":
+                raise RuntimeError("rate limited")
+            return f"Answer to {query}"
+        self.mock_llm_service.agenerate_with_context.side_effect = generate
+
+        results = asyncio.run(self.answer_generator.agenerate_answers(["first question", "cached question", "failing question"]))
+
+        assert results[0]["answer"] == "Answer to first question"
+        assert results[1]["answer"] == "Cached"
+        assert results[2]["error"] == "rate limited"
+        self.mock_retriever.aembed_queries.assert_awaited_once_with(["first question", "failing question"])
+        self.mock_retriever.aretrieve_batch.assert_awaited_once_with(["first question", "failing question"], top_k=3, embeddings=[[1.0], [0.0]], filters=None)
+
+    def test_concurrent_identical_queries_coalesce(self):
+        """Test identical in-flight queries share one retrieval and LLM call"""
+        self.mock_retriever.index_version = 1
+        self.mock_retriever.aretrieve.return_value = [
+            Document(page_content="Test content", metadata={"source": "file.pdf", "section": "COVERAGE"})
+        ]
+        self.mock_retriever.pack_context.side_effect = lambda docs: PackedContext("Formatted context", docs, 2)
+
+        async def generate(system_prompt, context, query):
+            await asyncio.sleep(0.01)
+            return "Generated answer"
+        self.mock_llm_service.agenerate_with_context.side_effect = generate
+
+        async def ask():
+            return await asyncio.gather(
+                self.answer_generator.agenerate_answer("What is the excess?"),
+                self.answer_generator.agenerate_answer("what is the excess"),
+                self.answer_generator.agenerate_answer("What is the excess?", top_k=5),
+            )
+        first, second, other_top_k = asyncio.run(ask())
+
+        assert first == second == other_top_k
+        assert first is not second
+        assert self.mock_llm_service.agenerate_with_context.await_count == 2
+        assert self.answer_generator._in_flight == {}
+
+    def test_coalesced_failure_is_not_reused(self):
+        """Test a failed shared computation is retried by the next query"""
+        self.mock_retriever.index_version = 1
+        self.mock_retriever.aretrieve.side_effect = [RuntimeError("search failed"), []]
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(self.answer_generator.agenerate_answer("test query"))
+        result = asyncio.run(self.answer_generator.agenerate_answer("test query"))
+
+        assert result["sources"] == []
+
     def test_set_system_prompt(self):
         """Test setting a custom system prompt"""
         new_prompt = "New system prompt"
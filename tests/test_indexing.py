@@ -0,0 +1,72 @@
+import fitz
+import pytest
+from src.rag.indexing import DocumentIndexer
+from src.api.exceptions import DocumentNotFoundError
+
+def make_pdf(path, text):
+    """Write a single-page PDF containing the given text"""
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 72), text)
+    doc.save(str(path))
+    doc.close()
+
+class TestDocumentIndexer:
+    def test_index_pdf_appends(self, fake_embedding_model, tmp_path):
+        """Test each indexed PDF is added to the existing index"""
+        indexer = DocumentIndexer(embedding_model=fake_embedding_model, chunk_strategy="default")
+        make_pdf(tmp_path / "a.pdf", "Baggage cover for lost luggage")
+        make_pdf(tmp_path / "b.pdf", "Medical expenses while abroad")
+        persist_dir = str(tmp_path / "store")
+
+        indexer.index_pdf(str(tmp_path / "a.pdf"), persist_directory=persist_dir)
+        result = indexer.index_pdf(str(tmp_path / "b.pdf"), persist_directory=persist_dir)
+
+        assert result["status"] == "indexed"
+        assert len(indexer.vector_store.store.index_to_docstore_id) == 2
+        assert len(indexer.get_manifest(persist_dir).documents) == 2
+
+    def test_reindex_same_pdf_is_noop(self, fake_embedding_model, tmp_path):
+        """Test re-uploading identical content does not embed it again"""
+        indexer = DocumentIndexer(embedding_model=fake_embedding_model, chunk_strategy="default")
+        make_pdf(tmp_path / "a.pdf", "Baggage cover for lost luggage")
+        persist_dir = str(tmp_path / "store")
+
+        indexer.index_pdf(str(tmp_path / "a.pdf"), persist_directory=persist_dir)
+        calls = fake_embedding_model.model.calls
+        result = indexer.index_pdf(str(tmp_path / "a.pdf"), persist_directory=persist_dir)
+
+        assert result["status"] == "already_indexed"
+        assert result["chunks"] == 1
+        assert fake_embedding_model.model.calls == calls
+
+    def test_delete_document(self, fake_embedding_model, tmp_path):
+        """Test deleting a document removes only its chunks and forgets it in the manifest"""
+        indexer = DocumentIndexer(embedding_model=fake_embedding_model, chunk_strategy="default")
+        make_pdf(tmp_path / "a.pdf", "Baggage cover for lost luggage")
+        make_pdf(tmp_path / "b.pdf", "Medical expenses while abroad")
+        persist_dir = str(tmp_path / "store")
+        doc_id = indexer.index_pdf(str(tmp_path / "a.pdf"), persist_directory=persist_dir)["doc_id"]
+        indexer.index_pdf(str(tmp_path / "b.pdf"), persist_directory=persist_dir)
+
+        result = indexer.delete_document(doc_id, persist_directory=persist_dir)
+
+        assert result["chunks"] == 1
+        assert doc_id not in indexer.get_manifest(persist_dir)
+        assert [doc.page_content for doc in indexer.vector_store.similarity_search("Baggage cover", k=2)] == ["Medical expenses while abroad"]
+        with pytest.raises(DocumentNotFoundError):
+            indexer.delete_document(doc_id, persist_directory=persist_dir)
+
+    def test_replace_pdf(self, fake_embedding_model, tmp_path):
+        """Test replacing a document indexes the new version and deletes the old one"""
+        indexer = DocumentIndexer(embedding_model=fake_embedding_model, chunk_strategy="default")
+        make_pdf(tmp_path / "old.pdf", "Baggage cover up to 500")
+        make_pdf(tmp_path / "new.pdf", "Baggage cover up to 1000")
+        persist_dir = str(tmp_path / "store")
+        old_id = indexer.index_pdf(str(tmp_path / "old.pdf"), persist_directory=persist_dir)["doc_id"]
+
+        result = indexer.replace_pdf(old_id, str(tmp_path / "new.pdf"), persist_directory=persist_dir)
+
+        assert result["status"] == "replaced"
+        assert list(indexer.get_manifest(persist_dir).documents) == [result["doc_id"]]
+        assert [doc.page_content for doc in indexer.vector_store.similarity_search("Baggage cover", k=2)] == ["Baggage cover up to 1000"]
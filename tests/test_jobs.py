@@ -0,0 +1,78 @@
+import threading
+import time
+import pytest
+from src.rag.jobs import IngestionQueue
+from src.api.exceptions import IngestionQueueFullError
+
+class TestIngestionQueue:
+    def wait_for(self, queue, job):
+        """Stop the workers, which waits for queued jobs to finish"""
+        queue.stop(timeout=5)
+        return queue.get(job.id)
+
+    def test_job_completes(self):
+        """Test a job reports its chunk count and stage timings"""
+        queue = IngestionQueue(lambda job: {"status": "indexed", "chunks": 4, "timings": {"parse": 0.1}})
+        queue.start()
+        job = queue.submit("data/pdfs/a.pdf", "a.pdf")
+
+        job = self.wait_for(queue, job)
+
+        assert job.status == "indexed"
+        assert job.chunks == 4
+        assert job.timings == {"parse": 0.1}
+        assert job.finished_at >= job.started_at
+
+    def test_job_failure_is_recorded(self):
+        """Test errors raised while indexing are kept on the job"""
+        def fail(job):
+            raise ValueError("corrupt PDF")
+        queue = IngestionQueue(fail)
+        queue.start()
+        job = queue.submit("data/pdfs/a.pdf", "a.pdf")
+
+        job = self.wait_for(queue, job)
+
+        assert job.status == "failed"
+        assert job.error == "corrupt PDF"
+
+    def test_queue_full_raises(self):
+        """Test submissions beyond the queue size are rejected"""
+        release = threading.Event()
+        queue = IngestionQueue(lambda job: release.wait(5) and {}, max_queue_size=1, num_workers=1)
+        queue.start()
+        queue.submit("a.pdf", "a.pdf")
+        # Wait until the worker has taken the first job so exactly one slot is free
+        while queue.pending:
+            pass
+        queue.submit("b.pdf", "b.pdf")
+
+        with pytest.raises(IngestionQueueFullError):
+            queue.submit("c.pdf", "c.pdf")
+        release.set()
+        queue.stop(timeout=5)
+
+    def test_stop_with_full_queue_is_bounded(self):
+        """Test shutdown gives up after the timeout instead of waiting on a full queue, and queued jobs are left alone"""
+        release = threading.Event()
+        queue = IngestionQueue(lambda job: release.wait(5) and {}, max_queue_size=1, num_workers=1)
+        queue.start()
+        queue.submit("a.pdf", "a.pdf")
+        while queue.pending:
+            pass
+        queued = queue.submit("b.pdf", "b.pdf")
+        workers = list(queue._workers)
+
+        start = time.monotonic()
+        queue.stop(timeout=0.2)
+
+        assert time.monotonic() - start < 2
+        release.set()
+        for worker in workers:
+            worker.join(5)
+        assert not any(worker.is_alive() for worker in workers)
+        assert queued.status == "queued"
+
+    def test_unknown_job(self):
+        """Test unknown job ids return None"""
+        assert IngestionQueue(lambda job: {}).get("missing") is None
@@ -0,0 +1,55 @@
+import asyncio
+import json
+import httpx
+import pytest
+from src.models.llm import DeepSeekLLM, LLMService
+
+def make_client(handler):
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+def sse_body(*tokens):
+    lines = [
+        "data: " + json.dumps({"choices": [{"delta": {"content": token}}]})
+        for token in tokens
+    ]
+    return ("\n\n".join(lines + ["data: [DONE]"]) + "\n\n").encode()
+
+class TestDeepSeekLLM:
+    def setup_method(self):
+        self.llm = DeepSeekLLM(api_key="test-key")
+
+    def collect(self, stream):
+        async def run():
+            return [token async for token in stream]
+        return asyncio.run(run())
+
+    def test_agenerate_response(self, monkeypatch):
+        """Test async completions use the shared async client"""
+        def handler(request):
+            assert json.loads(request.content)["messages"][0]["content"] == "hi"
+            return httpx.Response(200, json={"choices": [{"message": {"content": "hello"}}]})
+        monkeypatch.setattr("src.models.llm.get_async_client", lambda: make_client(handler))
+
+        assert asyncio.run(self.llm._agenerate_response([{"role": "user", "content": "hi"}])) == "hello"
+
+    def test_astream_response(self, monkeypatch):
+        """Test streamed completions yield tokens in order"""
+        def handler(request):
+            assert json.loads(request.content)["stream"] is True
+            return httpx.Response(200, content=sse_body("The ", "excess ", "is $100"))
+        monkeypatch.setattr("src.models.llm.get_async_client", lambda: make_client(handler))
+
+        tokens = self.collect(self.llm._astream_response([{"role": "user", "content": "hi"}]))
+        assert tokens == ["The ", "excess ", "is $100"]
+
+    def test_astream_with_context_wraps_errors(self, monkeypatch):
+        """Test streaming API errors surface as RuntimeError"""
+        monkeypatch.setattr(
+            "src.models.llm.get_async_client",
+            lambda: make_client(lambda request: httpx.Response(500, text="boom"))
+        )
+        monkeypatch.setenv("DEEPSEEK_API_KEY", "test-key")
+        service = LLMService()
+
+        with pytest.raises(RuntimeError):
+            self.collect(service.astream_with_context("system", "context", "query"))
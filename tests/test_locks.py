@@ -0,0 +1,64 @@
+import threading
+from src.utils.locks import FileLock, ReadWriteLock
+
+class TestReadWriteLock:
+    def setup_method(self):
+        self.lock = ReadWriteLock()
+
+    def test_readers_share(self):
+        """Test several threads can hold the read lock at once"""
+        barrier = threading.Barrier(3, timeout=5)
+        errors = []
+
+        def read():
+            with self.lock.read():
+                try:
+                    barrier.wait()
+                except threading.BrokenBarrierError as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=read) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors
+
+    def test_writer_excludes_readers(self):
+        """Test a reader waits for the writer, which may re-enter and read"""
+        events = []
+
+        def read():
+            with self.lock.read():
+                events.append("read")
+
+        with self.lock.write():
+            reader = threading.Thread(target=read)
+            reader.start()
+            reader.join(0.1)
+            assert events == []
+            with self.lock.write(), self.lock.read():
+                events.append("nested")
+        reader.join(5)
+        assert events == ["nested", "read"]
+
+class TestFileLock:
+    def test_second_holder_of_the_file_waits(self, tmp_path):
+        """Test a lock on the same file from another descriptor waits, while the holder may re-enter"""
+        path = str(tmp_path / "write.lock")
+        first, second = FileLock(path), FileLock(path)
+        events = []
+
+        def hold():
+            with second.hold():
+                events.append("held")
+
+        with first.hold():
+            other = threading.Thread(target=hold)
+            other.start()
+            other.join(0.1)
+            assert events == []
+            with first.hold():
+                pass
+        other.join(5)
+        assert events == ["held"]
@@ -0,0 +1,59 @@
+import json
+import os
+from src.rag import manifest as manifest_module
+from src.rag.manifest import IndexManifest
+
+class TestIndexManifest:
+    def test_changes_survive_reload(self, tmp_path):
+        """Test additions and removals recorded in the journal are replayed on load"""
+        path = str(tmp_path / "manifest.json")
+        manifest = IndexManifest(path)
+        manifest.add("a", {"source": "a.pdf", "chunks": 2})
+        manifest.add_many({"b": {"source": "b.pdf", "chunks": 1}, "c": {"source": "c.pdf", "chunks": 3}})
+        manifest.remove("b")
+
+        reloaded = IndexManifest(path)
+
+        assert sorted(reloaded.documents) == ["a", "c"]
+        assert reloaded.get("c")["chunks"] == 3
+
+    def test_changes_append_instead_of_rewriting(self, tmp_path):
+        """Test a change appends one journal record rather than rewriting the manifest file"""
+        path = str(tmp_path / "manifest.json")
+        manifest = IndexManifest(path)
+        manifest.add("a", {"source": "a.pdf", "chunks": 2})
+        manifest.save()
+        snapshot = os.path.getmtime(path), os.path.getsize(path)
+
+        manifest.add("b", {"source": "b.pdf", "chunks": 1})
+
+        assert (os.path.getmtime(path), os.path.getsize(path)) == snapshot
+        with open(manifest.journal_path) as f:
+            assert [json.loads(line)["doc_id"] for line in f] == ["b"]
+
+    def test_journal_folded_into_manifest(self, tmp_path, monkeypatch):
+        """Test the journal is folded into the manifest file once it grows long"""
+        monkeypatch.setattr(manifest_module, "MIN_JOURNAL_RECORDS", 3)
+        path = str(tmp_path / "manifest.json")
+        manifest = IndexManifest(path)
+        for doc_id in "abc":
+            manifest.add(doc_id, {"source": f"{doc_id}.pdf", "chunks": 1})
+
+        assert not os.path.exists(manifest.journal_path)
+        with open(path) as f:
+            assert sorted(json.load(f)["documents"]) == ["a", "b", "c"]
+
+        manifest.add("d", {"source": "d.pdf", "chunks": 1})
+        assert sorted(IndexManifest(path).documents) == ["a", "b", "c", "d"]
+
+    def test_torn_record_skipped(self, tmp_path):
+        """Test a record cut short by a crash is skipped and later changes still load"""
+        path = str(tmp_path / "manifest.json")
+        IndexManifest(path).add("a", {"source": "a.pdf", "chunks": 2})
+        with open(f"{path}.journal", "a") as f:
+            f.write('{"op": "add", "doc_id": "b", "en')
+
+        manifest = IndexManifest(path)
+        manifest.add("c", {"source": "c.pdf", "chunks": 1})
+
+        assert sorted(IndexManifest(path).documents) == ["a", "c"]
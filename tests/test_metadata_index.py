@@ -0,0 +1,39 @@
+from src.utils.metadata_index import MetadataIndex
+
+class TestMetadataIndex:
+    def setup_method(self):
+        self.index = MetadataIndex.from_metadatas([
+            {"source": "travel.pdf", "section": "BAGGAGE", "year": 2024, "chunk_id": "a"},
+            {"source": "travel.pdf", "section": "MEDICAL", "year": 2023, "chunk_id": "b"},
+            {"source": "home.pdf", "section": "BAGGAGE", "year": 2024, "chunk_id": "c"},
+        ])
+
+    def test_no_filters(self):
+        """Test an empty filter selects nothing to restrict"""
+        assert self.index.mask(None) is None
+        assert self.index.mask({}) is None
+
+    def test_fields_are_combined(self):
+        """Test a list matches any of its values and every field must match"""
+        assert self.index.mask({"section": "BAGGAGE"}).tolist() == [True, False, True]
+        assert self.index.mask({"section": ["BAGGAGE", "MEDICAL"], "source": "travel.pdf"}).tolist() == [True, True, False]
+        assert not self.index.mask({"source": "missing.pdf"}).any()
+
+    def test_values_match_as_strings(self):
+        """Test a filter value matches metadata of another scalar type"""
+        assert self.index.mask({"year": "2024"}).tolist() == [True, False, True]
+
+    def test_per_chunk_fields_not_indexed(self):
+        """Test per-chunk identifiers are left out of the index"""
+        assert self.index.values("chunk_id") == []
+        assert self.index.values("section") == ["BAGGAGE", "MEDICAL"]
+
+    def test_save_and_load(self, tmp_path):
+        """Test the index round-trips through disk and keeps growing after loading"""
+        path = str(tmp_path / "metadata.pkl")
+        self.index.save(path)
+
+        loaded = MetadataIndex.load(path)
+        loaded.add([{"source": "home.pdf"}])
+
+        assert loaded.mask({"source": "home.pdf"}).tolist() == [False, False, True, True]
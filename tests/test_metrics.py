@@ -0,0 +1,54 @@
+import pytest
+from src.utils.metrics import MetricsRegistry, metrics, timed_stage, start_trace, format_server_timing
+
+class TestMetricsRegistry:
+    def setup_method(self):
+        self.registry = MetricsRegistry(window=100)
+
+    def test_quantiles(self):
+        """Test percentiles are computed over recent observations"""
+        for value in range(1, 101):
+            self.registry.observe("stage_seconds", value / 100, stage="llm")
+
+        quantiles = self.registry.quantiles("stage_seconds", stage="llm")
+
+        assert quantiles[0.5] == pytest.approx(0.505)
+        assert quantiles[0.99] == pytest.approx(0.9901)
+        assert self.registry.quantiles("stage_seconds", stage="other") == {}
+
+    def test_counters(self):
+        """Test counters accumulate per label set"""
+        self.registry.increment("api_calls_total", service="llm", status=200)
+        self.registry.increment("api_calls_total", service="llm", status=200)
+        self.registry.increment("api_calls_total", service="llm", status=500)
+
+        assert self.registry.counter("api_calls_total", service="llm", status=200) == 2
+        assert self.registry.counter("api_calls_total", service="llm", status=500) == 1
+
+    def test_render(self):
+        """Test the Prometheus text format includes summaries, counters and component samples"""
+        self.registry.observe("stage_seconds", 0.25, stage="embed_query")
+        self.registry.increment("llm_tokens_total", 42, kind="prompt")
+
+        text = self.registry.render([("index_vectors", {}, 10)])
+
+        assert "# TYPE askmydocs_stage_seconds summary" in text
+        assert 'askmydocs_stage_seconds{stage="embed_query",quantile="0.95"} 0.25' in text
+        assert 'askmydocs_stage_seconds_count{stage="embed_query"} 1' in text
+        assert "# TYPE askmydocs_llm_tokens_total counter" in text
+        assert 'askmydocs_llm_tokens_total{kind="prompt"} 42' in text
+        assert "# TYPE askmydocs_index_vectors gauge" in text
+        assert "askmydocs_index_vectors 10" in text
+
+    def test_timed_stage_records_trace(self):
+        """Test stages are recorded globally and in the current request's trace"""
+        timings = start_trace()
+
+        with timed_stage("test_stage"):
+            pass
+        with timed_stage("test_stage"):
+            pass
+
+        assert list(timings) == ["test_stage"]
+        assert metrics.quantiles("stage_seconds", stage="test_stage")
+        assert format_server_timing({"embed_query": 0.0123}) == "embed_query;dur=12.3"
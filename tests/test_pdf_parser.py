@@ -0,0 +1,41 @@
+import fitz
+from src.utils.pdf_parser import PDFParser
+
+def make_pdf(path, pages):
+    """Write a PDF with one page per text"""
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page()
+        page.insert_text((72, 72), text)
+    doc.save(str(path))
+    doc.close()
+
+class TestPDFParser:
+    def test_clean_page_keeps_lines(self):
+        """Test page cleaning drops page numbers and extra spaces but keeps line breaks"""
+        text = "EXCLUSIONS\n  We   will not pay\n\n 12 \nTravel Insurance Policy | Page 12\nfor war"
+
+        assert PDFParser().clean_page(text) == "EXCLUSIONS\nWe will not pay\nfor war"
+
+    def test_iter_pages_sequential(self, tmp_path):
+        """Test pages are streamed in order from a single process"""
+        make_pdf(tmp_path / "a.pdf", ["COVER\nBaggage", "CLAIMS\nCall us"])
+        parser = PDFParser()
+        parser.open(str(tmp_path / "a.pdf"))
+
+        pages = list(parser.iter_pages(workers=1))
+        parser.close()
+
+        assert pages == ["COVER\nBaggage", "CLAIMS\nCall us"]
+
+    def test_iter_pages_parallel(self, tmp_path):
+        """Test pages extracted by worker processes come back in order"""
+        texts = [f"PAGE {i}\nClause {i}" for i in range(12)]
+        make_pdf(tmp_path / "long.pdf", texts)
+        parser = PDFParser()
+        parser.open(str(tmp_path / "long.pdf"))
+
+        pages = list(parser.iter_pages(workers=2, batch_size=2, parallel_threshold=4))
+        parser.close()
+
+        assert pages == texts
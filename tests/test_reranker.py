@@ -0,0 +1,74 @@
+import pytest
+import numpy as np
+from unittest.mock import MagicMock
+from langchain_core.documents import Document
+from src.rag.reranker import CrossEncoderReranker, MMRReranker, create_reranker
+
+class TestCrossEncoderReranker:
+    def setup_method(self):
+        self.model = MagicMock()
+        self.reranker = CrossEncoderReranker(model=self.model)
+        self.docs = [Document(id=str(i), page_content=f"chunk {i}") for i in range(4)]
+
+    def test_keeps_highest_scoring(self):
+        """Test the chunks the model scores highest are kept, best first"""
+        self.model.predict.return_value = [0.1, 0.9, 0.2, 0.8]
+
+        result = self.reranker.rerank("what is the excess", self.docs, top_k=2)
+
+        assert [doc.id for doc in result] == ["1", "3"]
+
+    def test_batch_scored_in_one_call(self):
+        """Test every query's candidates are scored with a single model call"""
+        self.model.predict.return_value = [0.1, 0.9, 0.5, 0.2, 0.3]
+
+        result = self.reranker.rerank_batch(["excess", "baggage"], [self.docs[:2], self.docs[1:]], top_k=1)
+
+        assert [[doc.id for doc in docs] for docs in result] == [["1"], ["1"]]
+        self.model.predict.assert_called_once()
+        pairs = self.model.predict.call_args.args[0]
+        assert pairs[0] == ("excess", "chunk 0")
+        assert pairs[2] == ("baggage", "chunk 1")
+
+    def test_no_candidates(self):
+        """Test empty rankings skip the model"""
+        assert self.reranker.rerank_batch(["excess"], [[]], top_k=3) == [[]]
+        self.model.predict.assert_not_called()
+
+class TestMMRReranker:
+    def test_select_prefers_diverse_chunks(self):
+        """Test a near-duplicate of the best chunk loses to a distinct relevant one"""
+        vectors = np.array([[1.0, 0.0, 0.0], [0.99, 0.05, 0.0], [0.7, 0.0, 0.7]], dtype=np.float32)
+
+        assert MMRReranker(lambda_mult=0.3).select(np.array([1.0, 0.0, 0.0], dtype=np.float32), vectors, top_k=2) == [0, 2]
+        assert MMRReranker(lambda_mult=1.0).select(np.array([1.0, 0.0, 0.0], dtype=np.float32), vectors, top_k=2) == [0, 1]
+
+    def test_reads_vectors_from_store(self):
+        """Test candidate vectors come from the index rather than a new embedding call"""
+        docs = [Document(id=doc_id, page_content=doc_id) for doc_id in ["a", "b", "c"]]
+        vector_store = MagicMock()
+        vector_store.get_vectors.return_value = np.array([[1.0, 0.0], [1.0, 0.01], [0.6, 0.8]], dtype=np.float32)
+
+        result = MMRReranker(lambda_mult=0.3).rerank("query", docs, top_k=2, embedding=[1.0, 0.0], vector_store=vector_store)
+
+        assert [doc.id for doc in result] == ["a", "c"]
+        vector_store.get_vectors.assert_called_once_with(["a", "b", "c"])
+
+    def test_falls_back_without_vectors(self):
+        """Test the retrieval order is kept when the vectors cannot be read"""
+        docs = [Document(id=doc_id, page_content=doc_id) for doc_id in ["a", "b", "c"]]
+        vector_store = MagicMock()
+        vector_store.get_vectors.return_value = None
+
+        result = MMRReranker().rerank("query", docs, top_k=2, embedding=[1.0, 0.0], vector_store=vector_store)
+
+        assert result == docs[:2]
+
+class TestCreateReranker:
+    def test_create_reranker(self):
+        """Test rerankers are selected by name and can be disabled"""
+        assert create_reranker(None) is None
+        assert create_reranker("none") is None
+        assert isinstance(create_reranker("mmr", lambda_mult=0.5), MMRReranker)
+        with pytest.raises(ValueError):
+            create_reranker("colbert")
@@ -1,6 +1,7 @@
 import pytest
 from unittest.mock import MagicMock
-from src.rag.retriever import Retriever
+from src.rag.retriever import Retriever, reciprocal_rank_fusion
+from src.rag.cache import QueryEmbeddingCache
 from langchain_core.documents import Document
 
 class TestRetriever:
@@ -29,7 +30,7 @@ class TestRetriever:
         # Verify the result
         assert len(result) == 2
         assert result[0].page_content == "Document 1"
-        mock_vector_store.similarity_search.assert_called_once_with("test query", k=2)
+        mock_vector_store.similarity_search.assert_called_once_with("test query", k=2, filters=None)
 
     def test_format_context(self):
         """Test context formatting from documents"""
@@ -48,4 +49,92 @@ class TestRetriever:
         assert "COVERAGE" in context
         assert "EXCLUSIONS" in context
         assert "Test content 1" in context
-        assert "Test content 2" in context
\ No newline at end of file
+        assert "Test content 2" in context
+
+    def test_reciprocal_rank_fusion(self):
+        """Test documents ranked well by both lists come first"""
+        a = Document(id="a", page_content="A")
+        b = Document(id="b", page_content="B")
+        c = Document(id="c", page_content="C")
+
+        fused = reciprocal_rank_fusion([[a, b, c], [b, c]])
+
+        assert [doc.id for doc in fused] == ["b", "c", "a"]
+
+    def test_hybrid_retrieve(self):
+        """Test hybrid retrieval fuses vector and lexical candidates"""
+        mock_vector_store = MagicMock()
+        vector_doc = Document(id="v", page_content="travel insurance overview")
+        lexical_doc = Document(id="l", page_content="the excess is 100")
+        mock_vector_store.embed_query.return_value = [0.1, 0.2]
+        mock_vector_store.similarity_search_by_vector.return_value = [vector_doc, lexical_doc]
+        mock_vector_store.lexical_search.return_value = [(lexical_doc, 3.2)]
+
+        retriever = Retriever(vector_store=mock_vector_store, hybrid=True)
+        result = retriever.retrieve("what is the excess", top_k=1)
+
+        assert result == [lexical_doc]
+        mock_vector_store.similarity_search_by_vector.assert_called_once_with([0.1, 0.2], k=4, filters=None)
+        mock_vector_store.lexical_search.assert_called_once_with("what is the excess", k=4, filters=None)
+
+    def test_filters_passed_to_both_rankings(self):
+        """Test metadata filters reach the vector and lexical searches"""
+        mock_vector_store = MagicMock()
+        mock_vector_store.embed_query.return_value = [0.1, 0.2]
+        mock_vector_store.similarity_search_by_vector.return_value = []
+        mock_vector_store.lexical_search.return_value = []
+        filters = {"source": "travel.pdf"}
+
+        retriever = Retriever(vector_store=mock_vector_store, hybrid=True)
+        retriever.retrieve("what is the excess", top_k=1, filters=filters)
+
+        mock_vector_store.similarity_search_by_vector.assert_called_once_with([0.1, 0.2], k=4, filters=filters)
+        mock_vector_store.lexical_search.assert_called_once_with("what is the excess", k=4, filters=filters)
+
+    def test_retrieve_batch(self):
+        """Test a batch is embedded in one call and searched in one index search"""
+        mock_vector_store = MagicMock()
+        excess_doc = Document(id="e", page_content="the excess is 100")
+        baggage_doc = Document(id="b", page_content="baggage cover")
+        mock_vector_store.embed_queries.return_value = [[0.1], [0.2]]
+        mock_vector_store.similarity_search_by_vectors.return_value = [[baggage_doc, excess_doc], [baggage_doc]]
+        mock_vector_store.lexical_search.side_effect = lambda query, k, filters=None: [(excess_doc, 2.0)] if "excess" in query else []
+
+        retriever = Retriever(vector_store=mock_vector_store, hybrid=True)
+        result = retriever.retrieve_batch(["what is the excess", "baggage"], top_k=1)
+
+        assert result == [[excess_doc], [baggage_doc]]
+        mock_vector_store.embed_queries.assert_called_once_with(["what is the excess", "baggage"])
+        mock_vector_store.similarity_search_by_vectors.assert_called_once_with([[0.1], [0.2]], k=4, filters=None)
+
+    def test_query_embedding_cache(self):
+        """Test a repeated query is searched without embedding it again"""
+        mock_vector_store = MagicMock()
+        mock_vector_store.embed_query.return_value = [0.1, 0.2]
+        mock_vector_store.embed_queries.side_effect = lambda queries: [[0.3, 0.4] for _ in queries]
+
+        retriever = Retriever(vector_store=mock_vector_store, query_cache=QueryEmbeddingCache(namespace="fake"))
+        retriever.retrieve("what is the excess", top_k=2)
+        retriever.retrieve("What is the excess?", top_k=2)
+        embeddings = retriever.embed_queries(["what is the excess", "baggage cover"])
+
+        mock_vector_store.embed_query.assert_called_once_with("what is the excess")
+        mock_vector_store.similarity_search_by_vector.assert_called_with([0.1, 0.2], k=2, filters=None)
+        mock_vector_store.embed_queries.assert_called_once_with(["baggage cover"])
+        assert embeddings == [[0.1, 0.2], [0.3, 0.4]]
+
+    def test_rerank_over_fetches_candidates(self):
+        """Test a reranker chooses top_k from a larger candidate set"""
+        mock_vector_store = MagicMock()
+        candidates = [Document(id=str(i), page_content=f"chunk {i}") for i in range(10)]
+        mock_vector_store.embed_query.return_value = [0.1, 0.2]
+        mock_vector_store.similarity_search_by_vector.return_value = candidates
+        reranker = MagicMock(needs_embedding=True)
+        reranker.rerank.return_value = candidates[5:7]
+
+        retriever = Retriever(vector_store=mock_vector_store, reranker=reranker, rerank_candidates=10)
+        result = retriever.retrieve("what is the excess", top_k=2)
+
+        assert result == candidates[5:7]
+        mock_vector_store.similarity_search_by_vector.assert_called_once_with([0.1, 0.2], k=10, filters=None)
+        reranker.rerank.assert_called_once_with("what is the excess", candidates, 2, embedding=[0.1, 0.2], vector_store=mock_vector_store)
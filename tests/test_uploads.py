@@ -0,0 +1,87 @@
+import asyncio
+import hashlib
+import os
+import pytest
+from src.api.exceptions import FileTooLargeError, InvalidUploadError, UnsupportedFileTypeError
+from src.utils.uploads import check_content_length, save_upload, publish_upload
+
+BOUNDARY = "testboundary"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+
+class TestUploads:
+    def make_body(self, content, filename="policy.pdf"):
+        return (
+            f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"note\"\r\n\r\nhello\r\n"
+            f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+            "Content-Type: application/pdf\r\n\r\n"
+        ).encode() + content + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+    def stream(self, body, chunk_size=1024, received=None):
+        async def chunks():
+            for start in range(0, len(body), chunk_size):
+                if received is not None:
+                    received.append(chunk_size)
+                yield body[start:start + chunk_size]
+        return chunks()
+
+    def test_save_upload_streams_and_hashes(self, tmp_path):
+        """Test the file part is parsed from the body as it arrives, with its hash and size"""
+        content = b"%PDF-1.4 " + b"x" * 10000
+
+        tmp_file, filename, digest, size = asyncio.run(save_upload(self.stream(self.make_body(content)), CONTENT_TYPE, str(tmp_path), max_bytes=20000))
+
+        assert filename == "policy.pdf"
+        assert size == len(content)
+        assert digest == hashlib.sha256(content).hexdigest()
+        with open(tmp_file, "rb") as f:
+            assert f.read() == content
+        assert os.listdir(tmp_path) == [os.path.basename(tmp_file)]
+
+    def test_save_upload_stops_receiving_over_limit(self, tmp_path):
+        """Test an oversized upload stops being read once the limit is crossed and the partial file is removed"""
+        body = self.make_body(b"x" * 100000)
+        received = []
+
+        with pytest.raises(FileTooLargeError):
+            asyncio.run(save_upload(self.stream(body, received=received), CONTENT_TYPE, str(tmp_path), max_bytes=4096))
+
+        assert len(received) < 10
+        assert os.listdir(tmp_path) == []
+
+    def test_save_upload_rejects_file_type_early(self, tmp_path):
+        """Test a non-PDF is refused once its part headers arrive"""
+        received = []
+
+        with pytest.raises(UnsupportedFileTypeError):
+            asyncio.run(save_upload(self.stream(self.make_body(b"x" * 100000, filename="notes.txt"), received=received), CONTENT_TYPE, str(tmp_path), max_bytes=200000))
+
+        assert len(received) == 1
+        assert os.listdir(tmp_path) == []
+
+    def test_save_upload_requires_file(self, tmp_path):
+        """Test a body without the file field is rejected"""
+        body = f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"note\"\r\n\r\nhello\r\n--{BOUNDARY}--\r\n".encode()
+
+        with pytest.raises(InvalidUploadError):
+            asyncio.run(save_upload(self.stream(body), CONTENT_TYPE, str(tmp_path), max_bytes=100))
+        with pytest.raises(InvalidUploadError):
+            asyncio.run(save_upload(self.stream(body), "application/json", str(tmp_path), max_bytes=100))
+
+    def test_check_content_length(self):
+        """Test a declared body size over the limit is refused before reading"""
+        check_content_length(None, 1000)
+        check_content_length("5000", 1000)
+        with pytest.raises(FileTooLargeError):
+            check_content_length(str(10 * 1024 * 1024), 1000)
+        with pytest.raises(InvalidUploadError):
+            check_content_length("lots", 1000)
+
+    def test_publish_upload(self, tmp_path):
+        """Test publishing renames the file and strips directories from the name"""
+        tmp_file, _, _, _ = asyncio.run(save_upload(self.stream(self.make_body(b"data")), CONTENT_TYPE, str(tmp_path), max_bytes=100))
+
+        file_path = publish_upload(tmp_file, str(tmp_path), "../../etc/policy.pdf")
+
+        assert os.path.dirname(file_path) == str(tmp_path)
+        assert file_path.endswith("_policy.pdf")
+        assert not os.path.exists(tmp_file)
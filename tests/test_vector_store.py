@@ -0,0 +1,447 @@
+import pytest
+from pathlib import Path
+import numpy as np
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from src.utils.vector_store import VectorStore
+from src.utils.docstore import SQLiteDocstore
+from langchain_core.documents import Document
+
+class TestVectorStore:
+    def make_docs(self, *texts, source="policy.pdf"):
+        return [Document(page_content=text, metadata={"source": source}) for text in texts]
+
+    def base_dir(self, persist_dir):
+        return Path(VectorStore.base_directory(str(persist_dir)))
+
+    def test_add_documents_appends(self, fake_embedding_model, tmp_path):
+        """Test appending keeps previously indexed documents"""
+        store = VectorStore(embedding_model=fake_embedding_model)
+        initial_version = store.version
+        store.add_documents(self.make_docs("baggage cover lost luggage"), persist_directory=str(tmp_path))
+        first_version = store.version
+        store.add_documents(self.make_docs("medical expenses abroad"), persist_directory=str(tmp_path))
+
+        assert len(store.store.index_to_docstore_id) == 2
+        assert first_version != initial_version
+        assert store.version != first_version
+
+    def test_append_writes_only_segments(self, fake_embedding_model, tmp_path):
+        """Test appends persist a segment each instead of rewriting the index"""
+        store = VectorStore(embedding_model=fake_embedding_model)
+        store.add_documents(self.make_docs("baggage cover"), persist_directory=str(tmp_path))
+        store.add_documents(self.make_docs("medical cover"), persist_directory=str(tmp_path))
+
+        assert not (tmp_path / "index.faiss").exists()
+        assert len(list((tmp_path / "segments").iterdir())) == 2
+
+    def test_load_replays_segments(self, fake_embedding_model, tmp_path):
+        """Test loading combines the base index with appended segments"""
+        store = VectorStore(embedding_model=fake_embedding_model)
+        store.create_from_documents(self.make_docs("baggage cover lost luggage"), persist_directory=str(tmp_path))
+        store.add_documents(self.make_docs("medical expenses abroad"), persist_directory=str(tmp_path))
+
+        loaded = VectorStore(embedding_model=fake_embedding_model)
+        loaded.load(str(tmp_path))
+
+        assert len(loaded.store.index_to_docstore_id) == 2
+        result = loaded.similarity_search("medical expenses", k=1)
+        assert result[0].page_content == "medical expenses abroad"
+
+    def test_compaction(self, fake_embedding_model, tmp_path):
+        """Test segments are folded into the base index past the limit"""
+        store = VectorStore(embedding_model=fake_embedding_model, max_segments=2)
+        for text in ["one", "two", "three"]:
+            store.add_documents(self.make_docs(text), persist_directory=str(tmp_path))
+
+        assert (self.base_dir(tmp_path) / "index.faiss").exists()
+        assert not (tmp_path / "segments").exists()
+
+        loaded = VectorStore(embedding_model=fake_embedding_model)
+        loaded.load(str(tmp_path))
+        assert len(loaded.store.index_to_docstore_id) == 3
+
+    def test_lexical_search(self, fake_embedding_model, tmp_path):
+        """Test the BM25 index tracks appended documents"""
+        store = VectorStore(embedding_model=fake_embedding_model)
+        store.add_documents(self.make_docs("the policy excess is 100"), persist_directory=str(tmp_path))
+        store.add_documents(self.make_docs("medical expenses abroad"), persist_directory=str(tmp_path))
+
+        results = store.lexical_search("excess", k=2)
+
+        assert len(results) == 1
+        assert results[0][0].page_content == "the policy excess is 100"
+
+    def test_lexical_index_persisted(self, fake_embedding_model, tmp_path):
+        """Test the BM25 index is saved with the base index and segments are replayed into it"""
+        store = VectorStore(embedding_model=fake_embedding_model)
+        store.create_from_documents(self.make_docs("the policy excess is 100"), persist_directory=str(tmp_path))
+        store.add_documents(self.make_docs("pre-existing conditions"), persist_directory=str(tmp_path))
+        assert (self.base_dir(tmp_path) / "bm25.pkl").exists()
+
+        loaded = VectorStore(embedding_model=fake_embedding_model)
+        loaded.load(str(tmp_path))
+
+        assert len(loaded.lexical_index) == 2
+        assert loaded.lexical_search("pre-existing", k=1)[0][0].page_content == "pre-existing conditions"
+
+    def test_lexical_index_built_for_legacy_store(self, fake_embedding_model, tmp_path):
+        """Test stores saved without a BM25 index get one on load"""
+        store = VectorStore(embedding_model=fake_embedding_model)
+        store.create_from_documents(self.make_docs("the policy excess is 100"), persist_directory=str(tmp_path))
+        (self.base_dir(tmp_path) / "bm25.pkl").unlink()
+
+        loaded = VectorStore(embedding_model=fake_embedding_model)
+        loaded.load(str(tmp_path))
+
+        assert loaded.lexical_search("excess", k=1)[0][0].page_content == "the policy excess is 100"
+
+    def test_similarity_search_by_vectors(self, fake_embedding_model):
+        """Test a batch search returns one ranking per query, in query order"""
+        store = VectorStore(embedding_model=fake_embedding_model)
+        store.add_documents(self.make_docs("baggage cover lost luggage", "medical expenses abroad"))
+
+        embeddings = store.embed_queries(["medical expenses", "lost luggage"])
+        results = store.similarity_search_by_vectors(embeddings, k=1)
+
+        assert [docs[0].page_content for docs in results] == ["medical expenses abroad", "baggage cover lost luggage"]
+        assert store.similarity_search_by_vectors([], k=1) == []
+
+    def test_filtered_search(self, fake_embedding_model, tmp_path):
+        """Test metadata filters restrict vector and lexical search, including after a reload"""
+        store = VectorStore(embedding_model=fake_embedding_model)
+        store.create_from_documents(self.make_docs("baggage cover lost luggage", source="travel.pdf"), persist_directory=str(tmp_path))
+        store.add_documents(self.make_docs("baggage cover lost luggage at home", source="home.pdf"), persist_directory=str(tmp_path))
+        assert (self.base_dir(tmp_path) / "metadata.pkl").exists()
+
+        loaded = VectorStore(embedding_model=fake_embedding_model)
+        loaded.load(str(tmp_path))
+
+        assert [doc.page_content for doc in loaded.similarity_search("baggage cover lost luggage", k=2, filters={"source": "home.pdf"})] == ["baggage cover lost luggage at home"]
+        assert [doc.page_content for doc, _ in loaded.lexical_search("baggage", k=2, filters={"source": "travel.pdf"})] == ["baggage cover lost luggage"]
+        assert loaded.similarity_search("baggage", k=2, filters={"source": "missing.pdf"}) == []
+        assert len(loaded.similarity_search("baggage", k=2, filters={"source": ["home.pdf", "travel.pdf"]})) == 2
+
+    def test_concurrent_searches_overlap(self, fake_embedding_model):
+        """Test searches share the store lock instead of running one at a time"""
+        store = VectorStore(embedding_model=fake_embedding_model)
+        store.create_from_documents(self.make_docs("travel insurance covers baggage", "the excess is 100"))
+        # Each search waits inside the lock until the other one is inside too
+        barrier = threading.Barrier(2, timeout=5)
+        lookup = store.store.docstore.search
+
+        def search(doc_id):
+            barrier.wait()
+            return lookup(doc_id)
+
+        store.store.docstore.search = search
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = [pool.submit(store.similarity_search, "baggage", k=1), pool.submit(store.lexical_search, "excess", k=1)]
+            results = [future.result() for future in futures]
+
+        assert results[0][0].page_content == "travel insurance covers baggage"
+        assert results[1][0][0].page_content == "the excess is 100"
+
+    def test_delete_hides_chunks_until_purged(self, fake_embedding_model, tmp_path):
+        """Test deleted chunks are skipped by every search, survive a reload, and are dropped by a purge"""
+        store = VectorStore(embedding_model=fake_embedding_model)
+        store.add_documents(self.make_docs("baggage cover lost luggage"), persist_directory=str(tmp_path), ids=["a"])
+        store.add_documents(self.make_docs("baggage delay abroad", source="other.pdf"), persist_directory=str(tmp_path), ids=["b"])
+        version = store.version
+
+        assert store.delete(["a", "missing"], persist_directory=str(tmp_path)) == 1
+        assert store.version != version
+        assert [doc.id for doc in store.similarity_search("baggage cover lost luggage", k=2)] == ["b"]
+        assert [doc.id for doc, _ in store.lexical_search("baggage", k=2)] == ["b"]
+
+        loaded = VectorStore(embedding_model=fake_embedding_model)
+        loaded.load(str(tmp_path))
+        assert loaded.deleted == {0}
+        assert loaded.delete(["a"]) == 0
+
+        loaded.purge(str(tmp_path))
+        assert loaded.store.index.ntotal == 1
+        assert loaded.deleted == set()
+        assert not (self.base_dir(tmp_path) / "tombstones.pkl").exists()
+        assert loaded.similarity_search("baggage", k=2, filters={"source": "other.pdf"})[0].id == "b"
+        assert [doc.id for doc, _ in loaded.lexical_search("baggage", k=2)] == ["b"]
+
+    def test_interrupted_purge_keeps_previous_generation(self, fake_embedding_model, tmp_path, monkeypatch):
+        """Test a crash while a purge writes its files leaves the previous index, chunks and tombstones in use"""
+        store = VectorStore(embedding_model=fake_embedding_model)
+        store.create_from_documents(self.make_docs("baggage cover lost luggage", "medical expenses abroad", "cancellation charges"), persist_directory=str(tmp_path))
+        store.delete([store.store.index_to_docstore_id[0]], persist_directory=str(tmp_path))
+        previous = self.base_dir(tmp_path)
+
+        def crash(*args, **kwargs):
+            raise OSError("disk full")
+        monkeypatch.setattr("src.utils.vector_store.MetadataIndex.save", crash)
+        with pytest.raises(OSError):
+            store.purge(str(tmp_path))
+        monkeypatch.undo()
+
+        assert self.base_dir(tmp_path) == previous
+        loaded = VectorStore(embedding_model=fake_embedding_model)
+        loaded.load(str(tmp_path))
+        assert loaded.deleted == {0}
+        assert loaded.similarity_search("medical expenses abroad", k=1)[0].page_content == "medical expenses abroad"
+        assert "baggage cover lost luggage" not in [doc.page_content for doc in loaded.similarity_search("baggage cover", k=3)]
+
+        # The next save replaces the partial generation and leaves only its own
+        loaded.purge(str(tmp_path))
+        assert [path.name for path in tmp_path.iterdir() if path.name.startswith("generation-")] == [self.base_dir(tmp_path).name]
+
+    def test_filters_and_deletes_apply_to_appended_vectors(self, fake_embedding_model, tmp_path):
+        """Test chunks appended beside a mapped index are filtered, deleted and fetched like indexed ones"""
+        store = VectorStore(embedding_model=fake_embedding_model)
+        store.create_from_documents(self.make_docs("baggage cover lost luggage", "medical expenses abroad"), persist_directory=str(tmp_path))
+        loaded = VectorStore(embedding_model=fake_embedding_model)
+        loaded.load(str(tmp_path))
+        loaded.add_documents([Document(page_content="lost baggage claim", metadata={"source": "other.pdf"}), Document(page_content="baggage delay cover", metadata={"source": "policy.pdf"})], persist_directory=str(tmp_path))
+
+        assert [doc.metadata["source"] for doc in loaded.similarity_search("baggage", k=4, filters={"source": "other.pdf"})] == ["other.pdf"]
+        appended = loaded.store.index_to_docstore_id[2]
+        assert loaded.get_vectors([appended]).shape == (1, loaded.store.index.d)
+        loaded.delete([appended], persist_directory=str(tmp_path))
+        assert appended not in [doc.id for doc in loaded.similarity_search("lost baggage claim", k=4)]
+        assert loaded.similarity_search("baggage", k=4, filters={"source": "other.pdf"}) == []
+
+    def test_workers_sharing_a_directory_keep_each_others_chunks(self, fake_embedding_model, tmp_path):
+        """Test stores in separate workers on one directory number segments apart and compact each other's chunks in"""
+        VectorStore(embedding_model=fake_embedding_model).create_from_documents(self.make_docs("baggage cover lost luggage"), persist_directory=str(tmp_path))
+        first, second = VectorStore(embedding_model=fake_embedding_model), VectorStore(embedding_model=fake_embedding_model)
+        first.load(str(tmp_path))
+        second.load(str(tmp_path))
+
+        first.add_documents(self.make_docs("medical expenses abroad"), persist_directory=str(tmp_path))
+        second.add_documents(self.make_docs("cancellation charges"), persist_directory=str(tmp_path))
+        assert len(list((tmp_path / "segments").iterdir())) == 2
+        second.compact(str(tmp_path))
+        first.add_documents(self.make_docs("rental car excess"), persist_directory=str(tmp_path))
+
+        reloaded = VectorStore(embedding_model=fake_embedding_model)
+        reloaded.load(str(tmp_path))
+        assert reloaded.vector_count == 4
+        assert reloaded.similarity_search("cancellation charges", k=1)[0].page_content == "cancellation charges"
+        assert reloaded.similarity_search("medical expenses abroad", k=1)[0].page_content == "medical expenses abroad"
+
+    def test_refresh_picks_up_other_workers_changes(self, fake_embedding_model, tmp_path):
+        """Test a worker sees chunks and deletions written by another only after refreshing"""
+        VectorStore(embedding_model=fake_embedding_model).create_from_documents(self.make_docs("baggage cover lost luggage"), persist_directory=str(tmp_path))
+        first, second = VectorStore(embedding_model=fake_embedding_model), VectorStore(embedding_model=fake_embedding_model)
+        first.load(str(tmp_path))
+        second.load(str(tmp_path))
+        assert not second.refresh(str(tmp_path))
+
+        [doc_id] = first.add_documents(self.make_docs("medical expenses abroad"), persist_directory=str(tmp_path))
+        assert second.vector_count == 1
+        assert second.refresh(str(tmp_path))
+        assert second.similarity_search("medical expenses abroad", k=1)[0].id == doc_id
+
+        first.delete([doc_id], persist_directory=str(tmp_path))
+        assert second.refresh(str(tmp_path))
+        assert second.similarity_search("medical expenses abroad", k=1)[0].id != doc_id
+
+        first.compact(str(tmp_path))
+        assert second.refresh(str(tmp_path))
+        assert second._generation == first._generation
+        assert not second.refresh(str(tmp_path))
+
+    def test_load_maps_index_and_reads_chunks_lazily(self, fake_embedding_model, tmp_path):
+        """Test a saved store is memory-mapped, serves chunks from SQLite and still accepts appends"""
+        store = VectorStore(embedding_model=fake_embedding_model)
+        store.create_from_documents(self.make_docs("baggage cover lost luggage", "medical expenses abroad"), persist_directory=str(tmp_path))
+        assert (self.base_dir(tmp_path) / "docstore.sqlite").exists()
+        assert not (tmp_path / "index.pkl").exists()
+
+        loaded = VectorStore(embedding_model=fake_embedding_model)
+        loaded.load(str(tmp_path))
+        assert isinstance(loaded.store.docstore, SQLiteDocstore)
+        assert loaded._mapped
+        assert loaded.similarity_search("medical expenses", k=1)[0].metadata == {"source": "policy.pdf"}
+
+        mapped_index = loaded.store.index
+        loaded.add_documents(self.make_docs("cancellation charges"), persist_directory=str(tmp_path))
+        assert loaded._mapped and loaded.store.index is mapped_index
+        assert loaded.vector_count == 3
+        assert loaded.similarity_search("cancellation charges", k=1)[0].page_content == "cancellation charges"
+
+        # Pending segments are replayed beside the mapped index rather than into a copy of it
+        replayed = VectorStore(embedding_model=fake_embedding_model)
+        replayed.load(str(tmp_path))
+        assert replayed._mapped and replayed.vector_count == 3
+        assert replayed.similarity_search("cancellation charges", k=1)[0].page_content == "cancellation charges"
+
+        loaded.compact(str(tmp_path))
+        assert loaded._mapped and loaded._delta is None and loaded.store.index.ntotal == 3
+        reloaded = VectorStore(embedding_model=fake_embedding_model)
+        reloaded.load(str(tmp_path))
+        assert len(reloaded.store.index_to_docstore_id) == 3
+
+    def test_migrates_legacy_format(self, fake_embedding_model, tmp_path):
+        """Test a store pickled by LangChain is rewritten in the compact format on load"""
+        store = VectorStore(embedding_model=fake_embedding_model)
+        store.add_documents(self.make_docs("the policy excess is 100"))
+        store.store.save_local(str(tmp_path))
+
+        loaded = VectorStore(embedding_model=fake_embedding_model)
+        loaded.load(str(tmp_path))
+
+        assert (self.base_dir(tmp_path) / "docstore.sqlite").exists()
+        assert not (tmp_path / "index.pkl").exists()
+        assert loaded.similarity_search("excess", k=1)[0].page_content == "the policy excess is 100"
+
+class TestVectorStoreIndexTypes:
+    def make_docs(self, count):
+        return [
+            Document(page_content=f"clause {i} covers item{i} and item{i % 7}", metadata={"source": "policy.pdf"})
+            for i in range(count)
+        ]
+
+    def test_unsupported_index_type(self, fake_embedding_model):
+        """Test an unknown index type is rejected"""
+        with pytest.raises(ValueError):
+            VectorStore(embedding_model=fake_embedding_model, index_type="annoy")
+
+    @pytest.mark.parametrize("index_type", ["ivf_flat", "hnsw", "ivf_pq", "sq_fp16", "sq8"])
+    def test_builds_and_searches(self, fake_embedding_model, index_type):
+        """Test each index type trains on ingest and returns the exact match"""
+        store = VectorStore(embedding_model=fake_embedding_model, index_type=index_type, index_params={"pq_m": 8, "pq_nbits": 4})
+        store.create_from_documents(self.make_docs(400))
+
+        assert store.current_index_type() == index_type
+        result = store.similarity_search("clause 12 covers item12 and item5", k=1, nprobe=64, ef_search=128)
+        assert result[0].page_content == "clause 12 covers item12 and item5"
+
+    @pytest.mark.parametrize("index_type,index_params", [("ivf_flat", {}), ("hnsw", {}), ("sq8", {"rescore": True})])
+    def test_filter_applied_inside_search(self, fake_embedding_model, index_type, index_params):
+        """Test filtered searches on approximate indexes only return matching chunks"""
+        docs = self.make_docs(400)
+        for i, doc in enumerate(docs):
+            doc.metadata["section"] = f"S{i % 4}"
+        store = VectorStore(embedding_model=fake_embedding_model, index_type=index_type, index_params=index_params)
+        store.create_from_documents(docs)
+
+        results = store.similarity_search("clause 12 covers item12 and item5", k=5, filters={"section": "S1"}, nprobe=64, ef_search=128)
+
+        assert results
+        assert all(doc.metadata["section"] == "S1" for doc in results)
+
+    @pytest.mark.parametrize("index_type,index_params", [("flat", {}), ("ivf_flat", {}), ("hnsw", {}), ("sq8", {"rescore": True})])
+    def test_get_vectors(self, fake_embedding_model, index_type, index_params):
+        """Test stored vectors are read back by chunk id in the order asked for"""
+        store = VectorStore(embedding_model=fake_embedding_model, index_type=index_type, index_params=index_params)
+        store.create_from_documents(self.make_docs(400))
+        docs = store.similarity_search("clause 12 covers item12 and item5", k=3, nprobe=64, ef_search=128)
+
+        vectors = store.get_vectors([doc.id for doc in reversed(docs)])
+
+        assert vectors.shape == (3, 32)
+        expected = np.asarray(fake_embedding_model.embed_documents([docs[0].page_content])[0], dtype=np.float32)
+        assert np.allclose(vectors[-1], expected, atol=0.1)
+        assert store.get_vectors([docs[0].id, "missing"]) is None
+
+    @pytest.mark.parametrize("index_type", ["sq8", "sq_fp16", "ivf_pq"])
+    def test_purge_compressed_without_embedding(self, fake_embedding_model, tmp_path, index_type):
+        """Test purging a compressed index drops the deleted codes without re-embedding the chunks kept"""
+        store = VectorStore(embedding_model=fake_embedding_model, index_type=index_type, index_params={"pq_m": 8, "pq_nbits": 4})
+        store.create_from_documents(self.make_docs(300), persist_directory=str(tmp_path))
+        store.load(str(tmp_path))
+        ids = [store.store.index_to_docstore_id[i] for i in range(300)]
+        kept = [doc_id for i, doc_id in enumerate(ids) if i % 7]
+        codes = store.get_vectors(kept)
+        store.delete([doc_id for i, doc_id in enumerate(ids) if not i % 7], persist_directory=str(tmp_path))
+        calls = fake_embedding_model.model.calls
+
+        store.purge(str(tmp_path))
+
+        assert fake_embedding_model.model.calls == calls
+        assert store.current_index_type() == index_type
+        assert store.store.index.ntotal == len(kept)
+        assert np.array_equal(store.get_vectors(kept), codes)
+        assert [store.store.index_to_docstore_id[i] for i in range(len(kept))] == kept
+        result = store.similarity_search("clause 8 covers item8 and item1", k=1, nprobe=64)
+        assert result[0].id in kept
+
+    def test_falls_back_to_flat_when_too_small(self, fake_embedding_model):
+        """Test a corpus too small to train IVF-PQ uses a flat index"""
+        store = VectorStore(embedding_model=fake_embedding_model, index_type="ivf_pq")
+        store.create_from_documents(self.make_docs(10))
+        assert store.current_index_type() == "flat"
+
+    def test_flat_fallback_retrained_once_large_enough(self, fake_embedding_model, tmp_path):
+        """Test a store too small to train falls back to flat and asks to be retrained as it grows, across restarts"""
+        store = VectorStore(embedding_model=fake_embedding_model, index_type="ivf_flat", index_params={"nlist": 150})
+        store.create_from_documents(self.make_docs(100), persist_directory=str(tmp_path))
+        assert store.current_index_type() == "flat"
+        assert not store.needs_retrain()
+
+        store.add_documents(self.make_docs(300), persist_directory=str(tmp_path))
+        loaded = VectorStore(embedding_model=fake_embedding_model)
+        loaded.load(str(tmp_path))
+
+        assert loaded.index_type == "ivf_flat"
+        assert loaded.needs_retrain()
+        loaded.rebuild(index_params={"nlist": 150}, persist_directory=str(tmp_path))
+        assert loaded.current_index_type() == "ivf_flat"
+        assert loaded.trained_size == 400
+        assert not loaded.needs_retrain()
+
+    def test_ivf_retrained_when_outgrown(self, fake_embedding_model):
+        """Test an automatically sized IVF index asks to be retrained once the corpus needs many more cells"""
+        store = VectorStore(embedding_model=fake_embedding_model, index_type="ivf_flat")
+        store.create_from_documents(self.make_docs(100))
+        assert store.store.index.nlist == 2
+
+        store.add_documents(self.make_docs(50))
+        assert not store.needs_retrain()
+        store.add_documents(self.make_docs(850))
+        assert store.needs_retrain()
+
+        store.rebuild()
+        assert store.store.index.nlist == 25
+        assert not store.needs_retrain()
+
+    def test_rebuild_changes_index_type(self, fake_embedding_model, tmp_path):
+        """Test rebuilding converts the index and persists it"""
+        store = VectorStore(embedding_model=fake_embedding_model)
+        store.create_from_documents(self.make_docs(200), persist_directory=str(tmp_path))
+        version = store.version
+
+        store.rebuild(index_type="hnsw", persist_directory=str(tmp_path))
+
+        assert store.current_index_type() == "hnsw"
+        assert store.version != version
+        loaded = VectorStore(embedding_model=fake_embedding_model)
+        loaded.load(str(tmp_path))
+        assert loaded.current_index_type() == "hnsw"
+        assert len(loaded.store.index_to_docstore_id) == 200
+
+    def test_rescoring_survives_save_and_rebuild(self, fake_embedding_model, tmp_path):
+        """Test a quantized index with float32 rescoring keeps its exact vectors through save, load and rebuild"""
+        store = VectorStore(embedding_model=fake_embedding_model, index_type="sq8", index_params={"rescore": True})
+        store.create_from_documents(self.make_docs(100), persist_directory=str(tmp_path))
+
+        loaded = VectorStore(embedding_model=fake_embedding_model)
+        loaded.load(str(tmp_path))
+        assert loaded.current_index_type() == "sq8"
+        assert loaded.is_rescored()
+        assert loaded.similarity_search("clause 12 covers item12 and item5", k=1)[0].page_content == "clause 12 covers item12 and item5"
+
+        # The exact vectors are recovered from the rescoring index, so nothing is re-embedded
+        calls = fake_embedding_model.model.calls
+        loaded.rebuild(index_type="flat")
+        assert fake_embedding_model.model.calls == calls
+        assert not loaded.is_rescored()
+
+    def test_resident_index_bytes_excludes_rescoring_vectors(self, fake_embedding_model):
+        """Test the exact vectors of a rescoring index are not counted as resident"""
+        empty = VectorStore(embedding_model=fake_embedding_model)
+        assert empty.resident_index_bytes() == 0
+
+        flat = VectorStore(embedding_model=fake_embedding_model)
+        flat.create_from_documents(self.make_docs(100))
+        rescored = VectorStore(embedding_model=fake_embedding_model, index_type="sq8", index_params={"rescore": True})
+        rescored.create_from_documents(self.make_docs(100))
+
+        assert 0 < rescored.resident_index_bytes() < flat.resident_index_bytes()